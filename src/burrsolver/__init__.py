@@ -13,11 +13,11 @@ meshes (e.g. for STL files).
 
 import argparse
 import json
+import sys
 
 
 from .puzzle import Puzzle
-from .solver import solve
-from .visualization import save_scenepic
+from .solver import ENGINES, solve
 
 
 def parse_args():
@@ -25,36 +25,325 @@ def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--puzzle", "-p", type=int,
                         default=0, help="Puzzle number to solve")
+    parser.add_argument("--file", "-f", default="puzzles.json",
+                        help="Puzzle file (JSON or library) containing the puzzle")
     parser.add_argument("--stl", "-s", action="store_true",
-                        help="Write out shapes as STL files")
+                        help="Write out the shapes and the solved assembly as STL files")
     parser.add_argument("--sp-width", type=int, default=900,
                         help="Width of the ScenePic solution")
     parser.add_argument("--sp-height", type=int, default=600,
                         help="Height of the ScenePic solution")
+    parser.add_argument("--sp-max-frames", type=int, default=None,
+                        help="Maximum number of frames in the ScenePic animation")
+    parser.add_argument("--keyframes", "-k", default=None,
+                        help="Write the solution as keyframes to this path (.json, or .npz for binary) "
+                             "instead of as ScenePic HTML")
+    parser.add_argument("--engine", choices=ENGINES, default="astar",
+                        help="Disassembly search engine (hda searches in parallel, external keeps states on disk)")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="Number of worker processes for the hda engine (defaults to the CPU count)")
+    parser.add_argument("--max-states", type=int, default=None,
+                        help="Number of states the external engine holds in memory")
+    parser.add_argument("--spill-dir", default=None,
+                        help="Directory for the external engine's files (defaults to the temporary directory)")
+    parser.add_argument("--no-screens", action="store_true",
+                        help="Search every assembly rather than screening out locked ones first")
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser("batch", help="Solve every puzzle in one or more puzzle files")
+    batch.add_argument("files", nargs="+", help="Puzzle files to solve")
+    batch.add_argument("--workers", "-w", type=int, default=None,
+                       help="Number of worker processes (defaults to the CPU count)")
+    batch.add_argument("--timeout", "-t", type=float, default=None,
+                       help="Maximum number of seconds to spend on each puzzle")
+    batch.add_argument("--output", "-o", default=None,
+                       help="Path of the JSON lines output (defaults to stdout)")
+
+    coordinate = subparsers.add_parser("coordinate",
+                                       help="Lease the puzzles in puzzle files to workers over TCP")
+    coordinate.add_argument("files", nargs="+", help="Puzzle files to solve")
+    coordinate.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    coordinate.add_argument("--port", type=int, default=8766, help="Port to listen on")
+    coordinate.add_argument("--analyze", action="store_true",
+                            help="Find and disassemble every assembly, with one unit per subtree")
+    coordinate.add_argument("--timeout", "-t", type=float, default=None,
+                            help="Maximum number of seconds to spend on each unit")
+    coordinate.add_argument("--lease-timeout", type=float, default=60.0,
+                            help="Seconds without word from a worker before its unit is reassigned")
+    coordinate.add_argument("--output", "-o", default=None,
+                            help="Path of the JSON lines output (defaults to stdout)")
+
+    work = subparsers.add_parser("work", help="Work on units leased from a coordinator")
+    work.add_argument("host", help="Address of the coordinator")
+    work.add_argument("--port", type=int, default=8766, help="Port of the coordinator")
+    work.add_argument("--workers", "-w", type=int, default=1,
+                      help="Number of worker processes")
+
+    serve = subparsers.add_parser("serve", help="Run a local solve service")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    serve.add_argument("--workers", "-w", type=int, default=None,
+                       help="Number of worker processes (defaults to the CPU count)")
+
+    estimate = subparsers.add_parser("estimate", help="Predict the cost of solving puzzles")
+    estimate.add_argument("--file", "-f", default="puzzles.json",
+                          help="Puzzle file containing the puzzles")
+    estimate.add_argument("--puzzles", "-p", type=int, nargs="+", default=None,
+                          help="Puzzles to estimate (defaults to all of them)")
+    estimate.add_argument("--probes", type=int, default=200,
+                          help="Least number of random probes of the assembly search "
+                               "(more are made until enough reach an assembly)")
+    estimate.add_argument("--seed", type=int, default=None,
+                          help="Random seed, for reproducible estimates")
+
+    design = subparsers.add_parser("design", help="Search for hard puzzle designs")
+    design.add_argument("--samples", "-n", type=int, default=1000,
+                        help="Number of shape sets to sample (or enumerate)")
+    design.add_argument("--exhaustive", action="store_true",
+                        help="Enumerate shape sets in order instead of sampling them")
+    design.add_argument("--workers", "-w", type=int, default=None,
+                        help="Number of worker processes (defaults to the CPU count)")
+    design.add_argument("--timeout", "-t", type=float, default=5.0,
+                        help="Maximum number of seconds to spend solving each set")
+    design.add_argument("--top", type=int, default=20,
+                        help="Number of designs to keep on the leaderboard")
+    design.add_argument("--seed", type=int, default=None, help="Random seed")
+    design.add_argument("--output", "-o", default=None,
+                        help="Path of the JSON report (defaults to stdout)")
+
+    convert = subparsers.add_parser("convert", help="Convert between JSON puzzle files and libraries")
+    convert.add_argument("input", help="Puzzle file to convert")
+    convert.add_argument("output", help="Path of the converted file")
+
+    verify = subparsers.add_parser("verify", help="Check the stored disassemblies in puzzle files")
+    verify.add_argument("files", nargs="+", help="Puzzle files to verify")
+    verify.add_argument("--workers", "-w", type=int, default=None,
+                        help="Number of worker processes (defaults to the CPU count)")
+    verify.add_argument("--verbose", "-v", action="store_true",
+                        help="Report every disassembly rather than only the failures")
+
+    export = subparsers.add_parser("export", help="Export the assemblies in a puzzle file as binary STL")
+    export.add_argument("file", help="Puzzle file (JSON or library) to export")
+    export.add_argument("--output-dir", "-o", default="stl",
+                        help="Directory to write the STL files to")
+    export.add_argument("--shapes", action="store_true",
+                        help="Also export each shape of every puzzle")
+    export.add_argument("--scale", type=float, default=10,
+                        help="Size of a voxel edge is twice this")
+    export.add_argument("--keyframes", choices=["json", "npz"], default=None,
+                        help="Also export each stored disassembly as keyframes in this format")
+    export.add_argument("--workers", "-w", type=int, default=None,
+                        help="Number of worker processes (defaults to the CPU count)")
+
+    benchmark = subparsers.add_parser("benchmark", help="Run performance benchmarks")
+    benchmark.add_argument("--repeats", "-r", type=int, default=5,
+                           help="Number of times to repeat each measurement")
+    benchmark.add_argument("--startup", action="store_true",
+                           help="Measure import times instead of solve times")
+    benchmark.add_argument("--file", "-f", default="puzzles.json",
+                           help="Puzzle file to benchmark")
+    benchmark.add_argument("--puzzles", "-p", type=int, nargs="+", default=None,
+                           help="Puzzles to benchmark (defaults to all of them)")
+    benchmark.add_argument("--no-visualization", action="store_true",
+                           help="Skip the visualization phase")
+    benchmark.add_argument("--output", "-o", default=None,
+                           help="Path at which to save the results")
+    benchmark.add_argument("--compare", "-c", default=None,
+                           help="Path of baseline results to compare against")
+    benchmark.add_argument("--threshold", type=float, default=0.1,
+                           help="Fractional slow-down in time or memory to report as a regression")
     return parser.parse_args()
 
 
+def batch_main(args):
+    """Solve every puzzle in the given files."""
+    from .batch import batch_solve
+
+    if args.output is None:
+        batch_solve(args.files, sys.stdout, args.workers, args.timeout)
+    else:
+        with open(args.output, "w") as f:
+            batch_solve(args.files, f, args.workers, args.timeout)
+
+
+def coordinate_main(args):
+    """Lease the units of the given files to workers until all are complete."""
+    import asyncio
+
+    from .distributed import coordinate, units_for
+
+    units = units_for(args.files, args.analyze, args.timeout)
+    if args.output is None:
+        asyncio.run(coordinate(units, sys.stdout, args.host, args.port, args.lease_timeout))
+    else:
+        with open(args.output, "w") as f:
+            asyncio.run(coordinate(units, f, args.host, args.port, args.lease_timeout))
+
+
+def work_main(args):
+    """Run worker processes until the coordinator has no more work."""
+    import multiprocessing
+
+    from .distributed import run_worker
+
+    workers = [multiprocessing.Process(target=run_worker, args=(args.host, args.port))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+
+def serve_main(args):
+    """Run the solve service until interrupted."""
+    import asyncio
+
+    from .service import serve
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+def estimate_main(args):
+    """Print a cost estimate for each puzzle as a line of JSON."""
+    from .batch import load_puzzles
+    from .estimate import estimate
+
+    puzzles = load_puzzles(args.file)
+    indices = args.puzzles if args.puzzles is not None else range(len(puzzles))
+    for i in indices:
+        puzzle = Puzzle.from_text(puzzles[i]["shapes"])
+        result = estimate(puzzle, args.probes, seed=args.seed)
+        print(json.dumps(dict(result._asdict(), file=args.file, index=i, level=puzzle.level())))
+
+
+def design_main(args):
+    """Search for hard designs and write the leaderboard as JSON."""
+    from .designer import design
+
+    report = design(args.samples, args.workers, args.timeout, leaderboard_size=args.top,
+                    seed=args.seed, exhaustive=args.exhaustive)
+    report = dict(report._asdict(), leaderboard=[entry._asdict() for entry in report.leaderboard])
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def convert_main(args):
+    """Convert a JSON puzzle file to a library or back again."""
+    from .library import is_library, json_to_library, library_to_json
+
+    if is_library(args.input):
+        count = library_to_json(args.input, args.output)
+    else:
+        count = json_to_library(args.input, args.output)
+
+    print("Converted", count, "puzzles")
+
+
+def verify_main(args):
+    """Verify puzzle files, exiting with an error if any disassembly is invalid."""
+    from .verify import run_verify
+
+    num_failed = sum(run_verify(path, sys.stdout, args.workers, args.verbose) for path in args.files)
+    if num_failed:
+        sys.exit(1)
+
+
+def export_main(args):
+    """Export every puzzle in a file as binary STL."""
+    from .export import export_library
+    from .library import open_puzzles
+
+    num_puzzles, num_files = export_library(open_puzzles(args.file), args.output_dir,
+                                            args.shapes, args.scale, args.workers,
+                                            keyframe_format=args.keyframes)
+    print("Exported", num_puzzles, "puzzles to", num_files, "files in", args.output_dir)
+
+
+def benchmark_main(args):
+    """Run the performance benchmarks."""
+    from .benchmark import run_solve, run_startup
+
+    if args.startup:
+        run_startup(sys.stdout, args.repeats)
+        return
+
+    num_regressions = run_solve(args.file, sys.stdout, args.puzzles, args.repeats,
+                                not args.no_visualization, args.output,
+                                args.compare, args.threshold)
+    if num_regressions:
+        sys.exit(1)
+
+
 def main():
     """Main function."""
     args = parse_args()
-    with open("puzzles.json") as f:
-        data = json.load(f)
-        print("Solving puzzle", args.puzzle)
-        print("Shapes:")
-        shapes = data["puzzles"][args.puzzle]["shapes"]
-        for line in shapes:
-            print(line)
-
-        print()
-        puzzle = Puzzle.from_text(shapes)
-        if args.stl:
-            for i, shape in enumerate(puzzle.shapes):
-                shape.save_as_stl(f"puzzle{args.puzzle}_shape{i}.stl")
+    if args.command == "benchmark":
+        benchmark_main(args)
+        return
+
+    if args.command == "batch":
+        batch_main(args)
+        return
+
+    if args.command == "coordinate":
+        coordinate_main(args)
+        return
+
+    if args.command == "work":
+        work_main(args)
+        return
+
+    if args.command == "serve":
+        serve_main(args)
+        return
+
+    if args.command == "estimate":
+        estimate_main(args)
+        return
+
+    if args.command == "design":
+        design_main(args)
+        return
+
+    if args.command == "convert":
+        convert_main(args)
+        return
+
+    if args.command == "verify":
+        verify_main(args)
+        return
+
+    if args.command == "export":
+        export_main(args)
+        return
+
+    from .library import open_puzzles
+
+    puzzles = open_puzzles(args.file)
+    print("Solving puzzle", args.puzzle)
+    print("Shapes:")
+    shapes = puzzles[args.puzzle]["shapes"]
+    for line in shapes:
+        print(line)
+
+    print()
+    puzzle = Puzzle.from_text(shapes)
+    if args.stl:
+        for i, shape in enumerate(puzzle.shapes):
+            shape.save_as_stl(f"puzzle{args.puzzle}_shape{i}.stl")
 
     if puzzle.level() > 1:
         print("Puzzle is level", puzzle.level(), "(Higher levels can result in longer solve times)")
 
-    solution = solve(puzzle)
+    solution = solve(puzzle, engine=args.engine, num_workers=args.workers,
+                     max_states=args.max_states, spill_dir=args.spill_dir, screens=not args.no_screens)
 
     if solution is None:
         print("No solution found")
@@ -63,9 +352,26 @@ def main():
     print("Valid assembly", solution.assembly, "found after checking", solution.num_checked,
           "assemblies" if solution.num_checked > 1 else "assembly", "over", solution.num_iterations,
           "iterations")
+    if args.stl:
+        from .export import save_state_stl
+
+        save_state_stl(f"puzzle{args.puzzle}_assembly.stl", puzzle, solution.assembly)
+
     print("Disassembly takes", len(solution.moves) - 1, "steps:")
     for i, step in enumerate(solution.moves[:-1]):
         print(f"{i}:", step[1])
+
+    if args.keyframes is not None:
+        from .export import save_keyframes
+
+        save_keyframes(args.keyframes, puzzle, solution.moves)
+        print("Keyframes written to", args.keyframes)
+        return
+
+    # visualization needs ScenePic, which is slow to import, so it is only
+    # loaded once there is a solution to show
+    from .visualization import save_scenepic
+
     path = "solution{}.html".format(args.puzzle)
-    save_scenepic(path, puzzle, solution.moves, args.sp_width, args.sp_height)
+    save_scenepic(path, puzzle, solution.moves, args.sp_width, args.sp_height, args.sp_max_frames)
     print("View solution: ./solution{}.html".format(args.puzzle))
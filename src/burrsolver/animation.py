@@ -0,0 +1,68 @@
+"""Piece transforms for animating a disassembly.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Each move of a disassembly becomes a keyframe: the transform of every
+piece in the state before the move, which pieces move, and how far they
+go. The in-between frames only differ in the translation of the moving
+pieces, so they are interpolated in one NumPy operation per move rather
+than by calling `Puzzle.do_move` and `Piece.to_transform` for each frame.
+"""
+
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from .position import Axis, Direction, Position
+from .puzzle import Move, PuzzleState
+
+
+"""The offset of a single step in each direction."""
+DIRECTION_VECTORS = np.array([Position(0, 0, 0, Axis.X).move(d, 1)[:3] for d in Direction],
+                             np.float64)
+
+
+"""The pieces of the state before a move, and how the move changes them.
+
+Attributes:
+    shapes: The shape of each piece (P,).
+    transforms: The transform of each piece before the move (P, 4, 4).
+    moving: Whether each piece moves (P,).
+    offset: The translation of the moving pieces at the end of the move (3,).
+    steps: The number of steps in the move.
+"""
+Keyframe = NamedTuple("Keyframe", [("shapes", np.ndarray),
+                                   ("transforms", np.ndarray),
+                                   ("moving", np.ndarray),
+                                   ("offset", np.ndarray),
+                                   ("steps", int)])
+
+
+def keyframes(disassembly: List[Tuple[PuzzleState, Move]]) -> List[Keyframe]:
+    """Compute a keyframe for each move of a disassembly, as returned by `solver.disassemble`."""
+    frames = []
+    for state, move in disassembly[:-1]:
+        pieces = state.pieces
+        frames.append(Keyframe(np.array([piece.shape for piece in pieces], np.int32),
+                               np.array([piece.to_transform() for piece in pieces]),
+                               np.array([piece in move.pieces for piece in pieces]),
+                               DIRECTION_VECTORS[move.direction] * move.steps,
+                               move.steps))
+
+    return frames
+
+
+def interpolate(keyframe: Keyframe, fractions: np.ndarray) -> np.ndarray:
+    """Return the piece transforms (F, P, 4, 4) at fractions of the way through a move."""
+    transforms = np.repeat(keyframe.transforms[np.newaxis], len(fractions), axis=0)
+    translations = transforms[..., :3, 3]
+    translations[:, keyframe.moving] += (fractions[:, np.newaxis] * keyframe.offset)[:, np.newaxis]
+    return transforms
+
+
+def frame_indices(num_frames: int, max_frames: int = None) -> np.ndarray:
+    """Choose evenly spaced frames to keep within a frame budget (keeping all if None)."""
+    if max_frames is None or num_frames <= max_frames:
+        return np.arange(num_frames)
+
+    return np.unique(np.linspace(0, num_frames - 1, max(max_frames, 1)).round().astype(np.int64))
@@ -20,7 +20,7 @@ def reconstruct_path(came_from, current):
 Step = namedtuple("Step", ["state", "edge"])
 
 
-def astar(distance, heuristic, neighbors, is_goal, start):
+def astar(distance, heuristic, neighbors, is_goal, start, callback=None, stats=None):
     """A* pathfinding algorithm.
 
     Description:
@@ -37,6 +37,10 @@ def astar(distance, heuristic, neighbors, is_goal, start):
         neighbors: Function to get the neighboring states of a given state.
         is_goal: Function to check if a state is the goal.
         start: The starting state.
+        callback: Optional function called with the size of the frontier
+                  each time a state is expanded.
+        stats: Optional `stats.Statistics` which records the expansions,
+               frontier sizes and revisits.
     """
     frontier = []
     heappush(frontier, (0, 0, start))
@@ -49,9 +53,19 @@ def astar(distance, heuristic, neighbors, is_goal, start):
         if is_goal(x):
             return reconstruct_path(came_from, x)
 
+        if callback is not None:
+            callback(len(frontier))
+
+        if stats is not None:
+            stats.expand(len(frontier))
+
         for e, y in neighbors(x):
             new_cost = cost_so_far[x] + distance(x, y)
-            if new_cost < cost_so_far.get(y, float("inf")):
+            is_better = new_cost < cost_so_far.get(y, float("inf"))
+            if stats is not None:
+                stats.neighbor(not is_better)
+
+            if is_better:
                 cost_so_far[y] = new_cost
                 h = heuristic(y)
                 priority = new_cost + h
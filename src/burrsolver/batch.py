@@ -0,0 +1,214 @@
+"""Batch solving of puzzle files.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Every puzzle in one or more puzzle files is solved in a pool of worker
+processes, and one JSON object is written per line as each result comes in,
+for example:
+
+{"file": "puzzles.json", "index": 0, "status": "solved", "level": 1, ...}
+
+The status is one of "solved", "unsolvable" (no assembly can be
+disassembled), "timeout" or "error".
+
+The puzzles are streamed rather than all read up front, so that a large
+library is never held in memory: they are taken a segment at a time, the
+shape tables for a segment are built and shared with a pool of workers,
+and only a bounded number of tasks are in flight at once. `submit_bounded`
+and `chunks` are also used to stream work through the pools of `verify`,
+`export` and `designer`.
+"""
+
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Sequence, TextIO, Tuple
+
+from .budget import Budget
+from .library import open_puzzles
+from .solver import PartialResult, solve
+from .tables import attach_worker, build_tables, puzzle_from_text, SharedTables
+
+
+Task = NamedTuple("Task", [("file", str),
+                           ("index", int),
+                           ("shapes", List[str]),
+                           ("timeout", float)])
+
+
+def load_puzzles(path: str) -> Sequence[dict]:
+    """Load the puzzle entries from a puzzle file (JSON or a library)."""
+    return open_puzzles(path)
+
+
+"""The number of puzzles whose shape tables are built and shared at a time."""
+SEGMENT_SIZE = 4096
+
+
+def tasks_for(path: str, timeout: float = None) -> Iterator[Task]:
+    """Generate a task for every puzzle in a file."""
+    for i, info in enumerate(load_puzzles(path)):
+        yield Task(path, i, info["shapes"], timeout)
+
+
+def chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Split a stream of items into lists of (at most) the given size."""
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def submit_bounded(executor: Executor, fn: Callable, items: Iterator, *args,
+                   max_pending: int = None) -> Iterator[Tuple[Any, Future]]:
+    """Submit `fn(item, *args)` for a stream of items, yielding each item and its future in order.
+
+    Description:
+        Unlike `executor.map`, at most `max_pending` items (by default twice
+        the number of CPUs) are in flight at once, so the items are read as
+        the results are consumed rather than all up front. If the pool
+        breaks, the item which could not be submitted is yielded with a
+        failed future and no more items are taken, so that the rest can be
+        submitted to a new pool.
+    """
+    max_pending = max_pending or 2 * os.cpu_count()
+    pending = deque()
+    for item in items:
+        if len(pending) >= max_pending:
+            yield pending.popleft()
+
+        try:
+            future = executor.submit(fn, item, *args)
+        except BrokenProcessPool as e:
+            future = Future()
+            future.set_exception(e)
+            pending.append((item, future))
+            break
+
+        pending.append((item, future))
+
+    while pending:
+        yield pending.popleft()
+
+
+def solve_task(task: Task) -> dict:
+    """Solve a single puzzle and return the result record."""
+    result = {"file": task.file, "index": task.index, "shapes": task.shapes}
+    start = time.perf_counter()
+    budget = None if task.timeout is None else Budget(seconds=task.timeout)
+    try:
+        puzzle = puzzle_from_text(task.shapes)
+        result["level"] = puzzle.level()
+        solution = solve(puzzle, budget)
+        if isinstance(solution, PartialResult):
+            result["status"] = "timeout"
+            result["num_iterations"] = solution.num_iterations
+            result["num_checked"] = solution.num_checked
+        else:
+            result["status"] = "solved"
+            result["assembly"] = str(solution.assembly)
+            result["moves"] = [str(move) for _, move in solution.moves[:-1]]
+            result["num_iterations"] = solution.num_iterations
+            result["num_checked"] = solution.num_checked
+    except ValueError as e:
+        if str(e) == "No valid assembly found":
+            result["status"] = "unsolvable"
+        else:
+            result["status"] = "error"
+            result["error"] = str(e)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = repr(e)
+
+    result["time"] = time.perf_counter() - start
+    return result
+
+
+def stream_tasks(paths: List[str], timeout: float, on_error: Callable[[dict], None]) -> Iterator[Task]:
+    """Generate the tasks for every puzzle in the files, reporting files which cannot be read."""
+    for path in paths:
+        try:
+            yield from tasks_for(path, timeout)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            on_error({"file": path, "status": "error", "error": f"Unable to load puzzles: {e!r}"})
+
+
+def solve_segment(tasks: List[Task], write: Callable[[dict], None], num_workers: int = None):
+    """Solve a segment of the tasks in a process pool, writing each result."""
+    max_pending = 2 * (num_workers or os.cpu_count())
+    # the orientations of every shape are worked out once, here, and shared
+    # with the workers rather than each worker finding them for itself
+    with SharedTables.create(build_tables([text for task in tasks for text in task.shapes])) as tables:
+        # if a worker dies the pool breaks and every unfinished task fails with it,
+        # so those tasks are run again one at a time to find the culprit, and the
+        # rest of the segment goes to a new pool
+        retry: List[Task] = []
+        remaining = iter(tasks)
+        broken = True
+        while broken:
+            broken = False
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=attach_worker,
+                                     initargs=(tables.name,)) as executor:
+                for task, future in submit_bounded(executor, solve_task, remaining, max_pending=max_pending):
+                    try:
+                        write(future.result())
+                    except BrokenProcessPool:
+                        broken = True
+                        retry.append(task)
+
+        executor = None
+        for task in retry:
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=1, initializer=attach_worker,
+                                               initargs=(tables.name,))
+
+            try:
+                write(executor.submit(solve_task, task).result())
+            except BrokenProcessPool:
+                executor.shutdown()
+                executor = None
+                write({"file": task.file, "index": task.index, "shapes": task.shapes,
+                       "status": "error", "error": "Worker process died"})
+
+        if executor is not None:
+            executor.shutdown()
+
+
+def batch_solve(paths: List[str], output: TextIO = sys.stdout,
+                num_workers: int = None, timeout: float = None,
+                segment_size=SEGMENT_SIZE) -> int:
+    """Solve every puzzle in the given files using a process pool.
+
+    Args:
+        paths: The puzzle files to solve.
+        output: The stream to which JSON lines are written.
+        num_workers: The number of worker processes (defaults to the CPU count).
+        timeout: The maximum number of seconds to spend on each puzzle.
+        segment_size: The number of puzzles read, and whose shape tables are
+                      shared with the workers, at a time.
+
+    Returns:
+        The number of puzzles which were solved.
+    """
+    num_solved = 0
+
+    def write(result: dict):
+        nonlocal num_solved
+        if result["status"] == "solved":
+            num_solved += 1
+
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+    for segment in chunks(stream_tasks(paths, timeout, write), segment_size):
+        solve_segment(segment, write, num_workers)
+
+    return num_solved
@@ -0,0 +1,307 @@
+"""Performance benchmarks.
+
+NB: Nothing in this module is in scope for the Tripos.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Mapping, NamedTuple, TextIO, Tuple
+
+
+"""Modules which make up the solver core."""
+CORE_MODULES = ["burrsolver.voxel", "burrsolver.position", "burrsolver.piece",
+                "burrsolver.shape", "burrsolver.puzzle", "burrsolver.astar",
+                "burrsolver.solver"]
+
+"""Modules which the solver core must not import."""
+HEAVY_MODULES = ["scenepic", "numpy"]
+
+
+def import_time(modules: List[str]) -> float:
+    """Time how long a fresh interpreter takes to import some modules.
+
+    Returns:
+        The time in seconds, excluding the start-up of the interpreter itself.
+    """
+    code = ("import time; start = time.perf_counter(); "
+            + "; ".join(f"import {module}" for module in modules)
+            + "; print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True)
+    return float(result.stdout.split()[-1])
+
+
+def loaded_modules(modules: List[str], candidates: List[str]) -> List[str]:
+    """Return which candidates are loaded by importing some modules in a fresh interpreter."""
+    code = ("import sys; "
+            + "; ".join(f"import {module}" for module in modules)
+            + f"; print(' '.join(m for m in {candidates!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True)
+    return result.stdout.split()
+
+
+def startup_benchmark(repeats=5) -> Mapping[str, float]:
+    """Measure the median import time of the solver core and of the visualization."""
+    targets = {
+        "core": CORE_MODULES,
+        "cli": ["burrsolver"],
+        "visualization": ["burrsolver.visualization"],
+    }
+    return {name: statistics.median(import_time(modules) for _ in range(repeats))
+            for name, modules in targets.items()}
+
+
+def run_startup(output: TextIO = sys.stdout, repeats=5):
+    """Print the start-up benchmark as JSON."""
+    start = time.perf_counter()
+    results = startup_benchmark(repeats)
+    results["heavy_modules_in_core"] = loaded_modules(CORE_MODULES + ["burrsolver"], HEAVY_MODULES)
+    results["benchmark_time"] = time.perf_counter() - start
+    output.write(json.dumps(results, indent=2) + "\n")
+
+
+"""The phases of a solve which are measured by the solve benchmark."""
+PHASES = ["precompute", "assembly", "screen", "disassemble", "visualization"]
+
+"""The measurements made for each phase."""
+Measurement = NamedTuple("Measurement", [("time", float),
+                                         ("peak_memory", int),
+                                         ("num_checked", int),
+                                         ("num_expanded", int),
+                                         ("num_valid_moves", int)])
+
+
+"""The measurements made for each call to `disassemble`, with the index of
+its assembly among those found by the assembly search."""
+Call = NamedTuple("Call", [("assembly", int),
+                           ("time", float),
+                           ("num_expanded", int)])
+
+
+def run_phases(shapes: List[str], visualize: bool,
+               phase_done: Callable[[str], None]) -> Mapping[str, dict]:
+    """Solve a puzzle, measuring the time and work of each phase.
+
+    Description:
+        This mirrors `solver.solve`, but drives the assembly search, the
+        screens and the disassembly separately so that they can be measured
+        separately. The times spent in `screens.screen` and in `disassemble`
+        are summed over all calls, and so the assembly time excludes them.
+        Each call to `disassemble` is also recorded on its own, as a `Call`
+        in the "calls" of the disassemble phase.
+
+    Args:
+        shapes: The shape strings of the puzzle.
+        visualize: Whether to include the visualization phase.
+        phase_done: Called with the name of each phase as it finishes.
+
+    Returns:
+        A mapping from phase to its time and counts.
+    """
+    from .puzzle import Puzzle
+    from .screens import screen
+    from .solver import AssemblySearch, disassemble
+    from .stats import Statistics
+    from .voxel import move_voxel
+
+    results = {}
+    # the voxel cache would otherwise hide the precomputation cost
+    move_voxel.cache_clear()
+    start = time.perf_counter()
+    puzzle = Puzzle.from_text(shapes)
+    results["precompute"] = {"time": time.perf_counter() - start}
+    phase_done("precompute")
+
+    stats = Statistics()
+    search = AssemblySearch(puzzle)
+    screen_time = 0
+    num_screened = 0
+    calls = []
+    moves = None
+    start = time.perf_counter()
+    for index, assembly in enumerate(search):
+        assembled = puzzle.to_state(assembly)
+        screen_start = time.perf_counter()
+        passed = screen(assembled, stats)
+        screen_time += time.perf_counter() - screen_start
+        num_screened += 1
+        if not passed:
+            continue
+
+        disassemble_start = time.perf_counter()
+        moves = disassemble(assembled, stats=stats)
+        calls.append(Call(index, time.perf_counter() - disassemble_start, stats.expanded_per_assembly[-1]))
+        if moves:
+            break
+
+    if not moves:
+        raise ValueError("No valid assembly found")
+
+    disassemble_time = sum(call.time for call in calls)
+    results["assembly"] = {"time": time.perf_counter() - start - screen_time - disassemble_time,
+                           "num_checked": search.num_checked}
+    results["screen"] = {"time": screen_time, "num_checked": num_screened}
+    results["disassemble"] = {"time": disassemble_time,
+                              "num_checked": len(calls),
+                              "num_expanded": stats.num_expanded,
+                              "num_valid_moves": stats.num_move_states,
+                              "calls": calls}
+    phase_done("disassemble")
+
+    if visualize:
+        from .visualization import save_scenepic
+
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as folder:
+            save_scenepic(os.path.join(folder, "solution.html"), puzzle, moves, 900, 600)
+
+        results["visualization"] = {"time": time.perf_counter() - start}
+        phase_done("visualization")
+
+    return results
+
+
+def peak_memory(shapes: List[str], visualize: bool) -> Mapping[str, int]:
+    """Measure the peak memory allocated by each phase of a solve.
+
+    Description:
+        Tracing allocations slows Python down considerably, so this is
+        done in a separate run from the timings.
+    """
+    peaks = {}
+
+    def phase_done(phase: str):
+        peaks[phase] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    try:
+        run_phases(shapes, visualize, phase_done)
+    finally:
+        tracemalloc.stop()
+
+    # assembly, screening and disassembly are interleaved, so they share a peak
+    if "disassemble" in peaks:
+        peaks["assembly"] = peaks["screen"] = peaks["disassemble"]
+
+    return peaks
+
+
+def benchmark_puzzle(shapes: List[str], repeats=5,
+                     visualize=True) -> Tuple[Mapping[str, Measurement], List[Call]]:
+    """Benchmark each phase of solving a single puzzle.
+
+    Args:
+        shapes: The shape strings of the puzzle.
+        repeats: The number of timed runs (the median time is reported).
+        visualize: Whether to include the visualization phase.
+
+    Returns:
+        A mapping from phase to its measurements, and the measurements of
+        each call to `disassemble`.
+    """
+    runs = [run_phases(shapes, visualize, lambda phase: None) for _ in range(repeats)]
+    peaks = peak_memory(shapes, visualize)
+    results = {}
+    for phase in PHASES:
+        if phase not in runs[0]:
+            continue
+
+        first = runs[0][phase]
+        results[phase] = Measurement(statistics.median(run[phase]["time"] for run in runs),
+                                     peaks.get(phase, 0),
+                                     first.get("num_checked", 0),
+                                     first.get("num_expanded", 0),
+                                     first.get("num_valid_moves", 0))
+
+    # the calls are the same in every run, so only their times vary
+    calls = [Call(call.assembly, statistics.median(run["disassemble"]["calls"][i].time for run in runs),
+                  call.num_expanded)
+             for i, call in enumerate(runs[0]["disassemble"]["calls"])]
+    return results, calls
+
+
+def solve_benchmark(path: str, puzzles: List[int] = None,
+                    repeats=5, visualize=True) -> Mapping[str, Mapping[str, dict]]:
+    """Benchmark every puzzle (or a selection) in a puzzle file.
+
+    Returns:
+        A mapping from puzzle index (as a string, so that it survives JSON)
+        to phase to measurements. The disassemble phase also lists its
+        calls, which `compare` ignores.
+    """
+    with open(path) as f:
+        data = json.load(f)["puzzles"]
+
+    if puzzles is None:
+        puzzles = range(len(data))
+
+    results = {}
+    for i in puzzles:
+        measurements, calls = benchmark_puzzle(data[i]["shapes"], repeats, visualize)
+        results[str(i)] = {phase: measurement._asdict() for phase, measurement in measurements.items()}
+        results[str(i)]["disassemble"]["calls"] = [call._asdict() for call in calls]
+
+    return results
+
+
+def compare(results: Mapping[str, Mapping[str, dict]],
+            baseline: Mapping[str, Mapping[str, dict]],
+            threshold=0.1) -> List[str]:
+    """Compare benchmark results against a baseline.
+
+    Description:
+        Times and memory are noisy and so are only flagged if they are
+        worse by more than the threshold (a fraction of the baseline).
+        The counts are deterministic, so any increase is flagged.
+
+    Returns:
+        A description of each regression.
+    """
+    regressions = []
+    for puzzle, phases in results.items():
+        for phase, measurement in phases.items():
+            if phase not in baseline.get(puzzle, {}):
+                continue
+
+            expected = baseline[puzzle][phase]
+            for field in Measurement._fields:
+                value, base = measurement[field], expected[field]
+                limit = base * (1 + threshold) if field in ("time", "peak_memory") else base
+                if value > limit:
+                    regressions.append(f"puzzle {puzzle} {phase} {field}: {base} -> {value}")
+
+    return regressions
+
+
+def run_solve(path: str, output: TextIO = sys.stdout, puzzles: List[int] = None,
+              repeats=5, visualize=True, save: str = None,
+              baseline: str = None, threshold=0.1) -> int:
+    """Run the solve benchmark, optionally saving it or comparing it to a baseline.
+
+    Returns:
+        The number of regressions found.
+    """
+    results = solve_benchmark(path, puzzles, repeats, visualize)
+    output.write(json.dumps(results, indent=2) + "\n")
+    if save is not None:
+        with open(save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is None:
+        return 0
+
+    with open(baseline) as f:
+        regressions = compare(results, json.load(f), threshold)
+
+    for regression in regressions:
+        output.write("REGRESSION " + regression + "\n")
+
+    return len(regressions)
@@ -0,0 +1,285 @@
+"""Batched breadth-first disassembly.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Every move in `solver.disassemble` costs 1, so the shortest disassembly can
+also be found by a breadth-first search, one layer of states at a time.
+This version holds each layer as NumPy arrays and expands all of it at once,
+rather than pushing and popping single states through dictionaries and a
+heap.
+
+During a disassembly the pieces only ever translate (or leave), so a state
+is given by whether each piece of the assembly is still present and, if it
+is, its offset from the assembly in steps. A present piece always has a
+voxel inside the puzzle, so each offset lies in [-5, 5]^3, and a piece has
+one of 11^3 offsets or is absent (code 11^3). The six codes are packed into
+a single unsigned 64-bit integer (1332^6 < 2^64), so duplicate states are
+removed from a layer with `np.unique` and against earlier layers with a
+binary search of their sorted keys.
+
+Moves are found as in `Puzzle.valid_moves`, using two lookup tables: whether
+two pieces collide given the offset between them, and whether a piece is
+still inside the puzzle at an offset. A group of pieces can move `t` steps
+in a direction if no piece of the group collides with a piece outside it at
+any of the steps up to `t`, which for a whole layer is a handful of table
+lookups and a boolean matrix product with the group membership matrix.
+"""
+
+from itertools import combinations
+import time
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from .piece import Piece
+from .position import Axis, Direction, Position, SIZE
+from .puzzle import Move, Puzzle, PuzzleState
+
+
+"""Offsets lie in [-REACH, REACH] steps along each axis."""
+REACH = 5
+SPAN = 2 * REACH + 1
+ABSENT = SPAN ** 3
+RADIX = ABSENT + 1
+
+"""The lookup tables also cover offsets one step further out, where nothing collides or is inside."""
+TABLE_REACH = REACH + 1
+TABLE_SPAN = 2 * TABLE_REACH + 1
+
+"""The most steps a move can take (out of the puzzle)."""
+MAX_STEPS = SPAN
+
+"""The offset of a single step in each direction."""
+STEPS = np.array([[c // SIZE for c in Position(0, 0, 0, Axis.X).move(d, 1)[:3]] for d in Direction], np.int64)
+
+"""The number of states expanded at once, which bounds the size of the temporary arrays."""
+CHUNK_SIZE = 4096
+
+
+"""A layer of the search.
+
+Attributes:
+    keys: The packed states (N,).
+    offsets: The offset of each piece (N, P, 3).
+    present: Whether each piece is present (N, P).
+    parents: The index of each state's parent in the previous layer (N,).
+    directions: The direction of the move from the parent (N,).
+    groups: The index of the group of pieces which moved (N,).
+    steps: The number of steps moved (N,).
+"""
+Layer = NamedTuple("Layer", [("keys", np.ndarray),
+                             ("offsets", np.ndarray),
+                             ("present", np.ndarray),
+                             ("parents", np.ndarray),
+                             ("directions", np.ndarray),
+                             ("groups", np.ndarray),
+                             ("steps", np.ndarray)])
+
+
+def table_index(offsets: np.ndarray) -> np.ndarray:
+    """Return the flat index of each offset into a lookup table, clipping those beyond it to its border."""
+    shifted = np.clip(offsets + TABLE_REACH, 0, TABLE_SPAN - 1)
+    return (shifted[..., 0] * TABLE_SPAN + shifted[..., 1]) * TABLE_SPAN + shifted[..., 2]
+
+
+class MoveTables:
+    """The lookup tables for the pieces of an assembly."""
+
+    def __init__(self, puzzle: Puzzle):
+        """Constructor.
+
+        Args:
+            puzzle: The puzzle, whose pieces are the assembly.
+        """
+        self.pieces = puzzle.pieces
+        num_pieces = len(self.pieces)
+        cells = [(np.array(puzzle.voxels_for(piece), np.int64) + 5) // 2 for piece in self.pieces]
+        offsets = np.stack(np.meshgrid(*[np.arange(-TABLE_REACH, TABLE_REACH + 1)] * 3, indexing="ij"), -1)
+        offsets = offsets.reshape(-1, 3)
+
+        # piece i at offset oi collides with piece j at oj if oi - oj = cj - ci for some of their cells,
+        # all of which are within REACH steps
+        self.collide = np.zeros((num_pieces, num_pieces, TABLE_SPAN ** 3), bool)
+        for i in range(num_pieces):
+            for j in range(num_pieces):
+                if i != j:
+                    self.collide[i, j, table_index(cells[j][np.newaxis] - cells[i][:, np.newaxis])] = True
+
+        self.inside = np.array([(((c[np.newaxis] + offsets[:, np.newaxis]) >= 0)
+                                 & ((c[np.newaxis] + offsets[:, np.newaxis]) < 6)).all(-1).any(-1)
+                                for c in cells]).reshape(num_pieces, -1)
+
+        self.groups = [group for size in (1, 2, 3) for group in combinations(range(num_pieces), size)]
+        self.members = np.zeros((len(self.groups), num_pieces), bool)
+        for g, group in enumerate(self.groups):
+            self.members[g, list(group)] = True
+
+        self.sizes = self.members.sum(axis=1)
+        # pairs (i, j) with i in the group and j outside it
+        self.pairs = (self.members[:, :, np.newaxis] & ~self.members[:, np.newaxis, :]).reshape(len(self.groups), -1)
+        self.powers = RADIX ** np.arange(num_pieces, dtype=np.uint64)
+
+    def pack(self, offsets: np.ndarray, present: np.ndarray) -> np.ndarray:
+        """Pack states into 64-bit keys."""
+        shifted = offsets + REACH
+        index = (shifted[..., 0] * SPAN + shifted[..., 1]) * SPAN + shifted[..., 2]
+        codes = np.where(present, index, ABSENT).astype(np.uint64)
+        return (codes * self.powers).sum(axis=-1, dtype=np.uint64)
+
+    def is_inside(self, offsets: np.ndarray) -> np.ndarray:
+        """Return whether each piece (..., P) is inside the puzzle at its offset (..., P, 3)."""
+        index = table_index(offsets)
+        return self.inside[np.arange(len(self.pieces)), index]
+
+    def blocked(self, relative: np.ndarray, both: np.ndarray, t: int) -> np.ndarray:
+        """Return whether each group is blocked after moving `t` steps in each direction (N, 6, G).
+
+        Args:
+            relative: The offset of each piece from each other piece (N, P, P, 3).
+            both: Whether each pair of pieces is present (N, P, P).
+            t: The number of steps.
+        """
+        num_states, num_pieces = both.shape[:2]
+        index = table_index(relative[:, np.newaxis] + t * STEPS[np.newaxis, :, np.newaxis, np.newaxis])
+        i = np.arange(num_pieces)[:, np.newaxis]
+        j = np.arange(num_pieces)[np.newaxis]
+        collide = self.collide[i, j, index] & both[:, np.newaxis]
+        return collide.reshape(num_states, len(STEPS), -1) @ self.pairs.T
+
+    def group_inside(self, offsets: np.ndarray, present: np.ndarray, t: int) -> np.ndarray:
+        """Return whether any piece of each group is inside after moving `t` steps (N, 6, G)."""
+        moved = offsets[:, np.newaxis] + t * STEPS[np.newaxis, :, np.newaxis]
+        inside = self.is_inside(moved) & present[:, np.newaxis]
+        return inside @ self.members.T
+
+    def moves(self, offsets: np.ndarray, present: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Find every move from a batch of states.
+
+        Returns:
+            The state, direction, group and steps of each move.
+        """
+        num_present = present.sum(axis=1)
+        max_size = np.where(num_present == 6, 3, np.where(num_present > 3, 2, 1))
+        valid = ((present @ self.members.T.astype(np.int64)) == self.sizes) & (self.sizes <= max_size[:, np.newaxis])
+
+        relative = offsets[:, :, np.newaxis] - offsets[:, np.newaxis]
+        both = present[:, :, np.newaxis] & present[:, np.newaxis]
+        movable = valid[:, np.newaxis] & ~self.blocked(relative, both, 1)
+        steps = np.where(movable, 1, 0)
+        active = movable.copy()
+        rows = np.arange(len(present))
+        for t in range(1, MAX_STEPS + 1):
+            # only the states with a group still moving out need to be looked at
+            if t > 1:
+                active[rows] &= ~self.blocked(relative[rows], both[rows], t)
+
+            out = np.zeros_like(active)
+            out[rows] = active[rows] & ~self.group_inside(offsets[rows], present[rows], t)
+            steps[out] = t
+            active &= ~out
+            rows = np.nonzero(active.any(axis=(1, 2)))[0]
+            if len(rows) == 0:
+                break
+
+        n, d, g = np.nonzero(movable)
+        return n, d, g, steps[n, d, g]
+
+    def piece(self, i: int, offset: np.ndarray) -> Piece:
+        """Return piece i of the assembly moved by an offset."""
+        piece = self.pieces[i]
+        x, y, z, axis = piece.position
+        dx, dy, dz = offset.tolist()
+        return Piece(piece.shape, Position(x + dx * SIZE, y + dy * SIZE, z + dz * SIZE, axis), piece.orientation)
+
+    def state(self, offsets: np.ndarray, present: np.ndarray) -> PuzzleState:
+        """Return the puzzle state for the offsets and presence of the pieces."""
+        return PuzzleState(tuple(self.piece(i, offsets[i]) for i in np.nonzero(present)[0]))
+
+
+def expand(tables: MoveTables, layer: Layer, visited: np.ndarray, chunk_size: int) -> Layer:
+    """Expand a layer, returning the states which have not been seen before."""
+    parts = []
+    for start in range(0, len(layer.keys), chunk_size):
+        offsets = layer.offsets[start:start + chunk_size]
+        present = layer.present[start:start + chunk_size]
+        n, d, g, steps = tables.moves(offsets, present)
+        members = tables.members[g]
+        new_offsets = offsets[n] + (steps[:, np.newaxis] * STEPS[d])[:, np.newaxis] * members[..., np.newaxis]
+        # pieces of the group which are no longer inside the puzzle are removed
+        new_present = present[n] & ~(members & ~tables.is_inside(new_offsets))
+        new_offsets[~new_present] = 0
+        parts.append((tables.pack(new_offsets, new_present), new_offsets, new_present, n + start, d, g, steps))
+
+    keys, offsets, present, parents, directions, groups, steps = [np.concatenate(arrays) for arrays in zip(*parts)]
+    keys, first = np.unique(keys, return_index=True)
+    position = np.minimum(np.searchsorted(visited, keys), max(len(visited) - 1, 0))
+    new = visited[position] != keys if len(visited) else np.ones(len(keys), bool)
+    keep = first[new]
+    return Layer(keys[new], offsets[keep], present[keep], parents[keep], directions[keep], groups[keep], steps[keep])
+
+
+def bfs_disassemble(puzzle: Puzzle, callback=None, stats=None,
+                    chunk_size=CHUNK_SIZE) -> List[Tuple[PuzzleState, Move]]:
+    """Find a shortest disassembly with a batched breadth-first search.
+
+    Args:
+        puzzle: The puzzle, whose pieces are the assembly.
+        callback: Optional function called with the size of the layer for
+                  each state expanded.
+        stats: Optional `stats.Statistics` which records the expansions
+               and the number of states searched per second.
+        chunk_size: The number of states expanded at once.
+
+    Returns:
+        The disassembly as returned by `solver.disassemble`, or None if the
+        assembly cannot be taken apart. It is as short as the one found by
+        A*, though where there are several the two may differ.
+    """
+    if not puzzle.pieces:
+        return [(puzzle.state(), None)]
+
+    tables = MoveTables(puzzle)
+    num_pieces = len(puzzle.pieces)
+    goal = tables.pack(np.zeros((num_pieces, 3), np.int64), np.zeros(num_pieces, bool))
+    offsets = np.zeros((1, num_pieces, 3), np.int64)
+    present = np.ones((1, num_pieces), bool)
+    empty = np.zeros(1, np.int64)
+    layers = [Layer(tables.pack(offsets, present), offsets, present, empty, empty, empty, empty)]
+    visited = layers[0].keys
+    start = time.perf_counter()
+    while goal not in layers[-1].keys:
+        layer = layers[-1]
+        if len(layer.keys) == 0:
+            if stats is not None:
+                stats.searched(len(visited), time.perf_counter() - start)
+
+            return None
+
+        for _ in range(len(layer.keys)):
+            if callback is not None:
+                callback(len(layer.keys))
+
+            if stats is not None:
+                stats.expand(len(layer.keys))
+
+        layers.append(expand(tables, layer, visited, chunk_size))
+        visited = np.sort(np.concatenate([visited, layers[-1].keys]))
+
+    if stats is not None:
+        stats.searched(len(visited), time.perf_counter() - start)
+
+    return reconstruct_path(tables, layers, int(np.nonzero(layers[-1].keys == goal)[0][0]))
+
+
+def reconstruct_path(tables: MoveTables, layers: List[Layer], index: int) -> List[Tuple[PuzzleState, Move]]:
+    """Follow the parents of a state in the last layer back to the assembly."""
+    last = layers[-1]
+    path = [(tables.state(last.offsets[index], last.present[index]), None)]
+    for layer, previous in zip(layers[:0:-1], layers[-2::-1]):
+        parent = layer.parents[index]
+        state = tables.state(previous.offsets[parent], previous.present[parent])
+        pieces = frozenset(tables.piece(i, previous.offsets[parent, i]) for i in tables.groups[layer.groups[index]])
+        path.append((state, Move(pieces, Direction(int(layer.directions[index])), int(layer.steps[index]))))
+        index = parent
+
+    return path[::-1]
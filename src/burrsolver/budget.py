@@ -0,0 +1,159 @@
+"""Solve budgets, cancellation and progress reporting.
+
+NB: Nothing in this module is in scope for the Tripos.
+"""
+
+import os
+import sys
+import time
+from typing import Callable, NamedTuple
+
+
+class Budget(NamedTuple("Budget", [("seconds", float),
+                                   ("nodes", int),
+                                   ("memory", int)])):
+    """Limits on the resources a solve may use.
+
+    Args:
+        seconds: Wall-clock time limit.
+        nodes: Limit on the number of search nodes, that is assembly search
+               iterations plus A* node expansions.
+        memory: Limit on the resident memory of the process in bytes.
+
+    Any of the limits can be None, in which case it is not enforced.
+    """
+
+
+Budget.__new__.__defaults__ = (None, None, None)
+
+
+Progress = NamedTuple("Progress", [("num_iterations", int),
+                                   ("num_checked", int),
+                                   ("num_expanded", int),
+                                   ("assembly_frontier", int),
+                                   ("astar_frontier", int),
+                                   ("elapsed", float)])
+
+
+class BudgetExceeded(Exception):
+    """Raised inside the search when a budget runs out or the solve is cancelled.
+
+    The reason is one of "time", "nodes", "memory" or "cancelled".
+    """
+
+    def __init__(self, reason: str):
+        """Constructor."""
+        super().__init__(reason)
+        self.reason = reason
+
+
+def resident_memory() -> int:
+    """Return the resident memory of this process in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # peak rather than current usage, in kilobytes except on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class Monitor:
+    """Counts search nodes and enforces budgets during a solve.
+
+    Description:
+        The search calls `iteration` for every step of the assembly search
+        and `expand` for every A* node expansion. Looking at the clock,
+        the cancellation token and the memory use is comparatively
+        expensive, so this is only done every `CHECK_EVERY` nodes.
+    """
+
+    CHECK_EVERY = 256
+
+    def __init__(self, budget: Budget = None, cancel=None,
+                 progress: Callable[[Progress], None] = None,
+                 progress_interval=1.0):
+        """Constructor.
+
+        Args:
+            budget: The limits for the solve.
+            cancel: Cancellation token, i.e. any object with an `is_set()` method
+                    such as a `threading.Event` or `multiprocessing.Event`.
+            progress: Called periodically with the progress of the solve.
+            progress_interval: Seconds between calls to `progress`.
+        """
+        self.budget = budget or Budget()
+        self.cancel = cancel
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.start = time.perf_counter()
+        self.last_progress = self.start
+        self.num_iterations = 0
+        self.num_checked = 0
+        self.num_expanded = 0
+        self.assembly_frontier = 0
+        self.astar_frontier = 0
+        self.countdown = self.CHECK_EVERY
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the solve started."""
+        return time.perf_counter() - self.start
+
+    def snapshot(self) -> Progress:
+        """Return the progress of the solve so far."""
+        return Progress(self.num_iterations, self.num_checked, self.num_expanded,
+                        self.assembly_frontier, self.astar_frontier, self.elapsed)
+
+    def iteration(self, num_iterations: int, num_checked: int, frontier_size: int):
+        """Record an iteration of the assembly search."""
+        self.num_iterations = num_iterations
+        self.num_checked = num_checked
+        self.assembly_frontier = frontier_size
+        self.tick()
+
+    def expand(self, frontier_size: int):
+        """Record an A* node expansion."""
+        self.num_expanded += 1
+        self.astar_frontier = frontier_size
+        self.tick()
+
+    def tick(self):
+        """Count a node and check the budgets every so often."""
+        self.countdown -= 1
+        if self.countdown == 0:
+            self.countdown = self.CHECK_EVERY
+            self.check()
+
+    def check(self):
+        """Check the budgets and report progress if it is due.
+
+        Raises:
+            BudgetExceeded: If a budget has run out or the solve was cancelled.
+        """
+        budget = self.budget
+        if self.cancel is not None and self.cancel.is_set():
+            raise BudgetExceeded("cancelled")
+
+        now = time.perf_counter()
+        if budget.seconds is not None and now - self.start > budget.seconds:
+            raise BudgetExceeded("time")
+
+        if budget.nodes is not None and self.num_iterations + self.num_expanded > budget.nodes:
+            raise BudgetExceeded("nodes")
+
+        if budget.memory is not None:
+            memory = resident_memory()
+            if memory is not None and memory > budget.memory:
+                raise BudgetExceeded("memory")
+
+        if self.progress is not None and now - self.last_progress >= self.progress_interval:
+            self.last_progress = now
+            self.progress(self.snapshot())
@@ -0,0 +1,175 @@
+"""Canonical forms for shapes and puzzles.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+The same physical piece can be written down in eight different ways, one
+for each orientation of the 2x2x6 bar (see `Voxel.move_to`), and the same
+puzzle can list its pieces in any order. The canonical form of a shape is
+the lexicographically smallest string (equivalently, the smallest 24-bit
+occupancy mask) over its eight orientations, and the canonical form of a
+puzzle is the sorted tuple of the canonical forms of its shapes, which is
+the smallest encoding over all permutations of its pieces.
+
+Masks are permuted using one lookup table per byte of the mask, so the
+canonical form of a shape costs 24 table lookups and the whole computation
+can be vectorized with NumPy for deduplicating large batches of puzzles.
+"""
+
+from typing import List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .piece import Piece
+from .position import Axis, Position
+from .shape import index_voxel, mask_from_text, mask_to_text, NUM_VOXELS, voxel_index
+
+
+NUM_ORIENTATIONS = 8
+
+PuzzleKey = Tuple[int, ...]
+
+"""For each shape, its slot in the canonical puzzle and the orientation which
+rotates it into its canonical form."""
+Slots = List[Tuple[int, int]]
+
+
+def _orientation_permutations() -> List[List[int]]:
+    """Bit permutations (source index -> target index) for each orientation."""
+    origin = Position(0, 0, 0, Axis.Z)
+    return [[voxel_index(index_voxel(i).move_to(origin, o)) for i in range(NUM_VOXELS)]
+            for o in range(NUM_ORIENTATIONS)]
+
+
+def _byte_tables(permutations: List[List[int]]) -> np.ndarray:
+    """Lookup tables mapping each byte of a mask to its permuted bits."""
+    tables = np.zeros((NUM_ORIENTATIONS, 3, 256), dtype=np.uint32)
+    for o, permutation in enumerate(permutations):
+        for byte in range(3):
+            for value in range(256):
+                result = 0
+                for bit in range(8):
+                    if value & (1 << bit):
+                        source = NUM_VOXELS - 1 - (8 * byte + bit)
+                        result |= 1 << (NUM_VOXELS - 1 - permutation[source])
+
+                tables[o, byte, value] = result
+
+    return tables
+
+
+def _orientation_products(permutations: List[List[int]]) -> List[List[int]]:
+    """The orientation equivalent to rotating by b and then by a, for each (a, b)."""
+    products = []
+    for a in permutations:
+        row = []
+        for b in permutations:
+            row.append(permutations.index([a[i] for i in b]))
+
+        products.append(row)
+
+    return products
+
+
+ORIENTATION_PERMUTATIONS = _orientation_permutations()
+ORIENTATION_PRODUCTS = _orientation_products(ORIENTATION_PERMUTATIONS)
+BYTE_TABLES = _byte_tables(ORIENTATION_PERMUTATIONS)
+_BYTE_LISTS = BYTE_TABLES.tolist()
+
+
+def orient_mask(mask: int, orientation: int) -> int:
+    """Return the mask of a shape after rotating it into an orientation."""
+    b0, b1, b2 = _BYTE_LISTS[orientation]
+    return b0[mask & 0xFF] | b1[(mask >> 8) & 0xFF] | b2[mask >> 16]
+
+
+def canonical_shape(mask: int) -> Tuple[int, int]:
+    """Find the canonical form of a shape.
+
+    Args:
+        mask: The 24-bit occupancy mask of the shape.
+
+    Returns:
+        The canonical mask and the (smallest) orientation which rotates the
+        shape into its canonical form.
+    """
+    return min((orient_mask(mask, o), o) for o in range(NUM_ORIENTATIONS))
+
+
+def canonical_text(text: str) -> str:
+    """Return the canonical string representation of a shape."""
+    return mask_to_text(canonical_shape(mask_from_text(text))[0])
+
+
+def canonical_puzzle(lines: Sequence[str]) -> PuzzleKey:
+    """Return the canonical form of a puzzle given as a list of shape strings."""
+    return tuple(sorted(canonical_shape(mask_from_text(line))[0] for line in lines))
+
+
+def canonical_form(lines: Sequence[str]) -> Tuple[PuzzleKey, Slots]:
+    """Find the canonical form of a puzzle and how its shapes map onto it.
+
+    Args:
+        lines: The shape strings of the puzzle.
+
+    Returns:
+        The canonical form of the puzzle and, for each shape, its slot in
+        the canonical puzzle and the orientation which rotates it into
+        its canonical form.
+    """
+    forms = [canonical_shape(mask_from_text(line)) for line in lines]
+    order = sorted(range(len(forms)), key=lambda i: forms[i][0])
+    slots = [None] * len(forms)
+    for slot, i in enumerate(order):
+        slots[i] = (slot, forms[i][1])
+
+    return tuple(forms[i][0] for i in order), slots
+
+
+def invert_slots(slots: Slots) -> Mapping[int, Tuple[int, int]]:
+    """Map each slot of the canonical puzzle to its shape and orientation."""
+    return {slot: (s, o) for s, (slot, o) in enumerate(slots)}
+
+
+def from_canonical(piece: Piece, shapes: Mapping[int, Tuple[int, int]]) -> Piece:
+    """Convert a piece of the canonical puzzle to a piece of the original puzzle.
+
+    Args:
+        piece: A piece whose shape is a slot in the canonical puzzle.
+        shapes: The inverted slots (see `invert_slots`) of the original puzzle.
+
+    Returns:
+        The piece of the original puzzle which occupies the same voxels.
+    """
+    shape, orientation = shapes[piece.shape]
+    return Piece(shape, piece.position,
+                 ORIENTATION_PRODUCTS[piece.orientation][orientation])
+
+
+def canonical_masks(masks: np.ndarray) -> np.ndarray:
+    """Vectorized canonical form for an array of 24-bit shape masks."""
+    masks = np.asarray(masks, dtype=np.uint32)
+    b0 = masks & 0xFF
+    b1 = (masks >> 8) & 0xFF
+    b2 = masks >> 16
+    result = np.full(masks.shape, 1 << NUM_VOXELS, dtype=np.uint32)
+    for b0_table, b1_table, b2_table in BYTE_TABLES:
+        np.minimum(result, b0_table[b0] | b1_table[b1] | b2_table[b2], out=result)
+
+    return result
+
+
+def canonical_puzzles(masks: np.ndarray) -> np.ndarray:
+    """Vectorized canonical form for an (N, num_shapes) array of shape masks."""
+    return np.sort(canonical_masks(masks), axis=-1)
+
+
+def unique_puzzles(masks: np.ndarray) -> np.ndarray:
+    """Deduplicate an (N, num_shapes) array of puzzles up to symmetry.
+
+    Returns:
+        The indices of the first occurrence of each distinct puzzle, in
+        ascending order.
+    """
+    keys = canonical_puzzles(masks)
+    _, index = np.unique(keys, axis=0, return_index=True)
+    return np.sort(index)
@@ -0,0 +1,159 @@
+"""Checkpoints for long-running solves.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+A checkpoint records where the assembly search had got to: its frontier
+(in heap order, so that the search continues exactly as it would have),
+the assembly it was working on if it was interrupted part-way through a
+disassembly, its counters and any results so far. Checkpoints use a
+compact binary format:
+
+    header      magic, the six shape masks (3 bytes each), the number of
+                iterations and of assemblies checked, and the counts of
+                frontier states and results
+    pending     a state, with zero pieces if there was no pending assembly
+    frontier    one state per entry
+    results     an assembly state followed by its moves
+
+where states and moves use the encoding in the `encoding` module, so that
+each piece takes two bytes and so does each move.
+
+Checkpoints are written to a temporary file which then replaces the old
+checkpoint, so that a crash while saving never leaves a corrupt file.
+"""
+
+import io
+import os
+import struct
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from .encoding import Disassembly, read_moves, read_state, write_moves, write_state
+from .puzzle import Puzzle, PuzzleState
+
+
+MAGIC = b"BURRCKP2"
+HEADER = struct.Struct("<8s18sQQII")
+
+
+Checkpoint = NamedTuple("Checkpoint", [("shapes", Tuple[int, ...]),
+                                       ("num_iterations", int),
+                                       ("num_checked", int),
+                                       ("pending", Optional[PuzzleState]),
+                                       ("frontier", List[PuzzleState]),
+                                       ("results", List[Tuple[PuzzleState, Disassembly]])])
+
+
+def puzzle_shapes(puzzle: Puzzle) -> Tuple[int, ...]:
+    """Return the shape masks which identify a puzzle in a checkpoint."""
+    return tuple(shape.to_mask() for shape in puzzle.shapes)
+
+
+def encode(checkpoint: Checkpoint) -> bytes:
+    """Encode a checkpoint in the binary format."""
+    out = io.BytesIO()
+    shapes = b"".join(mask.to_bytes(3, "big") for mask in checkpoint.shapes)
+    out.write(HEADER.pack(MAGIC, shapes, checkpoint.num_iterations, checkpoint.num_checked,
+                          len(checkpoint.frontier), len(checkpoint.results)))
+    write_state(out, checkpoint.pending or PuzzleState(()))
+    for state in checkpoint.frontier:
+        write_state(out, state)
+
+    for assembly, moves in checkpoint.results:
+        write_state(out, assembly)
+        write_moves(out, moves)
+
+    return out.getvalue()
+
+
+def decode(raw: bytes, puzzle: Puzzle) -> Checkpoint:
+    """Decode a checkpoint for a puzzle.
+
+    Raises:
+        ValueError: If the data is not a checkpoint, or is for a different puzzle.
+    """
+    data = io.BytesIO(raw)
+    try:
+        magic, shapes, num_iterations, num_checked, num_frontier, num_results = \
+            HEADER.unpack(data.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not a checkpoint file")
+
+        shapes = tuple(int.from_bytes(shapes[i:i + 3], "big") for i in range(0, 18, 3))
+        if shapes != puzzle_shapes(puzzle):
+            raise ValueError("Checkpoint is for a different puzzle")
+
+        pending = read_state(data)
+        frontier = [read_state(data) for _ in range(num_frontier)]
+        results = []
+        for _ in range(num_results):
+            assembly = read_state(data)
+            results.append((assembly, read_moves(data, puzzle, assembly)))
+    except (struct.error, IndexError) as e:
+        raise ValueError("Truncated checkpoint") from e
+
+    return Checkpoint(shapes, num_iterations, num_checked,
+                      pending if pending.pieces else None, frontier, results)
+
+
+def save(path: str, checkpoint: Checkpoint):
+    """Write a checkpoint atomically."""
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode(checkpoint))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+def load(path: str, puzzle: Puzzle) -> Optional[Checkpoint]:
+    """Load the checkpoint for a puzzle, or return None if there is none."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+
+    return decode(raw, puzzle)
+
+
+class Checkpointer:
+    """Saves the state of an assembly search periodically.
+
+    Description:
+        The search calls the checkpointer between iterations. As the
+        checkpoint includes the results so far, the caller shares its list
+        of results with the checkpointer.
+    """
+
+    def __init__(self, path: str, interval: float,
+                 results: List[Tuple[PuzzleState, Disassembly]] = None):
+        """Constructor.
+
+        Args:
+            path: The path of the checkpoint file.
+            interval: Seconds between checkpoints.
+            results: The results so far, which are saved with the search.
+        """
+        self.path = path
+        self.interval = interval
+        self.results = results if results is not None else []
+        self.last_save = time.perf_counter()
+
+    def __call__(self, search):
+        """Save the search if a checkpoint is due."""
+        if time.perf_counter() - self.last_save >= self.interval:
+            self.save(search)
+
+    def save(self, search):
+        """Save the search now."""
+        save(self.path, search.to_checkpoint(self.results))
+        self.last_save = time.perf_counter()
+
+    def remove(self):
+        """Remove the checkpoint once the search has finished."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,349 @@
+"""Search for hard six-piece burr designs.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Shape sets are sampled from a catalog of notchable pieces, that is pieces
+which can be made by cutting notches into a 2x2x6 stick. The vast majority
+of sets cannot be assembled, and so each set goes through a series of
+filters, cheapest first, before it is solved:
+
+1. the set must not be a rotation or relabelling of one already seen;
+2. the pieces must fit in the puzzle, i.e. the level must be at least one;
+3. one of the pieces must have at most two orientations at place A, as the
+   assembly search starts from such a piece;
+4. an assembly must be found within a node budget. This uses a
+   depth-first search over bitmasks, which only has to find one assembly
+   and so is far faster than the solver's own assembly search.
+
+The orientations and placements of the catalog pieces are built once and
+shared with the worker processes (see `tables`).
+
+Sets are either sampled at random or enumerated in order. The survivors
+are fully analysed in a process pool: every distinct assembly is found
+(see `mitm`) and the shortest disassembly of each is worked out. A
+leaderboard is kept of the sets whose longest disassembly is longest, with
+ties broken in favour of fewer assemblies which come apart (a unique
+solution being best) and then by level.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import heapq
+from itertools import combinations_with_replacement, islice
+import os
+import random
+from typing import Iterator, List, Mapping, NamedTuple, Sequence, Tuple
+
+from .batch import chunks, submit_bounded
+from .budget import Budget
+from .canonical import canonical_puzzle, canonical_text
+from .piece import Piece
+from .position import PLACES
+from .shape import Shape
+from .solver import analyze, PartialResult
+from .tables import attach_worker, attached, build_tables, cell_of, puzzle_from_text, SharedTables
+
+
+"""The cubes (x, y) removed from a column of a piece by each kind of cut:
+none, one face-half or two adjacent face-halves (leaving a single cube)."""
+_HALVES = [{(0, 0), (1, 0)}, {(0, 1), (1, 1)}, {(0, 0), (0, 1)}, {(1, 0), (1, 1)}]
+COLUMN_CUTS = [set()] + _HALVES + [_HALVES[a] | _HALVES[b] for a in (0, 1) for b in (2, 3)]
+
+"""The columns which notches may be cut into."""
+NOTCH_COLUMNS = range(1, 5)
+
+
+"""A design on the leaderboard.
+
+Attributes:
+    num_moves: The length of the longest disassembly of any assembly.
+    level: The level of the puzzle.
+    shapes: The shape strings.
+    assembly: The assembly with the longest disassembly.
+    moves: Its disassembly.
+    num_assemblies: The number of distinct assemblies.
+    num_solutions: The number of those which can be disassembled.
+"""
+Entry = NamedTuple("Entry", [("num_moves", int),
+                             ("level", int),
+                             ("shapes", List[str]),
+                             ("assembly", str),
+                             ("moves", List[str]),
+                             ("num_assemblies", int),
+                             ("num_solutions", int)])
+
+
+def cubes_to_text(cubes: set) -> str:
+    """Return the text for a shape made of cubes (x, y, z) in a 2x2x6 stick."""
+    return "/".join("".join("x" if (i % 2, i // 2, z) in cubes else "." for z in range(6))
+                    for i in range(4))
+
+
+def is_connected(cubes: set) -> bool:
+    """Return whether the cubes form a single face-connected piece."""
+    start = next(iter(cubes))
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, y, z = queue.popleft()
+        for neighbor in [(1 - x, y, z), (x, 1 - y, z), (x, y, z - 1), (x, y, z + 1)]:
+            if neighbor in cubes and neighbor not in seen:
+                seen.add(neighbor)
+                queue.append(neighbor)
+
+    return len(seen) == len(cubes)
+
+
+def notchable_catalog() -> List[str]:
+    """Return every distinct notchable piece which fits into the puzzle.
+
+    Returns:
+        The canonical text of each piece, in sorted order.
+    """
+    full = {(x, y, z) for x in range(2) for y in range(2) for z in range(6)}
+    catalog = set()
+    cuts = [()]
+    for _ in NOTCH_COLUMNS:
+        cuts = [previous + (cut,) for previous in cuts for cut in range(len(COLUMN_CUTS))]
+
+    for columns in cuts:
+        cubes = set(full)
+        for z, cut in zip(NOTCH_COLUMNS, columns):
+            cubes -= {(x, y, z) for x, y in COLUMN_CUTS[cut]}
+
+        if is_connected(cubes):
+            catalog.add(canonical_text(cubes_to_text(cubes)))
+
+    return sorted(text for text in catalog if Shape.from_text(text).orientations["A"])
+
+
+def level_of(shapes: Sequence[str]) -> int:
+    """Return the level of a shape set without building the puzzle."""
+    return 105 - sum(text.count("x") for text in shapes)
+
+
+def start_shapes(catalog: List[str]) -> set:
+    """Return the pieces from which the assembly search can start."""
+    return {text for text in catalog if len(Shape.from_text(text).orientations["A"]) <= 2}
+
+
+def is_plausible(shapes: Sequence[str], starts: set) -> bool:
+    """Apply the filters which do not need a search."""
+    return level_of(shapes) >= 1 and not starts.isdisjoint(shapes)
+
+
+def sample_sets(catalog: List[str], num_samples: int,
+                rng: random.Random) -> Iterator[Tuple[str, ...]]:
+    """Sample distinct shape sets (which may repeat pieces) from the catalog."""
+    seen = set()
+    for _ in range(num_samples):
+        shapes = tuple(rng.choice(catalog) for _ in range(6))
+        key = canonical_puzzle(shapes)
+        if key not in seen:
+            seen.add(key)
+            yield shapes
+
+
+def enumerate_sets(catalog: List[str]) -> Iterator[Tuple[str, ...]]:
+    """Enumerate every shape set (which may repeat pieces) from the catalog.
+
+    As the catalog holds canonical shapes, every set is distinct.
+    """
+    return combinations_with_replacement(catalog, 6)
+
+
+def cell_mask(voxels) -> int:
+    """Return a bitmask of the grid cells (see `tables.cell_of`) of a set of voxels."""
+    mask = 0
+    for v in voxels:
+        mask |= 1 << cell_of(v)
+
+    return mask
+
+
+@lru_cache(maxsize=None)
+def placements(text: str) -> Mapping[str, Tuple[int, ...]]:
+    """Return the cell masks of a shape in each of its valid orientations at each place.
+
+    These are read from the shared tables if this process is attached to
+    them, and otherwise worked out from the shape.
+    """
+    tables = attached()
+    if tables is not None:
+        try:
+            return tables.placement_masks(text)
+        except KeyError:
+            pass
+
+    shape = Shape.from_text(text)
+    return {name: tuple(cell_mask(shape.move_to(Piece(0, position, o)).voxels)
+                        for o in shape.orientations[name])
+            for name, position in PLACES.items()}
+
+
+def has_assembly(shapes: Sequence[str], max_nodes: int) -> bool:
+    """Return whether an assembly of the shapes can be found within a node budget.
+
+    Description:
+        The places are filled in order with a depth-first search, and the
+        occupied voxels are kept as a bitmask so that a collision check is
+        a single `&`. Shape sets which need more nodes than the budget are
+        treated as having no assembly.
+    """
+    options = [placements(text) for text in shapes]
+    places = list(PLACES)
+    nodes = 0
+
+    def fill(depth: int, used: int, occupied: int) -> bool:
+        nonlocal nodes
+        if depth == len(places):
+            return True
+
+        for s, option in enumerate(options):
+            if used & (1 << s):
+                continue
+
+            for mask in option[places[depth]]:
+                if occupied & mask:
+                    continue
+
+                nodes += 1
+                if nodes > max_nodes:
+                    return False
+
+                if fill(depth + 1, used | 1 << s, occupied | mask):
+                    return True
+
+        return False
+
+    return fill(0, 0, 0)
+
+
+def evaluate(shapes: Sequence[str], timeout: float, max_assembly_nodes: int) -> Entry:
+    """Analyse a shape set, returning its entry or None if it is rejected.
+
+    A set is rejected if it has no assembly which can be disassembled, or
+    if its analysis takes longer than the timeout.
+    """
+    if not has_assembly(shapes, max_assembly_nodes):
+        return None
+
+    puzzle = puzzle_from_text(shapes)
+    analysis = analyze(puzzle, Budget(seconds=timeout), assembler="mitm")
+    if isinstance(analysis, PartialResult):
+        return None
+
+    solutions = [(assembly, moves) for assembly, moves in analysis.assemblies if moves]
+    if not solutions:
+        return None
+
+    assembly, moves = max(solutions, key=lambda solution: len(solution[1]))
+    return Entry(len(moves) - 1, puzzle.level(), list(shapes), str(assembly),
+                 [str(move) for _, move in moves[:-1]], len(analysis.assemblies), len(solutions))
+
+
+def evaluate_batch(batch: List[Sequence[str]], timeout: float,
+                   max_assembly_nodes: int) -> List[Entry]:
+    """Evaluate a batch of shape sets, which amortizes the cost of talking to the pool."""
+    return [evaluate(shapes, timeout, max_assembly_nodes) for shapes in batch]
+
+
+def score(entry: Entry) -> Tuple[int, int, int]:
+    """Return the rank of an entry: by longest disassembly, then fewest solutions, then level."""
+    return (entry.num_moves, -entry.num_solutions, entry.level)
+
+
+class Leaderboard:
+    """The best designs found so far, ranked by `score`."""
+
+    def __init__(self, size: int):
+        """Constructor."""
+        self.size = size
+        self.heap: List[Tuple[Tuple[int, int], int, Entry]] = []
+        self.count = 0
+
+    def add(self, entry: Entry) -> bool:
+        """Add an entry, returning whether it made the leaderboard."""
+        item = (score(entry), self.count, entry)
+        self.count += 1
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, item)
+            return True
+
+        if item[0] > self.heap[0][0]:
+            heapq.heapreplace(self.heap, item)
+            return True
+
+        return False
+
+    def entries(self) -> List[Entry]:
+        """Return the entries, best first."""
+        return [entry for _, _, entry in sorted(self.heap, key=lambda item: (item[0], -item[1]),
+                                                reverse=True)]
+
+
+Report = NamedTuple("Report", [("num_sets", int),
+                               ("num_candidates", int),
+                               ("num_solved", int),
+                               ("leaderboard", List[Entry])])
+
+
+def design(num_samples: int = None, num_workers: int = None, timeout=5.0,
+           max_assembly_nodes=100000, leaderboard_size=20, batch_size=16,
+           seed: int = None, catalog: List[str] = None, exhaustive=False) -> Report:
+    """Search for hard designs among shape sets from the catalog.
+
+    Args:
+        num_samples: The number of shape sets to sample, or to enumerate if
+                     `exhaustive` (None enumerates them all).
+        num_workers: The number of worker processes (defaults to the CPU count).
+        timeout: The maximum number of seconds to spend solving each set.
+        max_assembly_nodes: The node budget for finding an assembly. Sets
+                            which need more than this are rejected, which
+                            trades a few missed designs for throughput.
+        leaderboard_size: The number of designs to keep.
+        batch_size: The number of sets sent to a worker at a time.
+        seed: Optional random seed.
+        catalog: The pieces to choose from (defaults to `notchable_catalog()`).
+        exhaustive: Whether to enumerate the sets in order rather than sample them.
+
+    Returns:
+        The numbers of distinct sets considered, of those passed to the
+        workers and of those solved, and the leaderboard.
+    """
+    catalog = catalog or notchable_catalog()
+    if exhaustive:
+        sets = islice(enumerate_sets(catalog), num_samples)
+    else:
+        sets = sample_sets(catalog, num_samples, random.Random(seed))
+
+    starts = start_shapes(catalog)
+    leaderboard = Leaderboard(leaderboard_size)
+    num_sets = 0
+    num_candidates = 0
+    num_solved = 0
+
+    def candidates() -> Iterator[Tuple[str, ...]]:
+        nonlocal num_sets, num_candidates
+        for shapes in sets:
+            num_sets += 1
+            if is_plausible(shapes, starts):
+                num_candidates += 1
+                yield shapes
+
+    num_workers = num_workers or os.cpu_count()
+    # the orientations and placements of every catalog piece are shared with the workers
+    with SharedTables.create(build_tables(catalog)) as tables, \
+            ProcessPoolExecutor(max_workers=num_workers, initializer=attach_worker,
+                                initargs=(tables.name,)) as executor:
+        # a bounded number of batches is kept in flight, so that memory use
+        # does not grow with the number of sets
+        for _, future in submit_bounded(executor, evaluate_batch, chunks(candidates(), batch_size),
+                                        timeout, max_assembly_nodes, max_pending=2 * num_workers):
+            for entry in future.result():
+                if entry is not None:
+                    num_solved += 1
+                    leaderboard.add(entry)
+
+    return Report(num_sets, num_candidates, num_solved, leaderboard.entries())
@@ -0,0 +1,359 @@
+"""Distributed solving over TCP.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+A coordinator hands out units of work to worker processes, which may be on
+other machines, and writes their results as JSON lines in the same format
+as `batch`. A unit is either a whole puzzle, which is solved with
+`solver.solve`, or one subtree of a puzzle's exhaustive analysis: every
+assembly found with a given shape at place A (the first level of the
+`solver.AssemblySearch`), each paired with its shortest disassembly.
+
+The protocol is one JSON object per line, as in `service`. A worker says
+it is ready for work, and the coordinator replies with a lease on a unit:
+
+{"op": "ready"}
+{"op": "lease", "lease": 7, "unit": {"file": "puzzles.json", "index": 3, "subtree": 2, ...}}
+
+While it works on the unit the worker streams its results and sends
+heartbeats, and then completes the lease (which also means it is ready for
+more work):
+
+{"op": "result", "lease": 7, "record": {...}}
+{"op": "heartbeat", "lease": 7}
+{"op": "complete", "lease": 7}
+
+Once every unit is complete the coordinator tells the waiting workers
+{"op": "done"}. A lease is lost if its worker disconnects or sends nothing
+for `lease_timeout` seconds, and the unit is then leased to another worker.
+The results of a lease are held by the coordinator until it is complete,
+so a unit's results are written exactly once, and anything later sent
+under a lost lease is ignored. No broker is needed: the coordinator is a
+plain asyncio TCP server and the workers use blocking sockets.
+"""
+
+import asyncio
+from collections import deque
+import heapq
+import json
+import socket
+import sys
+import threading
+import time
+from typing import Deque, Iterator, List, Mapping, NamedTuple, Sequence, Set, TextIO
+
+from .batch import load_puzzles, solve_task, Task
+from .budget import Budget, BudgetExceeded, Monitor
+from .solver import AssemblySearch, disassemble
+from .tables import puzzle_from_text
+
+
+"""A unit of work.
+
+The subtree is the shape placed at A, or None to solve the whole puzzle.
+"""
+Unit = NamedTuple("Unit", [("file", str),
+                           ("index", int),
+                           ("shapes", List[str]),
+                           ("subtree", int),
+                           ("timeout", float)])
+
+
+def units_for(paths: Sequence[str], subtrees=False, timeout: float = None) -> List[Unit]:
+    """Create the units for every puzzle in the given files.
+
+    Args:
+        paths: The puzzle files.
+        subtrees: Whether to analyse every assembly, with one unit per
+                  subtree, rather than solve each puzzle as one unit.
+        timeout: The maximum number of seconds to spend on each unit.
+    """
+    units = []
+    for path in paths:
+        for i, info in enumerate(load_puzzles(path)):
+            for subtree in (range(len(info["shapes"])) if subtrees else [None]):
+                units.append(Unit(path, i, info["shapes"], subtree, timeout))
+
+    return units
+
+
+def analyze_subtree(unit: Unit) -> Iterator[dict]:
+    """Generate a record for each assembly in a subtree, and then a summary record.
+
+    The moves of an assembly record are None if it cannot be disassembled.
+    The status of the summary is "analyzed", "timeout" or "error".
+    """
+    header = {"file": unit.file, "index": unit.index, "subtree": unit.subtree}
+    start = time.perf_counter()
+    monitor = None if unit.timeout is None else Monitor(Budget(seconds=unit.timeout))
+    search = None
+    try:
+        puzzle = puzzle_from_text(unit.shapes)
+        search = AssemblySearch(puzzle, monitor)
+        search.frontier = [entry for entry in search.frontier if entry[1].puzzle.pieces[0].shape == unit.subtree]
+        heapq.heapify(search.frontier)
+        for assembly in search:
+            moves = disassemble(puzzle.to_state(assembly), monitor)
+            yield dict(header, assembly=str(assembly),
+                       moves=None if moves is None else [str(move) for _, move in moves[:-1]])
+
+        summary = dict(header, status="analyzed")
+    except BudgetExceeded:
+        summary = dict(header, status="timeout")
+    except Exception as e:
+        summary = dict(header, status="error", error=repr(e))
+
+    if search is not None:
+        summary.update(num_iterations=search.num_iterations, num_checked=search.num_checked)
+
+    summary["time"] = time.perf_counter() - start
+    yield summary
+
+
+def run_unit(unit: Unit) -> Iterator[dict]:
+    """Generate the result records of a unit."""
+    if unit.subtree is None:
+        yield solve_task(Task(unit.file, unit.index, unit.shapes, unit.timeout))
+    else:
+        yield from analyze_subtree(unit)
+
+
+Lease = NamedTuple("Lease", [("unit", int),
+                             ("writer", asyncio.StreamWriter),
+                             ("records", List[dict])])
+
+
+class Coordinator:
+    """Asyncio server which leases units to workers and collects their results."""
+
+    def __init__(self, units: Sequence[Unit], output: TextIO = sys.stdout, lease_timeout=60.0):
+        """Constructor.
+
+        Args:
+            units: The units of work.
+            output: The stream to which the result records are written.
+            lease_timeout: Seconds without a message from a worker before its
+                           lease is lost and the unit is reassigned.
+        """
+        self.units = list(units)
+        self.output = output
+        self.lease_timeout = lease_timeout
+        self.pending: Deque[int] = deque(range(len(self.units)))
+        self.leases: Mapping[int, Lease] = {}
+        self.deadlines: Mapping[int, float] = {}
+        self.idle: Deque[asyncio.StreamWriter] = deque()
+        self.num_complete = 0
+        self.num_records = 0
+        self.num_reassigned = 0
+        self.next_lease = 0
+        self.server: asyncio.AbstractServer = None
+        self.finished: asyncio.Event = None
+        self.connections: List[asyncio.Task] = []
+        self.writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self, host="127.0.0.1", port=0) -> int:
+        """Listen for workers, returning the port (0 picks a free port)."""
+        self.finished = asyncio.Event()
+        if not self.units:
+            self.finished.set()
+
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def run(self) -> int:
+        """Wait until every unit is complete, returning the number of records written."""
+        expiry = asyncio.create_task(self.expire_leases())
+        try:
+            await self.finished.wait()
+        finally:
+            expiry.cancel()
+            await self.close()
+
+        return self.num_records
+
+    async def close(self):
+        """Tell the workers to stop and close every connection."""
+        self.server.close()
+        self.idle.clear()
+        for writer in self.writers:
+            self.send(writer, {"op": "done"})
+            writer.close()
+
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def send(self, writer: asyncio.StreamWriter, message: dict):
+        """Send a message to a worker, ignoring a broken connection."""
+        if not writer.is_closing():
+            writer.write((json.dumps(message) + "\n").encode("utf-8"))
+
+    def dispatch(self):
+        """Lease pending units to idle workers."""
+        while self.pending and self.idle:
+            writer = self.idle.popleft()
+            unit = self.pending.popleft()
+            lease = self.next_lease
+            self.next_lease += 1
+            self.leases[lease] = Lease(unit, writer, [])
+            self.deadlines[lease] = time.monotonic() + self.lease_timeout
+            self.send(writer, {"op": "lease", "lease": lease, "unit": self.units[unit]._asdict()})
+
+    def reassign(self, lease: int):
+        """Return the unit of a lost lease to the front of the queue."""
+        self.deadlines.pop(lease, None)
+        self.pending.appendleft(self.leases.pop(lease).unit)
+        self.num_reassigned += 1
+        self.dispatch()
+
+    def complete(self, lease: int):
+        """Write the results of a completed lease."""
+        self.deadlines.pop(lease)
+        for record in self.leases.pop(lease).records:
+            self.output.write(json.dumps(record) + "\n")
+            self.num_records += 1
+
+        self.output.flush()
+        self.num_complete += 1
+        if self.num_complete == len(self.units):
+            self.finished.set()
+
+    def on_message(self, writer: asyncio.StreamWriter, message: dict):
+        """Handle a message from a worker."""
+        op = message.get("op")
+        if op == "ready":
+            self.idle.append(writer)
+            self.dispatch()
+            return
+
+        lease = message.get("lease")
+        if lease not in self.leases or self.leases[lease].writer is not writer:
+            # the lease was lost and the unit has been given to another worker
+            return
+
+        self.deadlines[lease] = time.monotonic() + self.lease_timeout
+        if op == "result":
+            self.leases[lease].records.append(message["record"])
+        elif op == "complete":
+            self.complete(lease)
+            self.idle.append(writer)
+            self.dispatch()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve a worker connection."""
+        self.connections.append(asyncio.current_task())
+        self.writers.add(writer)
+        try:
+            while not self.finished.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    break
+
+                self.on_message(writer, message)
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            if writer in self.idle:
+                self.idle.remove(writer)
+
+            for lease in [lease for lease, value in self.leases.items() if value.writer is writer]:
+                self.reassign(lease)
+
+            writer.close()
+
+    async def expire_leases(self):
+        """Reassign leases whose workers have gone quiet."""
+        while True:
+            await asyncio.sleep(self.lease_timeout / 4)
+            now = time.monotonic()
+            for lease in [lease for lease, deadline in self.deadlines.items() if deadline < now]:
+                writer = self.leases[lease].writer
+                self.reassign(lease)
+                # the worker may still be alive, so it is dropped to stop it taking more work
+                writer.close()
+
+
+async def coordinate(units: Sequence[Unit], output: TextIO = sys.stdout, host="127.0.0.1", port=0,
+                     lease_timeout=60.0, on_start=None) -> int:
+    """Run a coordinator until every unit is complete.
+
+    Args:
+        units: The units of work.
+        output: The stream to which the result records are written.
+        host: The host address to bind to.
+        port: The port to bind to (0 picks a free port).
+        lease_timeout: Seconds without a message before a lease is lost.
+        on_start: Optional function called with the port once listening.
+
+    Returns:
+        The number of records written.
+    """
+    coordinator = Coordinator(units, output, lease_timeout)
+    port = await coordinator.start(host, port)
+    if on_start is not None:
+        on_start(port)
+
+    return await coordinator.run()
+
+
+def run_worker(host: str, port: int, heartbeat_interval=5.0) -> int:
+    """Work on units leased from a coordinator until it has no more.
+
+    Args:
+        host: The coordinator's address.
+        port: The coordinator's port.
+        heartbeat_interval: Seconds between heartbeats while working on a
+                            unit, which must be well within the
+                            coordinator's lease timeout.
+
+    Returns:
+        The number of units completed.
+    """
+    num_complete = 0
+    with socket.create_connection((host, port)) as sock:
+        reader = sock.makefile("r", encoding="utf-8")
+        writer = sock.makefile("w", encoding="utf-8")
+        lock = threading.Lock()
+
+        def send(message: dict):
+            with lock:
+                writer.write(json.dumps(message) + "\n")
+                writer.flush()
+
+        def heartbeat(lease: int, stop: threading.Event):
+            try:
+                while not stop.wait(heartbeat_interval):
+                    send({"op": "heartbeat", "lease": lease})
+            except OSError:
+                pass
+
+        try:
+            send({"op": "ready"})
+            for line in reader:
+                message = json.loads(line)
+                if message["op"] != "lease":
+                    break
+
+                lease = message["lease"]
+                stop = threading.Event()
+                thread = threading.Thread(target=heartbeat, args=(lease, stop), daemon=True)
+                thread.start()
+                try:
+                    for record in run_unit(Unit(**message["unit"])):
+                        send({"op": "result", "lease": lease, "record": record})
+                finally:
+                    stop.set()
+                    thread.join()
+
+                send({"op": "complete", "lease": lease})
+                num_complete += 1
+        except (ConnectionError, BrokenPipeError):
+            # the coordinator has gone, or dropped this worker
+            pass
+
+    return num_complete
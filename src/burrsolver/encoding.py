@@ -0,0 +1,278 @@
+"""Compact binary encoding of assemblies and disassemblies.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+An assembly is a piece count followed by two bytes per piece: the shape and
+orientation (shape << 3 | orientation), then the index of the place. A move
+takes two bytes, packed as
+
+    bits 0-5    mask of the shapes which move
+    bits 6-8    direction
+    bits 9-15   number of steps
+
+and so does not record where the moving pieces are. Instead, the states of
+a disassembly are recovered by replaying its moves from the assembly, which
+is also how the pieces of each move are found. A list of moves is a count
+(NOT_DISASSEMBLED for an assembly which cannot be taken apart) followed by
+the moves.
+
+States in the middle of a disassembly have pieces which are not at named
+places, and so cannot be written as above. `pack_state` instead gives a
+fixed-size record of every piece's shape, orientation, axis and position,
+which is used to hash and sort states in the parallel and external-memory
+search engines.
+
+A disassembly file is a stream of records, each of which is the six shape
+masks of the puzzle (three bytes each), the assembly and the list of moves.
+`DisassemblyWriter` and `DisassemblyReader` write and read these one record
+at a time, so large result sets never have to be held in memory at once.
+"""
+
+from functools import lru_cache
+import io
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .piece import Piece
+from .position import Axis, Direction, Position, PLACES
+from .puzzle import Move, Puzzle, PuzzleState
+from .shape import mask_from_text, mask_to_text, Shape
+
+
+MAGIC = b"BURRDIS1"
+COUNT = struct.Struct("<H")
+MOVE = struct.Struct("<H")
+NOT_DISASSEMBLED = 0xFFFF
+MAX_STEPS = 127
+SHAPES_SIZE = 18
+
+PACKED_SIZE = 32
+PACKED_PIECE = struct.Struct("<BBbbb")
+AXES = list(Axis)
+
+PLACE_POSITIONS = list(PLACES.values())
+PLACE_INDEX = {position: i for i, position in enumerate(PLACE_POSITIONS)}
+
+Disassembly = Optional[List[Tuple[PuzzleState, Move]]]
+
+
+def encode_move(move: Move) -> int:
+    """Pack a move into 16 bits."""
+    if not 0 < move.steps <= MAX_STEPS:
+        raise ValueError(f"Cannot encode a move of {move.steps} steps")
+
+    mask = 0
+    for piece in move.pieces:
+        mask |= 1 << piece.shape
+
+    return mask | move.direction << 6 | move.steps << 9
+
+
+def decode_move(code: int, state: PuzzleState) -> Move:
+    """Unpack a move, taking the moving pieces from the state it is made from."""
+    mask = code & 0x3F
+    return Move(frozenset(p for p in state.pieces if mask & (1 << p.shape)),
+                Direction((code >> 6) & 7), code >> 9)
+
+
+def pack_move(move: Move) -> bytes:
+    """Pack a move into MOVE.size bytes."""
+    return MOVE.pack(encode_move(move))
+
+
+def unpack_move(raw: bytes, state: PuzzleState) -> Move:
+    """Unpack a move packed by `pack_move`, taking its pieces from the state it is made from."""
+    return decode_move(MOVE.unpack(raw)[0], state)
+
+
+def pack_state(state: PuzzleState) -> bytes:
+    """Pack any puzzle state into PACKED_SIZE bytes.
+
+    The record is the piece count and then, for each piece, its shape and
+    orientation (shape << 3 | orientation), the index of its axis and its
+    position as signed bytes, padded with zeros. Equal states give equal
+    records.
+    """
+    raw = bytes([len(state.pieces)]) + b"".join(
+        PACKED_PIECE.pack(p.shape << 3 | p.orientation, AXES.index(p.position.axis), *p.position[:3])
+        for p in state.pieces)
+    return raw.ljust(PACKED_SIZE, b"\0")
+
+
+def unpack_state(raw: bytes) -> PuzzleState:
+    """Unpack a state packed by `pack_state`."""
+    pieces = []
+    for i in range(raw[0]):
+        code, axis, x, y, z = PACKED_PIECE.unpack_from(raw, 1 + i * PACKED_PIECE.size)
+        pieces.append(Piece(code >> 3, Position(x, y, z, AXES[axis]), code & 7))
+
+    return PuzzleState(tuple(pieces))
+
+
+def write_state(out: BinaryIO, state: PuzzleState):
+    """Write an assembly state, whose pieces must all be at named places."""
+    out.write(bytes([len(state.pieces)]))
+    for piece in state.pieces:
+        out.write(bytes([piece.shape << 3 | piece.orientation, PLACE_INDEX[piece.position]]))
+
+
+def read_state(data: BinaryIO) -> PuzzleState:
+    """Read an assembly state."""
+    count = data.read(1)[0]
+    raw = data.read(2 * count)
+    return PuzzleState(tuple(Piece(raw[i] >> 3, PLACE_POSITIONS[raw[i + 1]], raw[i] & 7)
+                             for i in range(0, 2 * count, 2)))
+
+
+def write_moves(out: BinaryIO, moves: Disassembly):
+    """Write the moves of a disassembly, as returned by `solver.disassemble`."""
+    if moves is None:
+        out.write(COUNT.pack(NOT_DISASSEMBLED))
+        return
+
+    out.write(COUNT.pack(len(moves) - 1))
+    out.write(b"".join(MOVE.pack(encode_move(move)) for _, move in moves[:-1]))
+
+
+def read_moves(data: BinaryIO, puzzle: Puzzle, assembly: PuzzleState) -> Disassembly:
+    """Read the moves of a disassembly, replaying them to recover its states."""
+    count, = COUNT.unpack(data.read(COUNT.size))
+    if count == NOT_DISASSEMBLED:
+        return None
+
+    raw = data.read(count * MOVE.size)
+    if len(raw) < count * MOVE.size:
+        raise ValueError("Truncated list of moves")
+
+    moves = []
+    state = assembly
+    for code, in MOVE.iter_unpack(raw):
+        move = decode_move(code, state)
+        moves.append((state, move))
+        state = puzzle.to_state(state).do_move(move).state()
+
+    moves.append((state, None))
+    return moves
+
+
+def encode_disassembly(assembly: PuzzleState, moves: Disassembly) -> bytes:
+    """Encode an assembly and its disassembly."""
+    out = io.BytesIO()
+    write_state(out, assembly)
+    write_moves(out, moves)
+    return out.getvalue()
+
+
+def decode_disassembly(raw: bytes, puzzle: Puzzle) -> Tuple[PuzzleState, Disassembly]:
+    """Decode an assembly and its disassembly."""
+    data = io.BytesIO(raw)
+    assembly = read_state(data)
+    return assembly, read_moves(data, puzzle, assembly)
+
+
+@lru_cache(maxsize=4096)
+def shape_from_mask(mask: int) -> Shape:
+    """Return the shape for a mask, cached as result sets reuse a small set of pieces."""
+    return Shape.from_mask(mask)
+
+
+def puzzle_from_masks(masks: Sequence[int]) -> Puzzle:
+    """Return the puzzle for a set of shape masks."""
+    return Puzzle(tuple(shape_from_mask(mask) for mask in masks), ())
+
+
+"""A record of a disassembly file.
+
+The moves are None if the assembly cannot be disassembled.
+"""
+Record = NamedTuple("Record", [("shapes", List[str]),
+                               ("assembly", PuzzleState),
+                               ("moves", Disassembly)])
+
+
+class DisassemblyWriter:
+    """Writes disassembly records to a binary stream."""
+
+    def __init__(self, out: BinaryIO):
+        """Constructor, which writes the header."""
+        self.out = out
+        self.count = 0
+        out.write(MAGIC)
+
+    def write(self, shapes: Sequence[str], assembly: PuzzleState, moves: Disassembly):
+        """Write a record.
+
+        Args:
+            shapes: The shape strings of the puzzle.
+            assembly: The assembly.
+            moves: The disassembly, as returned by `solver.disassemble`.
+        """
+        self.out.write(b"".join(mask_from_text(text).to_bytes(3, "big") for text in shapes))
+        write_state(self.out, assembly)
+        write_moves(self.out, moves)
+        self.count += 1
+
+    def write_strings(self, shapes: Sequence[str], assembly: str, moves: Optional[Sequence[str]]):
+        """Write a record given in the string form used by puzzle files."""
+        state = PuzzleState.from_string(assembly)
+        if moves is None:
+            self.write(shapes, state, None)
+            return
+
+        # only the moves are stored, so the states can be left out here
+        self.write(shapes, state, [(None, Move.from_string(text)) for text in moves] + [(None, None)])
+
+
+class DisassemblyReader:
+    """Reads disassembly records from a binary stream, one at a time."""
+
+    def __init__(self, data: BinaryIO):
+        """Constructor, which checks the header.
+
+        Raises:
+            ValueError: If the stream is not a disassembly file.
+        """
+        self.data = data
+        if data.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a disassembly file")
+
+    def __iter__(self) -> Iterator[Record]:
+        """Generate the records, replaying each disassembly."""
+        data = self.data
+        while True:
+            raw = data.read(SHAPES_SIZE)
+            if not raw:
+                return
+
+            if len(raw) < SHAPES_SIZE:
+                raise ValueError("Truncated disassembly file")
+
+            masks = [int.from_bytes(raw[i:i + 3], "big") for i in range(0, SHAPES_SIZE, 3)]
+            try:
+                assembly = read_state(data)
+                moves = read_moves(data, puzzle_from_masks(masks), assembly)
+            except (IndexError, struct.error) as e:
+                raise ValueError("Truncated disassembly file") from e
+
+            yield Record([mask_to_text(mask) for mask in masks], assembly, moves)
+
+    def strings(self) -> Iterator[Tuple[List[str], str, List[str]]]:
+        """Generate the records in the string form used by puzzle files."""
+        for record in self:
+            moves = None if record.moves is None else [repr(move) for _, move in record.moves[:-1]]
+            yield record.shapes, str(record.assembly), moves
+
+
+def write_disassemblies(path: str, puzzles: Iterable[Mapping]) -> int:
+    """Write every stored disassembly of the puzzles (in the JSON schema) to a file.
+
+    Returns:
+        The number of records written.
+    """
+    with open(path, "wb") as f:
+        writer = DisassemblyWriter(f)
+        for info in puzzles:
+            for assembly, moves in info.get("assemblies", {}).items():
+                writer.write_strings(info["shapes"], assembly, moves)
+
+        return writer.count
@@ -0,0 +1,246 @@
+"""Prediction of the cost of solving a puzzle.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+The size of the assembly search tree is estimated with Knuth's random
+probing method: a probe walks from the root to a leaf choosing a child at
+random, and the product of the branching factors seen along the way is an
+unbiased estimate of the number of nodes at each depth. Most probes die out
+just short of a complete assembly, so the last few levels below a probe are
+counted exactly, which greatly reduces the variance of the estimate.
+Even so only a few percent of probes reach an assembly, so probing carries
+on past the requested number until enough of them have, and the standard
+errors of the estimates are reported with them. The cost of disassembly is
+estimated by running A* on a few of the assemblies which the probes reach,
+with a cap on the number of nodes each may expand. The fraction of those
+which come apart is smoothed towards a uniform prior, so that a handful of
+samples never gives a hard 0 or 1.
+"""
+
+import math
+import random
+import time
+from typing import List, NamedTuple, Tuple
+
+from .budget import Budget, BudgetExceeded, Monitor
+from .puzzle import Puzzle
+from .solver import AssemblySearch, AssemblyState, disassemble, try_pieces
+from .stats import Statistics
+
+
+"""A prediction of the cost of solving a puzzle.
+
+Attributes:
+    num_iterations: Size of the whole assembly search tree, i.e. the number
+                    of iterations of an exhaustive assembly search.
+    num_assemblies: Number of complete assemblies in the tree.
+    expanded_per_assembly: Mean number of A* expansions per assembly.
+    disassemblable: Fraction of assemblies which can be disassembled, as
+                    the mean of its posterior under a uniform prior.
+    solve_iterations: Expected assembly search iterations of `solve`,
+                      assuming the assemblies are spread evenly through
+                      the search.
+    solve_expanded: Expected A* node expansions of `solve`.
+    solve_seconds: Expected run time of `solve`.
+    analysis_seconds: Expected run time of `analyze`.
+    num_censored: Number of sampled disassemblies which hit the expansion
+                  cap. These count with the capped number of expansions,
+                  but are left out of the disassemblable fraction.
+    elapsed: Seconds spent making the estimate.
+    num_probes: Number of probes made.
+    num_iterations_error: Standard error of `num_iterations`.
+    num_assemblies_error: Standard error of `num_assemblies`.
+    disassemblable_interval: 95% interval of `disassemblable`.
+"""
+Estimate = NamedTuple("Estimate", [("num_iterations", float),
+                                   ("num_assemblies", float),
+                                   ("expanded_per_assembly", float),
+                                   ("disassemblable", float),
+                                   ("solve_iterations", float),
+                                   ("solve_expanded", float),
+                                   ("solve_seconds", float),
+                                   ("analysis_seconds", float),
+                                   ("num_censored", int),
+                                   ("elapsed", float),
+                                   ("num_probes", int),
+                                   ("num_iterations_error", float),
+                                   ("num_assemblies_error", float),
+                                   ("disassemblable_interval", Tuple[float, float])])
+
+
+"""Subtrees with this many places left to fill are counted exactly."""
+EXACT_DEPTH = 3
+
+"""The number of probes which must reach an assembly before probing stops."""
+MIN_LEAVES = 10
+
+"""The z-score of a 95% interval."""
+Z_95 = 1.96
+
+
+def children(puzzle: Puzzle, state: AssemblyState) -> List[AssemblyState]:
+    """Return the children of a node of the assembly search tree.
+
+    The children are sorted by the piece that was added, as the order in
+    which `try_pieces` finds them depends on string hashing.
+    """
+    frontier = []
+    try_pieces(puzzle, state, frontier)
+    return sorted((child for _, child in frontier), key=lambda child: last_piece(child))
+
+
+def last_piece(state: AssemblyState) -> Tuple[int, int, int, int, int]:
+    """Return a sort key for the piece which was added last to a state."""
+    piece = state.puzzle.pieces[-1]
+    return (piece.shape, piece.position.x, piece.position.y, piece.position.z, piece.orientation)
+
+
+def count_subtree(puzzle: Puzzle, state: AssemblyState,
+                  leaves: List[AssemblyState]) -> int:
+    """Count the nodes below a state, adding any complete assemblies to the leaves."""
+    if state.num_remaining == 0:
+        leaves.append(state)
+        return 0
+
+    options = children(puzzle, state)
+    return len(options) + sum(count_subtree(puzzle, child, leaves) for child in options)
+
+
+"""The outcome of a random probe of the assembly search tree.
+
+Attributes:
+    num_nodes: Estimated number of nodes in the tree.
+    num_assemblies: Estimated number of complete assemblies in the tree.
+    leaf: A complete assembly reached by the probe, or None if it reached a
+          dead end.
+    num_visited: Number of nodes the probe actually visited.
+"""
+Probe = NamedTuple("Probe", [("num_nodes", float),
+                             ("num_assemblies", float),
+                             ("leaf", AssemblyState),
+                             ("num_visited", int)])
+
+
+def probe(puzzle: Puzzle, roots: List[AssemblyState], rng: random.Random) -> Probe:
+    """Walk at random from a root towards a leaf of the assembly search tree."""
+    weight = len(roots)
+    num_nodes = weight
+    num_visited = 1
+    state = rng.choice(roots)
+    while state.num_remaining > EXACT_DEPTH:
+        options = children(puzzle, state)
+        if not options:
+            return Probe(num_nodes, 0, None, num_visited)
+
+        weight *= len(options)
+        num_nodes += weight
+        num_visited += 1
+        state = rng.choice(options)
+
+    leaves = []
+    below = count_subtree(puzzle, state, leaves)
+    num_nodes += weight * below
+    num_visited += below
+    if not leaves:
+        return Probe(num_nodes, 0, None, num_visited)
+
+    return Probe(num_nodes, weight * len(leaves), rng.choice(leaves), num_visited)
+
+
+def standard_error(values: List[float]) -> float:
+    """Return the standard error of the mean of some values."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+
+    mean = sum(values) / n
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1) / n)
+
+
+def posterior(successes: float, n: int) -> Tuple[float, Tuple[float, float]]:
+    """Return the posterior mean of a fraction and its 95% (Wilson) interval, under a uniform prior."""
+    mean = (successes + 1) / (n + 2)
+    if n == 0:
+        return mean, (0.0, 1.0)
+
+    p = successes / n
+    centre = (p + Z_95 ** 2 / (2 * n)) / (1 + Z_95 ** 2 / n)
+    width = Z_95 * math.sqrt(p * (1 - p) / n + Z_95 ** 2 / (4 * n * n)) / (1 + Z_95 ** 2 / n)
+    return mean, (max(centre - width, 0.0), min(centre + width, 1.0))
+
+
+def estimate(puzzle: Puzzle, num_probes=200, num_disassemblies=20,
+             max_expanded=500, seed: int = None, max_probes=2000) -> Estimate:
+    """Estimate the cost of solving (and of fully analysing) a puzzle.
+
+    Args:
+        puzzle: The puzzle to estimate.
+        num_probes: The least number of random probes of the assembly
+                    search tree.
+        num_disassemblies: The number of assemblies found by the probes to
+                           try disassembling.
+        max_expanded: The cap on A* expansions for each sampled disassembly.
+        seed: Optional seed, for a reproducible estimate.
+        max_probes: The most probes to make while waiting for `MIN_LEAVES`
+                    of them to reach an assembly.
+
+    Returns:
+        The estimate.
+    """
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    roots = [state for _, state in AssemblySearch(puzzle).frontier]
+    if not roots:
+        return Estimate(0, 0, 0, 0, 0, 0, 0, 0, 0, time.perf_counter() - start, 0, 0, 0, (0.0, 0.0))
+
+    probes = [probe(puzzle, roots, rng) for _ in range(num_probes)]
+    while len(probes) < max_probes and sum(p.leaf is not None for p in probes) < MIN_LEAVES:
+        probes.append(probe(puzzle, roots, rng))
+
+    node_seconds = (time.perf_counter() - start) / sum(p.num_visited for p in probes)
+    num_iterations = sum(p.num_nodes for p in probes) / len(probes)
+    num_assemblies = sum(p.num_assemblies for p in probes) / len(probes)
+    leaves = [(p.num_assemblies, p.leaf) for p in probes if p.leaf is not None]
+
+    # the leaves reached by the probes are weighted by the number of
+    # assemblies they stand for, to keep the estimate unbiased
+    samples = rng.sample(leaves, min(num_disassemblies, len(leaves)))
+    total_weight = sum(weight for weight, _ in samples)
+    expanded = 0.0
+    decided_weight = 0.0
+    disassembled_weight = 0.0
+    num_censored = 0
+    expand_start = time.perf_counter()
+    num_expanded = 0
+    for weight, leaf in samples:
+        stats = Statistics()
+        monitor = Monitor(Budget(nodes=max_expanded))
+        try:
+            moves = disassemble(puzzle.to_state(leaf.puzzle), monitor, stats)
+            decided_weight += weight
+            if moves:
+                disassembled_weight += weight
+        except BudgetExceeded:
+            # it is not known whether this one comes apart
+            num_censored += 1
+
+        num_expanded += stats.num_expanded
+        expanded += weight * stats.num_expanded / total_weight
+
+    expand_seconds = (time.perf_counter() - expand_start) / max(num_expanded, 1)
+
+    n = len(samples) - num_censored
+    fraction = disassembled_weight / decided_weight if decided_weight else 0.0
+    disassemblable, interval = posterior(fraction * n, n)
+    solve_assemblies = min(num_assemblies, 1 / disassemblable)
+
+    share = solve_assemblies / num_assemblies if num_assemblies else 1
+    solve_iterations = num_iterations * share
+    solve_expanded = solve_assemblies * expanded
+    return Estimate(num_iterations, num_assemblies, expanded, disassemblable,
+                    solve_iterations, solve_expanded,
+                    solve_iterations * node_seconds + solve_expanded * expand_seconds,
+                    num_iterations * node_seconds + num_assemblies * expanded * expand_seconds,
+                    num_censored, time.perf_counter() - start, len(probes),
+                    standard_error([p.num_nodes for p in probes]),
+                    standard_error([p.num_assemblies for p in probes]), interval)
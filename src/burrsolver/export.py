@@ -0,0 +1,272 @@
+"""Export of shapes, assemblies and disassemblies for external tools.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+The triangles of a whole STL file are built as a single NumPy structured
+array which matches the binary STL record layout, and so are written with
+one call. Pieces are placed with `Piece.to_transform`, so any state of a
+disassembly (not only the assembly) can be exported as one file.
+
+A disassembly can also be exported as keyframes for a viewer or game engine
+to animate: the mesh of each shape is stored once, followed by the piece
+transforms before each move and which pieces move how far (see
+`animation.Keyframe`). The viewer interpolates between them, so the file
+is a small fraction of the size of the ScenePic HTML.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+from typing import Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+
+import numpy as np
+
+from .animation import keyframes
+from .batch import chunks, submit_bounded
+from .geometry import cached_mesh, Mesh
+from .puzzle import Move, Puzzle, PuzzleState
+from .shape import Shape
+
+
+"""The layout of a binary STL triangle record (50 bytes)."""
+STL_TRIANGLE = np.dtype([("normal", "<f4", (3,)),
+                         ("vertices", "<f4", (3, 3)),
+                         ("attribute", "<u2")])
+
+HEADER_SIZE = 80
+
+
+def mesh_triangles(mesh: Mesh, transform: np.ndarray = None, scale=10) -> np.ndarray:
+    """Return the triangles of a mesh as STL records.
+
+    Args:
+        mesh: The mesh, whose quads are split into watertight triangles
+              (see `Mesh.triangles`).
+        transform: Optional 4x4 rigid transform to apply (e.g. from
+                   `Piece.to_transform`).
+        scale: The scale factor applied to the vertices.
+
+    Returns:
+        A structured array with the `STL_TRIANGLE` dtype.
+    """
+    corners, normals = mesh.triangles()
+    if transform is not None:
+        corners = corners @ transform[:3, :3].T + transform[:3, 3]
+        normals = normals @ transform[:3, :3].T
+
+    triangles = np.zeros(len(corners), STL_TRIANGLE)
+    triangles["vertices"] = corners * scale
+    triangles["normal"] = normals
+    return triangles
+
+
+def shape_triangles(shape: Shape, scale=10) -> np.ndarray:
+    """Return the triangles of an unplaced shape."""
+    return mesh_triangles(cached_mesh(shape.voxels, True), scale=scale)
+
+
+def state_triangles(puzzle: Puzzle, state: PuzzleState, scale=10) -> np.ndarray:
+    """Return the triangles of every piece of a puzzle state, in place."""
+    parts = [mesh_triangles(cached_mesh(puzzle.shapes[piece.shape].voxels, True),
+                            piece.to_transform(), scale)
+             for piece in state.pieces]
+    if not parts:
+        return np.zeros(0, STL_TRIANGLE)
+
+    return np.concatenate(parts)
+
+
+def write_binary_stl(path: str, triangles: np.ndarray, name="burr_piece"):
+    """Write triangles (as from `mesh_triangles`) to a binary STL file."""
+    header = name.encode("ascii")[:HEADER_SIZE].ljust(HEADER_SIZE, b"\0")
+    with open(path, "wb") as f:
+        f.write(header + np.uint32(len(triangles)).tobytes() + triangles.tobytes())
+
+
+def read_binary_stl(path: str) -> np.ndarray:
+    """Read the triangles of a binary STL file."""
+    with open(path, "rb") as f:
+        f.seek(HEADER_SIZE)
+        count = int(np.frombuffer(f.read(4), "<u4")[0])
+        return np.frombuffer(f.read(count * STL_TRIANGLE.itemsize), STL_TRIANGLE)
+
+
+def save_state_stl(path: str, puzzle: Puzzle, state: PuzzleState, scale=10):
+    """Save a puzzle state, such as an assembly, as a single binary STL file."""
+    write_binary_stl(path, state_triangles(puzzle, state, scale), "burr_assembly")
+
+
+def mesh_arrays(mesh: Mesh) -> Mapping[str, np.ndarray]:
+    """Return the vertices, normals and triangles (with the same winding as STL) of a mesh."""
+    return {"vertices": mesh.vertices.astype(np.int8),
+            "normals": mesh.normals.astype(np.int8),
+            "triangles": mesh.quads[:, [0, 1, 2, 2, 3, 0]].reshape(-1, 3).astype(np.uint16)}
+
+
+def keyframe_arrays(puzzle: Puzzle, disassembly: List[Tuple[PuzzleState, Move]]) -> Mapping[str, np.ndarray]:
+    """Return the meshes and keyframes of a disassembly as flat arrays.
+
+    Description:
+        The mesh of shape `s` is held in `shape{s}_vertices`,
+        `shape{s}_normals` and `shape{s}_triangles`, in voxel units. The
+        pieces of every keyframe are concatenated, with `num_pieces` saying
+        how many belong to each, and `transforms` holds their 4x4
+        transforms. Every move translates its `moving` pieces by `offset`
+        over `steps` steps.
+    """
+    arrays = {}
+    for s, shape in enumerate(puzzle.shapes):
+        for name, array in mesh_arrays(cached_mesh(shape.voxels, True)).items():
+            arrays[f"shape{s}_{name}"] = array
+
+    frames = keyframes(disassembly)
+    arrays["num_pieces"] = np.array([len(frame.shapes) for frame in frames], np.uint8)
+    arrays["steps"] = np.array([frame.steps for frame in frames], np.uint8)
+    arrays["offsets"] = np.array([frame.offset for frame in frames], np.int16).reshape(-1, 3)
+    if frames:
+        arrays["shapes"] = np.concatenate([frame.shapes for frame in frames]).astype(np.uint8)
+        arrays["transforms"] = np.concatenate([frame.transforms for frame in frames]).astype(np.int16)
+        arrays["moving"] = np.concatenate([frame.moving for frame in frames])
+    else:
+        arrays["shapes"] = np.zeros(0, np.uint8)
+        arrays["transforms"] = np.zeros((0, 4, 4), np.int16)
+        arrays["moving"] = np.zeros(0, bool)
+
+    return arrays
+
+
+def keyframe_document(puzzle: Puzzle, disassembly: List[Tuple[PuzzleState, Move]]) -> dict:
+    """Return the meshes and keyframes of a disassembly in a JSON-friendly form.
+
+    Description:
+        Each keyframe lists the pieces before the move as (shape, 4x4
+        transform in row-major order) pairs, the indices of the pieces
+        which move, and the offset they move by over the move's steps.
+    """
+    meshes = []
+    for shape in puzzle.shapes:
+        arrays = mesh_arrays(cached_mesh(shape.voxels, True))
+        meshes.append({name: array.reshape(-1).tolist() for name, array in arrays.items()})
+
+    frames = [{"shapes": frame.shapes.tolist(),
+               "transforms": frame.transforms.astype(np.int16).reshape(len(frame.shapes), 16).tolist(),
+               "moving": np.nonzero(frame.moving)[0].tolist(),
+               "offset": frame.offset.astype(np.int16).tolist(),
+               "steps": frame.steps}
+              for frame in keyframes(disassembly)]
+    return {"meshes": meshes, "keyframes": frames}
+
+
+def save_keyframes(path: str, puzzle: Puzzle, disassembly: List[Tuple[PuzzleState, Move]]):
+    """Save a disassembly as keyframes, as a NumPy archive if the path ends in .npz and JSON otherwise."""
+    if path.endswith(".npz"):
+        np.savez_compressed(path, **keyframe_arrays(puzzle, disassembly))
+        return
+
+    with open(path, "w") as f:
+        json.dump(keyframe_document(puzzle, disassembly), f, separators=(",", ":"))
+
+
+def replay(puzzle: Puzzle, assembly: str, moves: List[str]) -> List[Tuple[PuzzleState, Move]]:
+    """Rebuild a disassembly (as returned by `solver.disassemble`) from its stored strings."""
+    state = puzzle.to_state(PuzzleState.from_string(assembly))
+    disassembly = []
+    for text in moves:
+        move = Move.from_string(text)
+        disassembly.append((state.state(), move))
+        state = state.do_move(move)
+
+    disassembly.append((state.state(), None))
+    return disassembly
+
+
+"""A puzzle to export from a library.
+
+The assembly and moves are the first stored disassembly, or None.
+"""
+ExportTask = NamedTuple("ExportTask", [("index", int),
+                                       ("shapes", List[str]),
+                                       ("assembly", str),
+                                       ("moves", List[str])])
+
+
+def export_puzzle(task: ExportTask, output_dir: str, shapes=False, scale=10,
+                  keyframe_format: str = None) -> List[str]:
+    """Export the assembly (and optionally each shape) of a puzzle, returning the paths written.
+
+    If `keyframe_format` is "json" or "npz", the stored disassembly is also
+    exported as keyframes (see `save_keyframes`).
+    """
+    puzzle = Puzzle.from_text(task.shapes)
+    paths = []
+    if task.assembly is not None:
+        path = os.path.join(output_dir, f"puzzle{task.index}_assembly.stl")
+        save_state_stl(path, puzzle, PuzzleState.from_string(task.assembly), scale)
+        paths.append(path)
+
+    if keyframe_format is not None and task.moves is not None:
+        path = os.path.join(output_dir, f"puzzle{task.index}_keyframes.{keyframe_format}")
+        save_keyframes(path, puzzle, replay(puzzle, task.assembly, task.moves))
+        paths.append(path)
+
+    if shapes:
+        for i, shape in enumerate(puzzle.shapes):
+            path = os.path.join(output_dir, f"puzzle{task.index}_shape{i}.stl")
+            write_binary_stl(path, shape_triangles(shape, scale))
+            paths.append(path)
+
+    return paths
+
+
+def export_batch(batch: List[ExportTask], output_dir: str, shapes: bool, scale: int,
+                 keyframe_format: str) -> List[str]:
+    """Export a batch of puzzles."""
+    return [path for task in batch
+            for path in export_puzzle(task, output_dir, shapes, scale, keyframe_format)]
+
+
+def export_tasks(puzzles: Iterable[Mapping]) -> Iterator[ExportTask]:
+    """Generate a task for each puzzle entry, using its first stored assembly."""
+    for index, info in enumerate(puzzles):
+        assemblies = info.get("assemblies") or {}
+        assembly = next(iter(assemblies), None)
+        yield ExportTask(index, info["shapes"], assembly, assemblies.get(assembly))
+
+
+def export_library(puzzles: Iterable[Mapping], output_dir: str, shapes=False, scale=10,
+                   num_workers: int = None, batch_size=32, keyframe_format: str = None) -> Tuple[int, int]:
+    """Export every puzzle of a puzzle file across a process pool.
+
+    Args:
+        puzzles: Puzzle entries in the JSON schema (for example a `Library`).
+        output_dir: The directory to write the files to.
+        shapes: Whether to export each shape as well as the assembly.
+        scale: The scale factor applied to the vertices.
+        num_workers: The number of worker processes (defaults to the CPU
+                     count). If 1, the puzzles are exported in this process.
+        batch_size: The number of puzzles sent to a worker at a time.
+        keyframe_format: Optionally "json" or "npz", to also export the
+                         stored disassembly of each puzzle as keyframes.
+
+    Returns:
+        The number of puzzles and the number of files written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    num_puzzles = 0
+    num_files = 0
+    batches = chunks(export_tasks(puzzles), batch_size)
+    if num_workers == 1:
+        for batch in batches:
+            num_puzzles += len(batch)
+            num_files += len(export_batch(batch, output_dir, shapes, scale, keyframe_format))
+
+        return num_puzzles, num_files
+
+    num_workers = num_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for batch, future in submit_bounded(executor, export_batch, batches, output_dir, shapes, scale,
+                                            keyframe_format, max_pending=2 * num_workers):
+            num_puzzles += len(batch)
+            num_files += len(future.result())
+
+    return num_puzzles, num_files
@@ -0,0 +1,263 @@
+"""External-memory A*.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+`astar.astar` keeps every state it has seen in memory, in `came_from`,
+`cost_so_far` and the frontier. This version keeps states on disk as
+fixed-size records of (state, parent, edge), packed by a `Codec`, and only
+holds a bounded number of them in memory at once.
+
+The open states are kept in buckets by their cost so far g and heuristic h.
+Newly generated records are buffered in memory, and once `max_states` are
+buffered every bucket's buffer is sorted and written out as a run. The
+search expands the bucket with the lowest f = g + h (and then the lowest h),
+merging its runs into one sorted stream. Duplicates are not looked up as
+states are generated but removed in this merge, in a batch ("delayed
+duplicate detection"): within the bucket, and against the closed layers,
+which are the sorted files of the buckets already expanded. As a state
+always has the same h, only the closed layers with the same h and a cost no
+greater than g need to be read. The surviving records are expanded and
+written out as a new closed layer, from which the path is rebuilt at the
+end by looking up each parent with a binary search.
+
+Costs must be integers, and as with `astar.astar` the path found is
+optimal if the heuristic is admissible.
+"""
+
+from collections import defaultdict
+from heapq import merge
+import os
+import tempfile
+from typing import BinaryIO, Callable, Iterator, List, Mapping, NamedTuple, Tuple
+
+
+"""Packing of states and edges into fixed-size records.
+
+Attributes:
+    pack_state: Function giving `state_size` bytes for a state. Equal
+                states must give equal bytes.
+    unpack_state: The inverse of `pack_state`.
+    state_size: The size of a packed state.
+    pack_edge: Function giving `edge_size` bytes for an edge.
+    unpack_edge: Function taking the packed edge and the state it leaves
+                 and returning the edge.
+    edge_size: The size of a packed edge.
+"""
+Codec = NamedTuple("Codec", [("pack_state", Callable),
+                             ("unpack_state", Callable),
+                             ("state_size", int),
+                             ("pack_edge", Callable),
+                             ("unpack_edge", Callable),
+                             ("edge_size", int)])
+
+
+"""The default number of records held in memory."""
+MAX_STATES = 1 << 20
+
+
+def read_records(path: str, size: int) -> Iterator[bytes]:
+    """Generate the records of a run file."""
+    with open(path, "rb") as f:
+        while True:
+            record = f.read(size)
+            if not record:
+                return
+
+            yield record
+
+
+def find_record(f: BinaryIO, size: int, key: bytes) -> bytes:
+    """Binary search a sorted file of records for the one starting with a key, or return None."""
+    f.seek(0, os.SEEK_END)
+    lo, hi = 0, f.tell() // size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid * size)
+        record = f.read(size)
+        if record[:len(key)] < key:
+            lo = mid + 1
+        elif record[:len(key)] > key:
+            hi = mid
+        else:
+            return record
+
+    return None
+
+
+def unique(records: Iterator[bytes], key_size: int, closed: Iterator[bytes]) -> Iterator[Tuple[bytes, bool]]:
+    """Pair each record of a sorted stream with whether it is a duplicate.
+
+    A record is a duplicate if an earlier record in the stream, or any
+    record of the sorted closed stream, has the same key.
+    """
+    previous = None
+    closed_key = next(closed, None)
+    for record in records:
+        key = record[:key_size]
+        while closed_key is not None and closed_key[:key_size] < key:
+            closed_key = next(closed, None)
+
+        duplicate = key == previous or (closed_key is not None and closed_key[:key_size] == key)
+        previous = key
+        yield record, duplicate
+
+
+class BucketStore:
+    """Open buckets and closed layers of records, spilled to a directory."""
+
+    def __init__(self, directory: str, record_size: int, max_states: int):
+        """Constructor."""
+        self.directory = directory
+        self.record_size = record_size
+        self.max_states = max_states
+        self.buffers: Mapping[Tuple[int, int], List[bytes]] = defaultdict(list)
+        self.runs: Mapping[Tuple[int, int], List[str]] = defaultdict(list)
+        self.closed: Mapping[int, List[Tuple[int, str]]] = defaultdict(list)
+        self.num_buffered = 0
+        self.num_open = 0
+        self.num_files = 0
+
+    def new_path(self, kind: str, g: int, h: int) -> str:
+        """Return the path of a new file."""
+        self.num_files += 1
+        return os.path.join(self.directory, f"{kind}_{g}_{h}_{self.num_files}.run")
+
+    def add(self, g: int, h: int, record: bytes):
+        """Add a record to an open bucket, spilling every buffer once too many are held."""
+        self.buffers[g, h].append(record)
+        self.num_buffered += 1
+        self.num_open += 1
+        if self.num_buffered >= self.max_states:
+            self.spill()
+
+    def spill(self):
+        """Write every buffer as a sorted run."""
+        for (g, h), records in self.buffers.items():
+            path = self.new_path("open", g, h)
+            with open(path, "wb") as f:
+                f.write(b"".join(sorted(records)))
+
+            self.runs[g, h].append(path)
+
+        self.buffers.clear()
+        self.num_buffered = 0
+
+    def next_bucket(self) -> Tuple[int, int]:
+        """Return the open bucket with the lowest (f, h), breaking ties towards the goal as `astar` does."""
+        keys = set(self.buffers) | set(self.runs)
+        if not keys:
+            return None
+
+        return min(keys, key=lambda k: (k[0] + k[1], k[1]))
+
+    def take(self, g: int, h: int) -> Iterator[bytes]:
+        """Remove an open bucket, returning its records in sorted order."""
+        records = sorted(self.buffers.pop((g, h), []))
+        self.num_buffered -= len(records)
+        paths = self.runs.pop((g, h), [])
+        streams = [iter(records)] + [read_records(path, self.record_size) for path in paths]
+        for record in merge(*streams):
+            self.num_open -= 1
+            yield record
+
+        for path in paths:
+            os.remove(path)
+
+    def closed_records(self, g: int, h: int) -> Iterator[bytes]:
+        """Return the sorted records of the closed layers with heuristic h and cost at most g."""
+        return merge(*[read_records(path, self.record_size) for cost, path in self.closed[h] if cost <= g])
+
+    def find_closed(self, g: int, h: int, key: bytes) -> bytes:
+        """Find the closed record of a state with the given cost and heuristic."""
+        for cost, path in self.closed[h]:
+            if cost == g:
+                with open(path, "rb") as f:
+                    record = find_record(f, self.record_size, key)
+
+                if record is not None:
+                    return record
+
+        raise KeyError(key)
+
+
+def external_astar(distance, heuristic, neighbors, is_goal, start, codec: Codec, callback=None, stats=None,
+                   max_states=MAX_STATES, directory: str = None) -> List[Tuple]:
+    """A* search which keeps its states on disk.
+
+    Args:
+        distance: Function to calculate the (integer) distance between two states.
+        heuristic: Function to estimate the cost from a state to the goal.
+        neighbors: Function to get the neighboring states of a given state.
+        is_goal: Function to check if a state is the goal.
+        start: The starting state.
+        codec: How to pack the states and edges.
+        callback: Optional function called with the number of open records
+                  each time a state is expanded.
+        stats: Optional `stats.Statistics` which records the expansions,
+               open records and duplicates.
+        max_states: The number of generated records held in memory before
+                    they are written to disk.
+        directory: The directory in which to create the temporary files
+                   (defaults to the system temporary directory).
+
+    Returns:
+        The path as returned by `astar.astar`, or None if the goal cannot
+        be reached.
+    """
+    size = codec.state_size
+    record_size = 2 * size + codec.edge_size
+    with tempfile.TemporaryDirectory(prefix="burrsolver-", dir=directory) as tmp:
+        store = BucketStore(tmp, record_size, max_states)
+        packed = codec.pack_state(start)
+        # the start is its own parent
+        store.add(0, heuristic(start), packed + packed + bytes(codec.edge_size))
+        while True:
+            bucket = store.next_bucket()
+            if bucket is None:
+                return None
+
+            g, h = bucket
+            path = store.new_path("closed", g, h)
+            with open(path, "wb") as f:
+                closed = store.closed_records(g, h)
+                for record, duplicate in unique(store.take(g, h), size, closed):
+                    if stats is not None and record[:size] != record[size:2 * size]:
+                        stats.neighbor(duplicate)
+
+                    if duplicate:
+                        continue
+
+                    f.write(record)
+                    x = codec.unpack_state(record[:size])
+                    if is_goal(x):
+                        return reconstruct_path(store, distance, heuristic, codec, x, g, record)
+
+                    if callback is not None:
+                        callback(store.num_open)
+
+                    if stats is not None:
+                        stats.expand(store.num_open)
+
+                    parent = record[:size]
+                    for e, y in neighbors(x):
+                        store.add(g + distance(x, y), heuristic(y),
+                                  codec.pack_state(y) + parent + codec.pack_edge(e))
+
+            store.closed[h].append((g, path))
+
+
+def reconstruct_path(store: BucketStore, distance, heuristic, codec: Codec, goal, g: int,
+                     record: bytes) -> List[Tuple]:
+    """Rebuild the path to the goal by looking up each parent in the closed layers."""
+    size = codec.state_size
+    path = [(goal, None)]
+    state = goal
+    while record[:size] != record[size:2 * size]:
+        parent = codec.unpack_state(record[size:2 * size])
+        edge = codec.unpack_edge(record[2 * size:], parent)
+        path.append((parent, edge))
+        g -= distance(parent, state)
+        record = store.find_closed(g, heuristic(parent), record[size:2 * size])
+        state = parent
+
+    return path[::-1]
@@ -4,7 +4,9 @@ NB: Nothing in this module is in scope for the Tripos. Students do not
 need to understand how this works, but may find it interesting.
 """
 
-from typing import List, Mapping, NamedTuple, Tuple
+from functools import lru_cache
+import os
+from typing import List, NamedTuple, Sequence, Tuple
 
 import numpy as np
 
@@ -71,170 +73,245 @@ class Facet(NamedTuple("Facet", [("normal", Vec3), ("loop", Tuple[Vec3, Vec3, Ve
         file.write("endfacet\n")
 
 
-Quad = NamedTuple("Quad", [("normal", Vec3), ("loop", Tuple[Vec3, Vec3, Vec3, Vec3])])
-
-
-def remove_duplicate_quads(quads: List[Quad]) -> List[Quad]:
-    dedup = {}
-    for quad in quads:
-        key = tuple(sorted(quad.loop))
-        if key in dedup:
-            del dedup[key]
-        else:
-            dedup[key] = quad
-
-    return list(dedup.values())
-
-
-def merge_quads(quads: List[Quad]) -> List[Quad]:
-    quads_by_vertex: Mapping[Tuple[Vec3, Vec3], List[Quad]] = {}
-    for quad in quads:
-        for v in quad.loop:
-            key = v, quad.normal
-            if key not in quads_by_vertex:
-                quads_by_vertex[key] = []
-
-            quads_by_vertex[key].append(quad)
-
-    keys_by_degree = sorted(quads_by_vertex.keys(), key=lambda k: len(quads_by_vertex[k]), reverse=True)
-    merged = set()
-    new_quads = []
-    for key in keys_by_degree:
-        quads_to_merge = quads_by_vertex[key]
-        if len(quads_to_merge) == 1:
-            break
-
-        do_merge = True
-        for quad in quads_to_merge:
-            if quad in merged:
-                do_merge = False
-                break
-
-        if not do_merge:
+"""Set BURRSOLVER_DEBUG to check every mesh as it is built."""
+DEBUG = os.environ.get("BURRSOLVER_DEBUG", "") not in ("", "0")
+
+"""The corners, face normals and faces (as loops of corners) of a voxel."""
+CUBE_VERTICES = np.array([[-1, -1, -1], [-1, 1, -1], [1, 1, -1], [1, -1, -1],
+                          [-1, -1, 1], [-1, 1, 1], [1, 1, 1], [1, -1, 1]], np.int32) * (SIZE // 2)
+CUBE_NORMALS = np.array([[0, 0, -1], [0, 0, 1], [0, -1, 0],
+                         [0, 1, 0], [-1, 0, 0], [1, 0, 0]], np.int32)
+CUBE_QUADS = np.array([[0, 1, 2, 3], [7, 6, 5, 4], [4, 0, 3, 7],
+                       [2, 1, 5, 6], [4, 5, 1, 0], [2, 6, 7, 3]], np.int32)
+
+
+def exposed_faces(voxels: Sequence[Voxel]) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the faces of a set of voxels which are not shared with another voxel.
+
+    Description:
+        The voxels are written into a dense occupancy grid with a border of
+        one empty cell, so that a face is exposed exactly when the grid cell
+        on the other side of it is empty.
+
+    Returns:
+        The centers of the voxels (N, 3) and a boolean array (N, 6) saying
+        which of their faces (in the order of `CUBE_NORMALS`) are exposed.
+    """
+    centers = np.unique(np.array(voxels, np.int32).reshape(-1, 3), axis=0)
+    if len(centers) == 0:
+        return centers, np.zeros((0, 6), bool)
+
+    index = (centers - centers.min(axis=0)) // SIZE + 1
+    grid = np.zeros(index.max(axis=0) + 2, bool)
+    grid[tuple(index.T)] = True
+    neighbors = index[:, np.newaxis, :] + CUBE_NORMALS
+    return centers, ~grid[neighbors[..., 0], neighbors[..., 1], neighbors[..., 2]]
+
+
+def greedy_rectangles(mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Cover the set cells of a 2D mask with maximal rectangles, in a single pass.
+
+    Description:
+        Cells are visited in row-major order. Each unused set cell starts a
+        rectangle which is grown along its row as far as possible, and then
+        down over every following row in which the whole span is set and unused.
+
+    Returns:
+        The rectangles as (row, column, number of rows, number of columns).
+    """
+    free = mask.copy()
+    rectangles = []
+    for i, j in zip(*np.nonzero(mask)):
+        if not free[i, j]:
             continue
 
-        normal = quads_to_merge[0].normal
-        vert_counts = {}
-        for quad in quads_to_merge:
-            for v in quad.loop:
-                if v not in vert_counts:
-                    vert_counts[v] = 0
-                vert_counts[v] += 1
-        loop = [v for v in vert_counts if vert_counts[v] == 1]
-        if len(loop) != 4:
-            continue
-
-        for quad in quads_to_merge:
-            merged.add(quad)
-
-        ab = loop[1] - loop[0]
-        ac = loop[2] - loop[0]
-        bd = loop[3] - loop[1]
-        if ac == bd:
-            loop = [loop[0], loop[1], loop[3], loop[2]]
-            ac = loop[2] - loop[0]
-
-        if ab.cross(ac).dot(normal) <= 0:
-            loop.reverse()
-            ab = loop[1] - loop[0]
-            ac = loop[2] - loop[0]
-            assert ab.cross(ac).dot(normal) > 0
-
-        new_quads.append(Quad(normal, tuple(loop)))
-
-    for quad in quads:
-        if quad not in merged:
-            new_quads.append(quad)
-
-    return new_quads
+        row = free[i, j:]
+        width = len(row) if row.all() else int(np.argmin(row))
+        height = 1
+        while i + height < free.shape[0] and free[i + height, j:j + width].all():
+            height += 1
+
+        free[i:i + height, j:j + width] = False
+        rectangles.append((i, j, height, width))
+
+    return rectangles
+
+
+def greedy_quads(centers: np.ndarray, exposed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge the exposed faces of voxels into maximal coplanar rectangles.
+
+    Description:
+        Faces with the same normal which lie in the same plane form a 2D
+        mask, which is covered by `greedy_rectangles`. The corners of each
+        rectangle are placed in the same order as the corners of the
+        matching face of a single voxel (see `CUBE_QUADS`), so the winding
+        is unchanged. The merged quads cover exactly the same surface, so a
+        closed voxel surface stays closed, although a corner of one quad
+        may lie partway along an edge of its neighbour (a T-junction, which
+        `Mesh.triangles` splits so that the triangles are watertight).
+
+    Args:
+        centers: The voxel centers (N, 3), as from `exposed_faces`.
+        exposed: Which faces of each voxel are exposed (N, 6).
+
+    Returns:
+        The quad loops (Q, 4, 3) and normals (Q, 3).
+    """
+    if len(centers) == 0:
+        return np.zeros((0, 4, 3), np.int32), np.zeros((0, 3), np.int32)
+
+    origin = centers.min(axis=0)
+    index = (centers - origin) // SIZE
+    shape = tuple(index.max(axis=0) + 1)
+    loops = []
+    normals = []
+    for f, normal in enumerate(CUBE_NORMALS):
+        axis = int(np.nonzero(normal)[0][0])
+        u, v = [a for a in range(3) if a != axis]
+        grid = np.zeros(shape, bool)
+        grid[tuple(index[exposed[:, f]].T)] = True
+        # the corner signs of the face along (axis, u, v), e.g. -1 for the low edge
+        signs = CUBE_VERTICES[CUBE_QUADS[f]] // (SIZE // 2)
+        for k in np.nonzero(grid.any(axis=tuple(a for a in range(3) if a != axis)))[0]:
+            for i, j, height, width in greedy_rectangles(np.take(grid, k, axis=axis)):
+                low = np.zeros(3, np.int32)
+                high = np.zeros(3, np.int32)
+                low[axis] = high[axis] = k
+                low[u], low[v] = i, j
+                high[u], high[v] = i + height - 1, j + width - 1
+                # centers of the corner voxels, moved out to their edges
+                corners = np.where(signs > 0, high, low) * SIZE + origin + signs * (SIZE // 2)
+                loops.append(corners)
+                normals.append(normal)
+
+    return np.array(loops, np.int32).reshape(-1, 4, 3), np.array(normals, np.int32).reshape(-1, 3)
 
 
 class Mesh(NamedTuple("Mesh", [("vertices", np.ndarray), ("normals", np.ndarray), ("quads", np.ndarray)])):
     @staticmethod
-    def from_voxels(voxels: List[Voxel], merge_mesh=False) -> "Mesh":
-        s = SIZE // 2
-        cube_vertices = [
-            Vec3(-s, -s, -s),
-            Vec3(-s, s, -s),
-            Vec3(s, s, -s),
-            Vec3(s, -s, -s),
-            Vec3(-s, -s, s),
-            Vec3(-s, s, s),
-            Vec3(s, s, s),
-            Vec3(s, -s, s)
-        ]
-        cube_normals = [
-            Vec3(0, 0, -1),
-            Vec3(0, 0, 1),
-            Vec3(0, -1, 0),
-            Vec3(0, 1, 0),
-            Vec3(-1, 0, 0),
-            Vec3(1, 0, 0)
-        ]
-        cube_quads = [
-            (0, 1, 2, 3),
-            (7, 6, 5, 4),
-            (4, 0, 3, 7),
-            (2, 1, 5, 6),
-            (4, 5, 1, 0),
-            (2, 6, 7, 3)
-        ]
-
-        faces = []
-        for v in voxels:
-            center = Vec3(v.x, v.y, v.z)
-            for normal, (a, b, c, d) in zip(cube_normals, cube_quads):
-                loop = (cube_vertices[a] + center,
-                        cube_vertices[b] + center,
-                        cube_vertices[c] + center,
-                        cube_vertices[d] + center)
-                faces.append(Quad(normal, loop))
+    def from_quads(loops: np.ndarray, normals: np.ndarray) -> "Mesh":
+        """Create a mesh from quad loops (Q, 4, 3) and their normals (Q, 3).
+
+        Vertices are shared between quads with the same normal.
+        """
+        keys = np.concatenate([loops.reshape(-1, 3), np.repeat(normals, 4, axis=0)], axis=1)
+        if len(keys) == 0:
+            return Mesh(np.zeros((0, 3), np.float32), np.zeros((0, 3), np.float32),
+                        np.zeros((0, 4), np.int32))
+
+        unique, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        # number the vertices in the order they are first used
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        unique = unique[order]
+        quads = rank[inverse.reshape(-1)].reshape(-1, 4).astype(np.int32)
+        return Mesh(unique[:, :3].astype(np.float32), unique[:, 3:].astype(np.float32), quads)
+
+    @staticmethod
+    def from_voxels(voxels: Sequence[Voxel], merge_mesh=False) -> "Mesh":
+        """Create a mesh of the exposed faces of a set of voxels.
 
+        Args:
+            voxels: The voxels.
+            merge_mesh: Whether to merge coplanar faces into larger quads (see `greedy_quads`).
+
+        Returns:
+            The mesh, which is checked with `validate` if `DEBUG` is set.
+        """
+        centers, exposed = exposed_faces(voxels)
         if merge_mesh:
-            faces = remove_duplicate_quads(faces)
-            merged_faces = merge_quads(faces)
-            while len(merged_faces) < len(faces):
-                faces = merged_faces
-                merged_faces = merge_quads(faces)
-
-        # assemble vertices, normals, and faces
-
-        # cycle through facets
-        vertex_indices: Mapping[Tuple[Vec3, Vec3], int] = {}
-        quads = []
-        for quad in faces:
-            for v in quad.loop:
-                key = v, quad.normal
-                if key not in vertex_indices:
-                    vertex_indices[key] = len(vertex_indices)
-
-            a = vertex_indices[(quad.loop[0], quad.normal)]
-            b = vertex_indices[(quad.loop[1], quad.normal)]
-            c = vertex_indices[(quad.loop[2], quad.normal)]
-            d = vertex_indices[(quad.loop[3], quad.normal)]
-            quads.append([a, b, c, d])
-
-        vertices = np.zeros((len(vertex_indices), 3), dtype=np.float32)
-        normals = np.zeros((len(vertex_indices), 3), dtype=np.float32)
-        for (v, n), i in vertex_indices.items():
-            vertices[i] = v
-            normals[i] = n
-
-        quads = np.array(quads, dtype=np.int32)
-
-        for a, b, c, d in quads:
-            v0 = vertices[a]
-            v1 = vertices[b]
-            v2 = vertices[c]
-            v3 = vertices[d]
-            n0 = normals[a]
-            n1 = normals[b]
-            n2 = normals[c]
-            n3 = normals[d]
-            assert np.allclose(n0, n1)
-            assert np.allclose(n1, n2)
-            assert np.allclose(n2, n3)
-            assert np.dot(np.cross(v1 - v0, v2 - v0), n0) > 0
-            assert np.dot(np.cross(v3 - v2, v0 - v2), n0) > 0
-
-        return Mesh(vertices, normals, quads)
+            loops, normals = greedy_quads(centers, exposed)
+        else:
+            voxel_index, face = np.nonzero(exposed)
+            loops = centers[voxel_index, np.newaxis, :] + CUBE_VERTICES[CUBE_QUADS[face]]
+            normals = CUBE_NORMALS[face]
+
+        mesh = Mesh.from_quads(loops, normals)
+        if DEBUG:
+            mesh.validate()
+
+        return mesh
+
+    def triangles(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Split the quads into triangles which meet edge to edge.
+
+        Description:
+            A quad with no vertex of another quad along its edges is split
+            into two triangles. Otherwise the vertices on its edges are
+            added to its boundary, and it is split into a fan of triangles
+            about its center, so that no vertex lies partway along the edge
+            of a triangle and the surface is watertight.
+
+        Returns:
+            The corners of the triangles (T, 3, 3) and their normals (T, 3).
+        """
+        loops = self.vertices[self.quads]
+        normals = self.normals[self.quads[:, 0]]
+        points = np.unique(self.vertices, axis=0)
+        # the vertices strictly inside each edge of each quad (Q, 4, P)
+        start = loops[:, :, np.newaxis, :]
+        end = np.roll(loops, -1, axis=1)[:, :, np.newaxis, :]
+        offset = points - start
+        along = end - start
+        cross = np.cross(offset, np.broadcast_to(along, offset.shape))
+        t = np.einsum("qepi,qepi->qep", offset, np.broadcast_to(along, offset.shape)) \
+            / np.einsum("qepi,qepi->qep", along, along)
+        inside = np.all(cross == 0, axis=-1) & (t > 0) & (t < 1)
+
+        corners = []
+        triangle_normals = []
+        for q in range(len(loops)):
+            if not inside[q].any():
+                corners.append(loops[q, [0, 1, 2]])
+                corners.append(loops[q, [2, 3, 0]])
+                triangle_normals.extend([normals[q], normals[q]])
+                continue
+
+            boundary = []
+            for e in range(4):
+                boundary.append(loops[q, e])
+                extra = np.nonzero(inside[q, e])[0]
+                boundary.extend(points[extra[np.argsort(t[q, e, extra])]])
+
+            center = loops[q].mean(axis=0)
+            for a, b in zip(boundary, boundary[1:] + boundary[:1]):
+                corners.append(np.stack([center, a, b]))
+                triangle_normals.append(normals[q])
+
+        return (np.array(corners, np.float32).reshape(-1, 3, 3),
+                np.array(triangle_normals, np.float32).reshape(-1, 3))
+
+    def validate(self):
+        """Check that the vertices of every quad share a normal and are wound about it.
+
+        Raises:
+            ValueError: If a quad has inconsistent normals or is wound the wrong way.
+        """
+        v0, v1, v2, v3 = (self.vertices[self.quads[:, i]] for i in range(4))
+        n = self.normals[self.quads]
+        if not np.allclose(n, n[:, :1]):
+            raise ValueError("Quad vertices have different normals")
+
+        n0 = n[:, 0]
+        if (np.einsum("ij,ij->i", np.cross(v1 - v0, v2 - v0), n0) <= 0).any() or \
+                (np.einsum("ij,ij->i", np.cross(v3 - v2, v0 - v2), n0) <= 0).any():
+            raise ValueError("Quad is not wound counter-clockwise about its normal")
+
+
+@lru_cache(maxsize=1024)
+def _cached_mesh(fingerprint: Tuple[Voxel, ...], merge_mesh: bool) -> Mesh:
+    mesh = Mesh.from_voxels(fingerprint, merge_mesh)
+    for array in mesh:
+        # the mesh is shared by every caller, so it must not be changed
+        array.setflags(write=False)
+
+    return mesh
+
+
+def cached_mesh(voxels: Sequence[Voxel], merge_mesh=False) -> Mesh:
+    """Return the mesh for a set of voxels, reusing it if the same voxels were meshed before.
+
+    The returned arrays are read-only.
+    """
+    return _cached_mesh(tuple(sorted(set(voxels))), merge_mesh)
@@ -0,0 +1,300 @@
+"""Hash-distributed parallel A* (HDA*).
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Every state is owned by one worker process, chosen by a hash of its key
+(e.g. its packed encoding), and only the owner keeps its cost and parent or
+puts it on an open list. A worker expands the best state on its own open
+list and sends each successor to its owner, batching the successors for
+each owner to keep the queue traffic down. Workers never wait for each
+other, so a state may be expanded before its best cost is known and then
+expanded again, as in the sequential `astar` when a better path is found.
+
+The coordinator (the calling process) keeps the best goal found so far.
+The search is over once no worker has an open state with a priority below
+that goal's and no successors are still in flight. Without a goal this
+means the search space is exhausted. To detect this, the coordinator
+probes the workers in waves; each reply gives the worker's best priority
+and how many batches it has sent and received. The search stops after two
+waves with identical counts in which every worker was idle and every batch
+sent had been received. As in A*, the path found is optimal if the
+heuristic is admissible.
+
+The workers are forked, so the search functions need not be picklable,
+but the states and edges must be.
+"""
+
+from heapq import heappop, heappush
+import multiprocessing
+import os
+import queue
+import time
+from typing import Callable, List, Tuple
+import zlib
+
+from .astar import Step
+
+
+"""Seconds between probes of the workers' status."""
+PROBE_INTERVAL = 0.005
+
+
+def owner_of(key: Callable, num_workers: int, state) -> int:
+    """Return the worker which owns a state."""
+    if key is None:
+        return hash(state) % num_workers
+
+    return zlib.crc32(key(state)) % num_workers
+
+
+def worker(index: int, num_workers: int, inboxes: List[multiprocessing.Queue],
+           results: multiprocessing.Queue, distance, heuristic, neighbors, is_goal,
+           key: Callable, batch_size: int):
+    """Run one HDA* worker until it is told to stop.
+
+    Messages to a worker are tuples whose first item is their kind:
+
+        ("states", [(cost, state, parent, edge), ...])
+        ("incumbent", priority)     the priority of the best goal so far
+        ("probe", wave)             reply with ("status", ...)
+        ("parent", state)           reply with ("parent", state, step)
+        ("stop",)
+    """
+    inbox = inboxes[index]
+    frontier = []
+    cost_so_far = {}
+    came_from = {}
+    outboxes = [[] for _ in range(num_workers)]
+    incumbent = float("inf")
+    num_sent = 0
+    num_received = 0
+    num_expanded = 0
+    num_generated = 0
+    num_revisits = 0
+
+    def receive(cost, state, parent, edge):
+        nonlocal num_revisits
+        if cost < cost_so_far.get(state, float("inf")):
+            cost_so_far[state] = cost
+            came_from[state] = None if parent is None else Step(parent, edge)
+            h = heuristic(state)
+            heappush(frontier, (cost + h, h, cost, state))
+        else:
+            num_revisits += 1
+
+    def flush(i: int):
+        nonlocal num_sent
+        if outboxes[i]:
+            inboxes[i].put(("states", outboxes[i]))
+            outboxes[i] = []
+            num_sent += 1
+
+    def handle(message) -> bool:
+        nonlocal incumbent, num_received
+        kind = message[0]
+        if kind == "states":
+            num_received += 1
+            for item in message[1]:
+                receive(*item)
+        elif kind == "incumbent":
+            incumbent = min(incumbent, message[1])
+        elif kind == "probe":
+            for i in range(num_workers):
+                flush(i)
+
+            best = frontier[0][0] if frontier else float("inf")
+            results.put(("status", index, message[1], best, num_sent, num_received,
+                         num_expanded, num_generated, num_revisits, len(frontier)))
+        elif kind == "parent":
+            results.put(("parent", message[1], came_from.get(message[1])))
+        elif kind == "stop":
+            return False
+
+        return True
+
+    while True:
+        try:
+            message = inbox.get_nowait() if frontier and frontier[0][0] < incumbent else inbox.get()
+        except queue.Empty:
+            message = None
+
+        if message is not None:
+            if not handle(message):
+                return
+
+            continue
+
+        priority, _, cost, x = heappop(frontier)
+        if cost > cost_so_far[x]:
+            # a better path to this state was found after it was queued
+            continue
+
+        if is_goal(x):
+            results.put(("goal", priority, x))
+            continue
+
+        num_expanded += 1
+        for e, y in neighbors(x):
+            num_generated += 1
+            owner = owner_of(key, num_workers, y)
+            new_cost = cost + distance(x, y)
+            if owner == index:
+                receive(new_cost, y, x, e)
+            else:
+                outboxes[owner].append((new_cost, y, x, e))
+                if len(outboxes[owner]) >= batch_size:
+                    flush(owner)
+
+        if not frontier or frontier[0][0] >= incumbent:
+            # nothing may be held back while this worker is idle
+            for i in range(num_workers):
+                flush(i)
+
+
+def hda_star(distance, heuristic, neighbors, is_goal, start, callback=None, stats=None,
+             num_workers: int = None, key: Callable = None, batch_size=64) -> List[Tuple]:
+    """Hash-distributed parallel A*.
+
+    Args:
+        distance: Function to calculate the distance between two states.
+        heuristic: Function to estimate the cost from a state to the goal.
+        neighbors: Function to get the neighboring states of a given state.
+        is_goal: Function to check if a state is the goal.
+        start: The starting state.
+        callback: Optional function called with the total size of the
+                  frontiers for each state expanded. The expansions are
+                  reported as each probe wave completes.
+        stats: Optional `stats.Statistics` which records the expansions,
+               frontier sizes and revisits.
+        num_workers: The number of worker processes (defaults to the CPU count).
+        key: Optional function giving bytes for a state, which are hashed
+             to choose its owner. Without it the built-in `hash` is used,
+             which forked workers share.
+        batch_size: The number of successors sent to another worker at once.
+
+    Returns:
+        The path as returned by `astar.astar`, or None if the goal cannot
+        be reached.
+    """
+    num_workers = num_workers or os.cpu_count()
+    context = multiprocessing.get_context("fork")
+    inboxes = [context.Queue() for _ in range(num_workers)]
+    results = context.Queue()
+    workers = [context.Process(target=worker, daemon=True,
+                               args=(i, num_workers, inboxes, results, distance, heuristic,
+                                     neighbors, is_goal, key, batch_size))
+               for i in range(num_workers)]
+    for process in workers:
+        process.start()
+
+    try:
+        goal = search(inboxes, results, start, key, callback, stats)
+        if goal is None:
+            return None
+
+        return reconstruct_path(inboxes, results, key, goal)
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+
+        for process in workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def search(inboxes: List[multiprocessing.Queue], results: multiprocessing.Queue, start,
+           key: Callable, callback, stats):
+    """Run the coordinator until the search terminates, returning the best goal or None."""
+    num_workers = len(inboxes)
+    inboxes[owner_of(key, num_workers, start)].put(("states", [(0, start, None, None)]))
+    num_sent = 1
+    incumbent = float("inf")
+    goal = None
+    wave = 0
+    statuses = {}
+    previous = None
+    totals = [0, 0, 0]
+    next_probe = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if not statuses and now >= next_probe:
+            wave += 1
+            for inbox in inboxes:
+                inbox.put(("probe", wave))
+
+            statuses = {i: None for i in range(num_workers)}
+
+        try:
+            message = results.get(timeout=PROBE_INTERVAL)
+        except queue.Empty:
+            continue
+
+        if message[0] == "goal":
+            _, priority, state = message
+            if priority < incumbent:
+                incumbent = priority
+                goal = state
+                for inbox in inboxes:
+                    inbox.put(("incumbent", priority))
+
+            continue
+
+        if message[0] != "status" or message[2] != wave:
+            continue
+
+        statuses[message[1]] = message[3:]
+        if any(status is None for status in statuses.values()):
+            continue
+
+        report(statuses, totals, callback, stats)
+        idle = all(status[0] >= incumbent for status in statuses.values())
+        counts = [status[1:3] for status in statuses.values()]
+        balanced = num_sent + sum(sent for sent, _ in counts) == sum(received for _, received in counts)
+        if idle and balanced and counts == previous:
+            return goal
+
+        previous = counts if idle and balanced else None
+        statuses = {}
+        next_probe = time.perf_counter() + (0 if previous is not None else PROBE_INTERVAL)
+
+
+def report(statuses, totals: List[int], callback, stats):
+    """Pass on the expansions since the last wave to the callback and statistics."""
+    expanded = sum(status[3] for status in statuses.values())
+    generated = sum(status[4] for status in statuses.values())
+    revisits = sum(status[5] for status in statuses.values())
+    frontier_size = sum(status[6] for status in statuses.values())
+    for _ in range(expanded - totals[0]):
+        if callback is not None:
+            callback(frontier_size)
+
+        if stats is not None:
+            stats.expand(frontier_size)
+
+    if stats is not None:
+        new_revisits = revisits - totals[2]
+        for i in range(generated - totals[1]):
+            stats.neighbor(i < new_revisits)
+
+    totals[:] = [expanded, generated, revisits]
+
+
+def reconstruct_path(inboxes: List[multiprocessing.Queue], results: multiprocessing.Queue,
+                     key: Callable, goal) -> List[Tuple]:
+    """Follow the parents of the goal back to the start, asking each state's owner in turn."""
+    path = [(goal, None)]
+    current = goal
+    while True:
+        inboxes[owner_of(key, len(inboxes), current)].put(("parent", current))
+        while True:
+            message = results.get()
+            if message[0] == "parent" and message[1] == current:
+                break
+
+        step = message[2]
+        if step is None:
+            return path[::-1]
+
+        current, edge = step
+        path.append((current, edge))
@@ -0,0 +1,238 @@
+"""Compact binary puzzle libraries.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+A puzzle library holds the same information as a JSON puzzle file, but can
+be opened instantly whatever its size. It is read through `mmap`, and so
+any puzzle can be looked up in constant time without loading the others.
+The layout is:
+
+    header      magic, number of puzzles and the offsets of the sections
+    metadata    any other top-level entries of the JSON file (e.g. "colors")
+    shapes      six 24-bit shape masks per puzzle, three bytes each
+    index       the offset of each puzzle's results, plus a final end offset
+    results     the "assemblies" of each puzzle as compact JSON
+
+Shapes are stored as masks (see `shape.mask_from_text`), and so the shape
+records for all puzzles can be viewed as a NumPy array without copying.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from typing import Iterable, Iterator, List, Mapping, Sequence, Tuple, Union
+
+from .shape import mask_from_text, mask_to_text
+
+
+MAGIC = b"BURRLIB1"
+HEADER = struct.Struct("<8sQQQQ")
+NUM_SHAPES = 6
+RECORD_SIZE = 3 * NUM_SHAPES
+OFFSET = struct.Struct("<Q")
+
+
+def encode_shapes(shapes: Sequence[str]) -> bytes:
+    """Encode the shapes of a puzzle as a fixed-size record."""
+    if len(shapes) != NUM_SHAPES:
+        raise ValueError(f"Expected {NUM_SHAPES} shapes, got {len(shapes)}")
+
+    return b"".join(mask_from_text(text).to_bytes(3, "big") for text in shapes)
+
+
+def decode_masks(record: bytes) -> Tuple[int, ...]:
+    """Decode a shape record into its masks."""
+    return tuple(int.from_bytes(record[i:i + 3], "big") for i in range(0, RECORD_SIZE, 3))
+
+
+def write_library(path: str, puzzles: Iterable[Mapping], metadata: Mapping = None) -> int:
+    """Write a puzzle library, streaming the puzzles so they need not all be in memory.
+
+    Args:
+        path: The path of the library.
+        puzzles: Entries in the JSON schema, i.e. with "shapes" and
+                 optionally "assemblies".
+        metadata: Other top-level entries of the JSON schema.
+
+    Returns:
+        The number of puzzles written.
+    """
+    meta = json.dumps(metadata or {}, separators=(",", ":")).encode("utf-8")
+    offsets = [0]
+    count = 0
+    # the results are spooled to a temporary file as their total size is
+    # not known until all the puzzles have been seen
+    with open(path, "wb") as f, tempfile.TemporaryFile() as results:
+        f.write(bytes(HEADER.size))
+        f.write(meta)
+        for info in puzzles:
+            f.write(encode_shapes(info["shapes"]))
+            assemblies = info.get("assemblies")
+            if assemblies:
+                results.write(json.dumps(assemblies, separators=(",", ":")).encode("utf-8"))
+
+            offsets.append(results.tell())
+            count += 1
+
+        index_offset = f.tell()
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+
+        results_offset = f.tell()
+        results.seek(0)
+        shutil.copyfileobj(results, f)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, count, len(meta), index_offset, results_offset))
+
+    return count
+
+
+class Library(Sequence):
+    """A read-only, memory-mapped puzzle library.
+
+    Description:
+        Indexing the library gives an entry in the JSON schema, so a library
+        can be used wherever the list of puzzles from a JSON file is.
+        `masks` and `mask_array` give the shapes without building entries.
+    """
+
+    def __init__(self, path: str):
+        """Constructor.
+
+        Raises:
+            ValueError: If the file is not a puzzle library.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError("Not a puzzle library")
+
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, meta_size, self.index_offset, self.results_offset = \
+            HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.data.close()
+            raise ValueError("Not a puzzle library")
+
+        self.shapes_offset = HEADER.size + meta_size
+        self.metadata = json.loads(self.data[HEADER.size:self.shapes_offset])
+
+    def close(self):
+        """Unmap the library."""
+        self.data.close()
+
+    def __enter__(self) -> "Library":
+        """Use the library as a context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Close the library."""
+        self.close()
+
+    def __len__(self) -> int:
+        """The number of puzzles."""
+        return self.count
+
+    def _check(self, i: int) -> int:
+        if i < 0:
+            i += self.count
+
+        if not 0 <= i < self.count:
+            raise IndexError("Puzzle index out of range")
+
+        return i
+
+    def masks(self, i: int) -> Tuple[int, ...]:
+        """Return the shape masks of a puzzle."""
+        start = self.shapes_offset + self._check(i) * RECORD_SIZE
+        return decode_masks(self.data[start:start + RECORD_SIZE])
+
+    def shapes(self, i: int) -> List[str]:
+        """Return the shape strings of a puzzle."""
+        return [mask_to_text(mask) for mask in self.masks(i)]
+
+    def assemblies(self, i: int) -> Mapping[str, List[str]]:
+        """Return the stored assemblies (and their disassemblies) of a puzzle."""
+        start, end = struct.unpack_from("<QQ", self.data, self.index_offset + self._check(i) * OFFSET.size)
+        if start == end:
+            return {}
+
+        return json.loads(self.data[self.results_offset + start:self.results_offset + end])
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[dict, List[dict]]:
+        """Return a puzzle in the JSON schema."""
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+
+        return {"shapes": self.shapes(i), "assemblies": self.assemblies(i)}
+
+    def iter_masks(self) -> Iterator[Tuple[int, ...]]:
+        """Iterate over the shape masks of every puzzle without building entries."""
+        view = memoryview(self.data)[self.shapes_offset:self.shapes_offset + self.count * RECORD_SIZE]
+        try:
+            for start in range(0, len(view), RECORD_SIZE):
+                yield decode_masks(view[start:start + RECORD_SIZE])
+        finally:
+            view.release()
+
+    def mask_array(self):
+        """Return the shape masks of every puzzle as an (N, 6) NumPy array.
+
+        Description:
+            The records are read straight from the mapped file, which makes
+            this suitable for the vectorized functions in `canonical`.
+        """
+        import numpy as np
+
+        raw = np.frombuffer(self.data, dtype=np.uint8, count=self.count * RECORD_SIZE,
+                            offset=self.shapes_offset).reshape(self.count, NUM_SHAPES, 3)
+        raw = raw.astype(np.uint32)
+        return (raw[..., 0] << 16) | (raw[..., 1] << 8) | raw[..., 2]
+
+
+def is_library(path: str) -> bool:
+    """Return whether a file is a puzzle library."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def open_puzzles(path: str) -> Sequence[dict]:
+    """Open a puzzle file, which may be JSON or a library, as a sequence of entries."""
+    if is_library(path):
+        return Library(path)
+
+    with open(path) as f:
+        return json.load(f)["puzzles"]
+
+
+def json_to_library(json_path: str, library_path: str) -> int:
+    """Convert a JSON puzzle file to a library, returning the number of puzzles."""
+    with open(json_path) as f:
+        data = json.load(f)
+
+    metadata = {key: value for key, value in data.items() if key != "puzzles"}
+    return write_library(library_path, data["puzzles"], metadata)
+
+
+def library_to_json(library_path: str, json_path: str) -> int:
+    """Convert a library to a JSON puzzle file, returning the number of puzzles."""
+    with Library(library_path) as library, open(json_path, "w") as f:
+        # the puzzles are written one at a time so that they are never all in memory
+        f.write("{")
+        for key, value in library.metadata.items():
+            f.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+
+        f.write('"puzzles": [')
+        for i in range(len(library)):
+            if i:
+                f.write(", ")
+
+            f.write(json.dumps(library[i]))
+
+        f.write("]}\n")
+        return len(library)
@@ -0,0 +1,148 @@
+"""Meet-in-the-middle enumeration of assemblies.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+`solver.AssemblySearch` places one piece at a time, in any order of the
+places, and so reaches every assembly once for each order in which its
+last five places can be filled. To count or analyse every assembly of a
+puzzle it is far cheaper to split the six places into two halves (by
+default A/B/C and D/E/F) and enumerate each half on its own: every way of
+putting three different shapes at the three places without collisions,
+kept as the set of shapes used and a 216-bit mask of the grid cells
+occupied (see `tables.cell_of`, stored as four 64-bit words).
+
+An assembly is then a pair of half-assemblies whose shape sets are
+complementary and whose masks are disjoint. The halves are bucketed by
+shape set, and each bucket is joined with the bucket of the complementary
+set by a single broadcast `&` of their masks. As in the assembly search,
+the piece at A must have at most two orientations there, and only the
+first of them is used, so that the same assemblies are found.
+"""
+
+from itertools import permutations
+from typing import List, Mapping, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from .piece import Piece
+from .position import PLACES
+from .puzzle import Puzzle, PuzzleState
+from .tables import cell_of, NUM_WORDS
+
+
+"""The default split of the places."""
+HALVES = (("A", "B", "C"), ("D", "E", "F"))
+
+"""The most pairs of half-assemblies compared at once, which bounds the size of the temporary arrays."""
+MAX_PAIRS = 1 << 20
+
+
+"""The half-assemblies of a puzzle at three places.
+
+Attributes:
+    places: The three places.
+    shapes: The shape at each place (N, 3).
+    orientations: The orientation at each place (N, 3).
+    shape_sets: The set of shapes used, as a bitmask (N,).
+    masks: The cells occupied (N, NUM_WORDS).
+"""
+HalfAssemblies = NamedTuple("HalfAssemblies", [("places", Tuple[str, ...]),
+                                               ("shapes", np.ndarray),
+                                               ("orientations", np.ndarray),
+                                               ("shape_sets", np.ndarray),
+                                               ("masks", np.ndarray)])
+
+
+def piece_masks(puzzle: Puzzle, shape: int, place: str) -> Tuple[List[int], np.ndarray]:
+    """Return the orientations of a shape at a place, with the cells each one occupies."""
+    orientations = list(puzzle.shapes[shape].orientations[place])
+    if place == "A":
+        # the assembly search only starts from the first of at most two orientations
+        orientations = orientations[:1] if len(orientations) <= 2 else []
+
+    occupied = np.zeros((len(orientations), NUM_WORDS * 64), bool)
+    for i, o in enumerate(orientations):
+        occupied[i, [cell_of(v) for v in puzzle.voxels_for(Piece(shape, PLACES[place], o))]] = True
+
+    return orientations, np.packbits(occupied, axis=-1, bitorder="little").view("<u8")
+
+
+def enumerate_half(puzzle: Puzzle, places: Sequence[str]) -> HalfAssemblies:
+    """Enumerate every collision-free placement of three different shapes at three places."""
+    options: Mapping[Tuple[int, str], Tuple[List[int], np.ndarray]] = {
+        (s, place): piece_masks(puzzle, s, place) for s in range(len(puzzle.shapes)) for place in places}
+    shapes = [np.zeros((0, 3), np.int64)]
+    orientations = [np.zeros((0, 3), np.int64)]
+    masks = [np.zeros((0, NUM_WORDS), np.uint64)]
+    for triple in permutations(range(len(puzzle.shapes)), 3):
+        (o1, m1), (o2, m2), (o3, m3) = [options[s, place] for s, place in zip(triple, places)]
+        if not (o1 and o2 and o3):
+            continue
+
+        m12 = m1[:, np.newaxis] | m2[np.newaxis]
+        fits = (~(m1[:, np.newaxis] & m2[np.newaxis]).any(-1)[:, :, np.newaxis]
+                & ~(m12[:, :, np.newaxis] & m3[np.newaxis, np.newaxis]).any(-1))
+        i, j, k = np.nonzero(fits)
+        shapes.append(np.broadcast_to(triple, (len(i), 3)))
+        orientations.append(np.stack([np.array(o1)[i], np.array(o2)[j], np.array(o3)[k]], axis=-1))
+        masks.append(m12[i, j] | m3[k])
+
+    shapes = np.concatenate(shapes).astype(np.int8)
+    shape_sets = (1 << shapes.astype(np.int64)).sum(axis=1)
+    return HalfAssemblies(tuple(places), shapes, np.concatenate(orientations).astype(np.int8),
+                          shape_sets, np.concatenate(masks))
+
+
+def join(left: HalfAssemblies, right: HalfAssemblies, num_shapes=6) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the indices of every pair of half-assemblies which make an assembly."""
+    full = (1 << num_shapes) - 1
+    left_rows = [np.zeros(0, np.int64)]
+    right_rows = [np.zeros(0, np.int64)]
+    for shape_set in np.unique(left.shape_sets):
+        lefts = np.nonzero(left.shape_sets == shape_set)[0]
+        rights = np.nonzero(right.shape_sets == full ^ shape_set)[0]
+        if len(rights) == 0:
+            continue
+
+        chunk = max(MAX_PAIRS // len(rights), 1)
+        for start in range(0, len(lefts), chunk):
+            rows = lefts[start:start + chunk]
+            disjoint = ~(left.masks[rows, np.newaxis] & right.masks[np.newaxis, rights]).any(-1)
+            i, j = np.nonzero(disjoint)
+            left_rows.append(rows[i])
+            right_rows.append(rights[j])
+
+    return np.concatenate(left_rows), np.concatenate(right_rows)
+
+
+def halves(puzzle: Puzzle, split: Sequence[Sequence[str]] = HALVES) -> Tuple[HalfAssemblies, HalfAssemblies]:
+    """Enumerate the half-assemblies on each side of a split of the places."""
+    if sorted(split[0] + split[1]) != sorted(PLACES) or len(split[0]) != 3:
+        raise ValueError(f"Invalid split of the places: {split}")
+
+    return enumerate_half(puzzle, split[0]), enumerate_half(puzzle, split[1])
+
+
+def count_assemblies(puzzle: Puzzle, split: Sequence[Sequence[str]] = HALVES) -> int:
+    """Count the distinct assemblies of a puzzle."""
+    left, right = halves(puzzle, split)
+    return len(join(left, right, len(puzzle.shapes))[0])
+
+
+def enumerate_assemblies(puzzle: Puzzle, split: Sequence[Sequence[str]] = HALVES) -> List[PuzzleState]:
+    """Enumerate the distinct assemblies of a puzzle, with their pieces in the order of the places."""
+    left, right = halves(puzzle, split)
+    positions = {place: (side, split[side].index(place)) for side in (0, 1) for place in split[side]}
+    order = [positions[place] for place in PLACES]
+    assemblies = []
+    for a, b in zip(*join(left, right, len(puzzle.shapes))):
+        rows = ((left, a), (right, b))
+        pieces = []
+        for side, i in order:
+            half, row = rows[side]
+            place = half.places[i]
+            pieces.append(Piece(int(half.shapes[row, i]), PLACES[place], int(half.orientations[row, i])))
+
+        assemblies.append(PuzzleState(tuple(pieces)))
+
+    return assemblies
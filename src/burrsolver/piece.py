@@ -1,12 +1,31 @@
 """A piece in the burr puzzle."""
 
-from typing import NamedTuple
-
-import numpy as np
-import scenepic as sp
+from typing import NamedTuple, TYPE_CHECKING
 
 from .position import Axis, Direction, PLACES, Position
 
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _rotation(axis: Axis, quarter_turns: int) -> "np.ndarray":
+    """Return a 4x4 matrix which rotates by a number of quarter turns about an axis."""
+    import numpy as np
+
+    c = [1, 0, -1, 0][quarter_turns % 4]
+    s = [0, 1, 0, -1][quarter_turns % 4]
+    match axis:
+        case Axis.X:
+            rotation = [[1, 0, 0], [0, c, -s], [0, s, c]]
+        case Axis.Y:
+            rotation = [[c, 0, s], [0, 1, 0], [-s, 0, c]]
+        case Axis.Z:
+            rotation = [[c, -s, 0], [s, c, 0], [0, 0, 1]]
+
+    transform = np.eye(4)
+    transform[:3, :3] = rotation
+    return transform
+
 
 class Piece(NamedTuple("Piece", [("shape", int),
                                  ("position", Position),
@@ -35,8 +54,13 @@ class Piece(NamedTuple("Piece", [("shape", int),
                      self.position.move(d, steps),
                      self.orientation)
 
-    def to_transform(self) -> np.ndarray:
-        """Convert the piece to a transformation matrix."""
+    def to_transform(self) -> "np.ndarray":
+        """Convert the piece to a transformation matrix.
+
+        Description:
+            NumPy is imported here rather than at the top of the module so
+            that the solver can be imported without loading it.
+        """
         n = self.orientation
         flipped = False
         if n > 3:
@@ -46,22 +70,18 @@ class Piece(NamedTuple("Piece", [("shape", int),
 
             flipped = True
 
-        transform = np.eye(4)
-        if flipped:
-            transform = sp.Transforms.rotation_about_y(np.pi)
-
+        transform = _rotation(Axis.Y, 2 if flipped else 0)
         if n > 0:
-            angle = np.pi * n / 2
-            transform = sp.Transforms.rotation_about_z(angle) @ transform
+            transform = _rotation(Axis.Z, n) @ transform
 
         x, y, z, axis = self.position
         if axis == Axis.Y:
-            transform = sp.Transforms.rotation_about_x(np.pi / 2) @ transform
+            transform = _rotation(Axis.X, 1) @ transform
 
         if axis == Axis.X:
-            transform = sp.Transforms.rotation_about_y(np.pi / 2) @ transform
+            transform = _rotation(Axis.Y, 1) @ transform
 
-        transform = sp.Transforms.translate([x, y, z]) @ transform
+        transform[:3, 3] = [x, y, z]
         return transform
 
     def __str__(self) -> str:
@@ -95,3 +115,18 @@ class Piece(NamedTuple("Piece", [("shape", int),
             return f"F{self.shape+1}{o}"
 
         return f"{self.position}{self.shape + 1}{o}"
+
+    @staticmethod
+    def from_string(text: str) -> "Piece":
+        """Create a piece from its string representation (see `__str__`)."""
+        if text[0] in PLACES:
+            position = PLACES[text[0]]
+            start = 1
+        else:
+            length = text.find(")")
+            position = Position.from_string(text[1:length])
+            start = length + 1
+
+        shape = int(text[start]) - 1
+        orientation = ord(text[start + 1]) - 97
+        return Piece(shape, position, orientation)
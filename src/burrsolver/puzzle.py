@@ -4,7 +4,7 @@ from itertools import combinations
 from typing import FrozenSet, List, NamedTuple, Tuple
 
 from .piece import Piece
-from .position import Direction, PLACES, Position
+from .position import Direction, PLACES
 from .shape import Shape
 from .voxel import Voxel
 
@@ -23,24 +23,7 @@ class PuzzleState(NamedTuple("PuzzleState", [("pieces", Tuple[Piece])])):
     @staticmethod
     def from_string(text: str) -> "PuzzleState":
         """Create a puzzle state from a string representation."""
-        parts = text.split(" ")
-        pieces = []
-
-        for part in parts:
-            if part[0] in PLACES:
-                place = PLACES[part[0]]
-                start = 1
-            else:
-                length = part.find(")")
-                place = Position.from_string(part[1:length])
-                start = length + 1
-
-            s = int(part[start]) - 1
-            n = ord(part[start + 1]) - 97
-            piece = Piece(s, place, n)
-            pieces.append(piece)
-
-        return PuzzleState(tuple(pieces))
+        return PuzzleState(tuple(Piece.from_string(part) for part in text.split(" ")))
 
 
 class Move(NamedTuple("Move", [("pieces", FrozenSet[Piece]),
@@ -53,6 +36,17 @@ class Move(NamedTuple("Move", [("pieces", FrozenSet[Piece]),
         pieces = " ".join(sorted(str(p) for p in self.pieces))
         return f"{self.direction.name} {self.steps} [{pieces}]"
 
+    @staticmethod
+    def from_string(text: str) -> "Move":
+        """Create a move from its string representation, e.g. "FORWARD 4 [C4h D6h]"."""
+        head, _, pieces = text.partition("[")
+        if not pieces.endswith("]"):
+            raise ValueError(f"Invalid move: {text!r}")
+
+        direction, steps = head.split()
+        return Move(frozenset(Piece.from_string(part) for part in pieces[:-1].split()),
+                    Direction[direction], int(steps))
+
 
 class Puzzle(NamedTuple("Puzzle", [("shapes", Tuple[Shape]),
                                    ("pieces", Tuple[Piece])])):
@@ -0,0 +1,132 @@
+"""Cheap screens run on an assembly before its full disassembly search.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Most of the assemblies which the assembly search finds are locked: nothing
+can be taken out of them, and A* only learns this by exhausting every state
+it can reach. Each screen here is a necessary condition for an assembly to
+come apart, checked far more cheaply, and the screens are run in order of
+cost so that an assembly only reaches A* if it passes them all:
+
+- "blocking": in the blocking graph of each direction, a piece points to the
+  pieces it would hit if it moved one step. A group can move exactly when no
+  edge leaves it, and so some move exists if the closure of some piece is
+  small enough to move as a group. This is the same test as asking whether
+  `Puzzle.valid_moves` yields anything, but takes pairwise checks rather
+  than trying every group.
+- "search": a breadth-first search capped at `MAX_DEPTH` moves and
+  `MAX_NODES` states. If it reaches every state it can without taking a
+  piece out then the assembly is locked. If it takes a piece out, or runs
+  into either cap, the assembly passes.
+"""
+
+from typing import Mapping, Set
+
+from .piece import Piece
+from .position import Direction
+from .puzzle import Puzzle
+from .stats import Statistics
+
+
+"""The screens, in the order they are run."""
+SCREENS = ["blocking", "search"]
+
+"""The most moves from the assembly explored by the search screen."""
+MAX_DEPTH = 8
+
+"""The most states visited by the search screen."""
+MAX_NODES = 256
+
+
+def max_group_size(num_pieces: int) -> int:
+    """Return the largest group which may move together, as in `Puzzle.valid_moves`."""
+    if num_pieces == 6:
+        return 3
+
+    return 2 if num_pieces > 3 else 1
+
+
+def blocking_graph(puzzle: Puzzle, d: Direction) -> Mapping[Piece, Set[Piece]]:
+    """Return the pieces which each piece would hit if it moved one step in a direction."""
+    owner = {v: p for p in puzzle.pieces for v in puzzle.voxels_for(p)}
+    graph = {}
+    for p in puzzle.pieces:
+        hits = (owner.get(v.move(d)) for v in puzzle.voxels_for(p))
+        graph[p] = {q for q in hits if q is not None and q != p}
+
+    return graph
+
+
+def has_movable_group(puzzle: Puzzle) -> bool:
+    """Whether some group of pieces can move, found from the blocking graphs."""
+    limit = max_group_size(len(puzzle.pieces))
+    for d in Direction:
+        graph = blocking_graph(puzzle, d)
+        for p in puzzle.pieces:
+            # the closure of p is the smallest group containing p which can move
+            closure = {p}
+            stack = [p]
+            while stack and len(closure) <= limit:
+                for q in graph[stack.pop()]:
+                    if q not in closure:
+                        closure.add(q)
+                        stack.append(q)
+
+            if len(closure) <= limit:
+                return True
+
+    return False
+
+
+def is_locked(puzzle: Puzzle, max_depth=MAX_DEPTH, max_nodes=MAX_NODES) -> bool:
+    """Whether a capped breadth-first search proves that no piece can be taken out."""
+    num_pieces = len(puzzle.pieces)
+    start = puzzle.state()
+    visited = {start}
+    layer = [start]
+    for _ in range(max_depth):
+        next_layer = []
+        for state in layer:
+            current = puzzle.to_state(state)
+            for move in current.valid_moves():
+                after = current.do_move(move)
+                if len(after.pieces) < num_pieces:
+                    return False
+
+                key = after.state()
+                if key not in visited:
+                    if len(visited) == max_nodes:
+                        return False
+
+                    visited.add(key)
+                    next_layer.append(key)
+
+        if not next_layer:
+            return True
+
+        layer = next_layer
+
+    return False
+
+
+def screen(puzzle: Puzzle, stats: Statistics = None, max_depth=MAX_DEPTH, max_nodes=MAX_NODES) -> bool:
+    """Run the screens on an assembly in order, returning whether it passes them all.
+
+    Args:
+        puzzle: The assembled puzzle.
+        stats: Optional statistics, which record how many assemblies each
+               screen checks and rejects.
+        max_depth: The depth limit of the search screen.
+        max_nodes: The node limit of the search screen.
+    """
+    checks = [("blocking", lambda: has_movable_group(puzzle)),
+              ("search", lambda: not is_locked(puzzle, max_depth, max_nodes))]
+    for name, check in checks:
+        passed = check()
+        if stats is not None:
+            stats.screen(name, passed)
+
+        if not passed:
+            return False
+
+    return True
@@ -0,0 +1,516 @@
+"""Local solve service.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+The service listens on a local TCP socket and speaks a simple protocol in
+which every message is a JSON object on its own line. A client asks for a
+puzzle to be solved with:
+
+{"op": "solve", "id": "job1", "shapes": ["xxxxxx/xx..xx/x....x/x....x", ...]}
+
+and the service replies with a stream of events for that id, ending with
+one of "solved", "unsolvable", "cancelled" or "error":
+
+{"id": "job1", "event": "queued", "coalesced": false}
+{"id": "job1", "event": "started"}
+{"id": "job1", "event": "progress", "num_iterations": 1024, "num_expanded": 5120, ...}
+{"id": "job1", "event": "solved", "assembly": "A1a B2f ...", "moves": [...], ...}
+
+A request can be cancelled with {"op": "cancel", "id": "job1"}. Many
+requests can be in flight on the same connection.
+
+Puzzles are solved by a pool of worker processes which stay alive between
+requests, keeping their voxel move cache and the puzzles they have built
+(shapes, orientations and piece tables) loaded. Every puzzle is solved in its
+canonical form (see `canonical`), so concurrent requests for the same puzzle,
+even with the pieces listed in a different order or orientation, share a
+single solve. The solution is then translated back into the pieces of each
+request. When the last request waiting on a running solve is cancelled, the
+worker process is killed and replaced so that it does not hold up later
+requests.
+"""
+
+import asyncio
+from collections import deque, OrderedDict
+from functools import partial
+import json
+import multiprocessing
+from multiprocessing.connection import Connection
+import threading
+from typing import Callable, Deque, List, Mapping, NamedTuple, Tuple
+
+from .canonical import canonical_form, from_canonical, invert_slots, PuzzleKey, Slots
+from .position import Direction
+from .puzzle import Move, Puzzle, PuzzleState
+from .shape import mask_to_text
+from .budget import Progress
+from .solver import Solution, solve
+from .voxel import move_voxel, Voxel
+
+
+"""Number of built puzzles each worker keeps loaded."""
+PUZZLE_CACHE_SIZE = 256
+
+
+def warm_up():
+    """Fill the voxel move cache of a worker process."""
+    coords = range(-5, 6, 2)
+    for x in coords:
+        for y in coords:
+            for z in coords:
+                for d in Direction:
+                    move_voxel(Voxel(x, y, z), d, 1)
+
+
+def worker_main(conn: Connection, progress_interval: float):
+    """Main loop of a worker process.
+
+    The worker receives (job id, canonical key) messages and replies with
+    (job id, event, payload) messages, where the event is "started",
+    "progress", "solved" or "error".
+    """
+    warm_up()
+    puzzles: Mapping[PuzzleKey, Puzzle] = OrderedDict()
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+
+        if message is None:
+            break
+
+        job_id, key = message
+        conn.send((job_id, "started", None))
+
+        def progress(p: Progress):
+            conn.send((job_id, "progress", p._asdict()))
+
+        try:
+            if key in puzzles:
+                puzzles.move_to_end(key)
+            else:
+                puzzles[key] = Puzzle.from_text([mask_to_text(mask) for mask in key])
+                if len(puzzles) > PUZZLE_CACHE_SIZE:
+                    puzzles.popitem(last=False)
+
+            solution = solve(puzzles[key], progress=progress,
+                             progress_interval=progress_interval)
+            conn.send((job_id, "solved", solution))
+        except Exception as e:
+            conn.send((job_id, "error", str(e)))
+
+
+def is_valid(shapes: List[str]) -> bool:
+    """Check that a request contains six well-formed shape strings."""
+    if not isinstance(shapes, list) or len(shapes) != 6:
+        return False
+
+    for line in shapes:
+        if not isinstance(line, str):
+            return False
+
+        rows = line.split("/")
+        if len(rows) != 4 or any(len(row) != 6 or set(row) - set("x.") for row in rows):
+            return False
+
+    return True
+
+
+def translate(solution: Solution, slots: Slots) -> List[Tuple[PuzzleState, Move]]:
+    """Translate the moves of a canonical solution to the pieces of a request."""
+    shapes = invert_slots(slots)
+    moves = []
+    for state, move in solution.moves:
+        state = PuzzleState(tuple(from_canonical(p, shapes) for p in state.pieces))
+        if move is not None:
+            pieces = frozenset(from_canonical(p, shapes) for p in move.pieces)
+            move = Move(pieces, move.direction, move.steps)
+
+        moves.append((state, move))
+
+    return moves
+
+
+Listener = Callable[[str, dict], None]
+
+
+class Job:
+    """A solve which is shared by all requests for the same canonical puzzle."""
+
+    def __init__(self, job_id: int, key: PuzzleKey, future: asyncio.Future):
+        """Constructor."""
+        self.id = job_id
+        self.key = key
+        self.future = future
+        self.listeners: List[Listener] = []
+        self.worker: "Worker" = None
+        self.started = False
+
+    def notify(self, event: str, payload: dict):
+        """Pass an event on to every request waiting on this job."""
+        for listener in list(self.listeners):
+            listener(event, payload)
+
+
+class Worker:
+    """A worker process and the thread which reads its replies."""
+
+    def __init__(self, on_message: Callable[["Worker", tuple], None], progress_interval: float):
+        """Constructor.
+
+        Args:
+            on_message: Called (on the event loop) with each reply from the worker,
+                        and with None if the worker dies.
+            progress_interval: Seconds between progress reports.
+        """
+        loop = asyncio.get_running_loop()
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_conn, progress_interval), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job: Job = None
+
+        def read():
+            while True:
+                try:
+                    message = self.conn.recv()
+                except (EOFError, OSError):
+                    message = None
+
+                try:
+                    loop.call_soon_threadsafe(on_message, self, message)
+                except RuntimeError:
+                    # the event loop has been closed
+                    break
+
+                if message is None:
+                    break
+
+            self.conn.close()
+            self.process.join()
+
+        self.thread = threading.Thread(target=read, daemon=True)
+        self.thread.start()
+
+    def submit(self, job: Job):
+        """Send a job to the worker."""
+        self.job = job
+        job.worker = self
+        self.conn.send((job.id, job.key))
+
+    def kill(self):
+        """Kill the worker process, abandoning any running job."""
+        self.process.kill()
+
+    def stop(self):
+        """Ask the worker process to exit once it is idle."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+
+
+class WorkerPool:
+    """Pool of worker processes whose running jobs can be cancelled."""
+
+    def __init__(self, num_workers: int = None, progress_interval=1.0):
+        """Constructor.
+
+        Args:
+            num_workers: The number of worker processes (defaults to the CPU count).
+            progress_interval: Seconds between progress reports from running jobs.
+        """
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.progress_interval = progress_interval
+        self.workers: List[Worker] = []
+        self.idle: Deque[Worker] = deque()
+        self.pending: Deque[Job] = deque()
+        self.jobs: Mapping[int, Job] = {}
+        self.next_id = 0
+        self.closed = False
+
+    def start(self):
+        """Start the worker processes (must be called from the event loop)."""
+        for _ in range(self.num_workers):
+            self.add_worker()
+
+    def add_worker(self):
+        """Start a new worker process."""
+        worker = Worker(self.on_message, self.progress_interval)
+        self.workers.append(worker)
+        self.idle.append(worker)
+
+    def submit(self, key: PuzzleKey) -> Job:
+        """Queue a canonical puzzle to be solved."""
+        future = asyncio.get_running_loop().create_future()
+        job = Job(self.next_id, key, future)
+        self.next_id += 1
+        self.jobs[job.id] = job
+        self.pending.append(job)
+        self.dispatch()
+        return job
+
+    def cancel(self, job: Job):
+        """Cancel a job, killing its worker process if it is running."""
+        self.jobs.pop(job.id, None)
+        job.future.cancel()
+        if job.worker is None:
+            self.pending.remove(job)
+            return
+
+        worker = job.worker
+        worker.job = None
+        worker.kill()
+        self.workers.remove(worker)
+        if not self.closed:
+            self.add_worker()
+            self.dispatch()
+
+    def dispatch(self):
+        """Hand pending jobs to idle workers."""
+        while self.pending and self.idle:
+            self.idle.popleft().submit(self.pending.popleft())
+
+    def on_message(self, worker: Worker, message: tuple):
+        """Handle a reply from a worker."""
+        if message is None:
+            if worker in self.workers:
+                # the worker died unexpectedly
+                self.workers.remove(worker)
+                if worker in self.idle:
+                    self.idle.remove(worker)
+
+                if worker.job is not None:
+                    self.finish(worker.job, "error", "Worker process died")
+
+                if not self.closed:
+                    self.add_worker()
+                    self.dispatch()
+
+            return
+
+        job_id, event, payload = message
+        job = self.jobs.get(job_id)
+        if job is None or worker.job is not job:
+            return
+
+        if event == "started":
+            job.started = True
+            job.notify("started", {})
+            return
+
+        if event == "progress":
+            job.notify("progress", payload)
+            return
+
+        worker.job = None
+        self.idle.append(worker)
+        self.finish(job, event, payload)
+        self.dispatch()
+
+    def finish(self, job: Job, event: str, payload):
+        """Resolve the future of a finished job."""
+        self.jobs.pop(job.id, None)
+        if job.future.done():
+            return
+
+        if event == "solved":
+            job.future.set_result(payload)
+        else:
+            job.future.set_exception(ValueError(payload))
+
+    async def close(self):
+        """Shut down all workers without waiting for running jobs."""
+        self.closed = True
+        for job in list(self.jobs.values()):
+            job.future.cancel()
+
+        self.jobs.clear()
+        self.pending.clear()
+        for worker in self.workers:
+            if worker.job is None:
+                worker.stop()
+            else:
+                worker.kill()
+
+        # wait for the reader threads to see the workers exit
+        threads = [worker.thread for worker in self.workers]
+        self.workers.clear()
+        self.idle.clear()
+        await asyncio.gather(*[asyncio.to_thread(thread.join) for thread in threads])
+
+
+Request = NamedTuple("Request", [("id", str), ("shapes", List[str])])
+
+
+class SolveService:
+    """Asyncio service which solves puzzles in a warm process pool."""
+
+    def __init__(self, num_workers: int = None, progress_interval=1.0):
+        """Constructor.
+
+        Args:
+            num_workers: The number of worker processes (defaults to the CPU count).
+            progress_interval: Seconds between progress events for running solves.
+        """
+        self.pool = WorkerPool(num_workers, progress_interval)
+        self.jobs: Mapping[PuzzleKey, Job] = {}
+        self.num_solves = 0
+        self.server: asyncio.AbstractServer = None
+        self.connections: Mapping[asyncio.StreamWriter, asyncio.Task] = {}
+
+    async def start(self, host="127.0.0.1", port=0) -> int:
+        """Start the workers and listen for connections.
+
+        Args:
+            host: The host address to bind to.
+            port: The port to bind to (0 picks a free port).
+
+        Returns:
+            The port the service is listening on.
+        """
+        self.pool.start()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Serve requests until cancelled."""
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Stop listening, close all connections and shut down the workers."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        for writer in list(self.connections):
+            writer.close()
+
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        await self.pool.close()
+        self.jobs.clear()
+
+    async def solve(self, key: PuzzleKey, listener: Listener) -> Solution:
+        """Solve a canonical puzzle, joining an existing solve if there is one.
+
+        Args:
+            key: The canonical form of the puzzle.
+            listener: Called with the events ("started", "progress") of the solve.
+        """
+        if key not in self.jobs:
+            self.jobs[key] = self.pool.submit(key)
+            self.num_solves += 1
+
+        job = self.jobs[key]
+        job.listeners.append(listener)
+        if job.started:
+            listener("started", {})
+
+        try:
+            return await asyncio.shield(job.future)
+        finally:
+            job.listeners.remove(listener)
+            if not job.listeners:
+                # nobody else is waiting on this solve
+                if not job.future.done():
+                    self.pool.cancel(job)
+
+                if self.jobs.get(key) is job:
+                    del self.jobs[key]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Handle a client connection."""
+        self.connections[writer] = asyncio.current_task()
+        tasks: Mapping[str, asyncio.Task] = {}
+
+        def send(message: dict):
+            if not writer.is_closing():
+                writer.write((json.dumps(message) + "\n").encode("utf-8"))
+
+        def forget(request_id: str, task: asyncio.Task):
+            if tasks.get(request_id) is task:
+                del tasks[request_id]
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ConnectionError:
+                    break
+
+                if not line:
+                    break
+
+                try:
+                    message = json.loads(line)
+                    op = message["op"]
+                    request_id = message["id"]
+                except (ValueError, KeyError, TypeError):
+                    send({"event": "error", "message": "Invalid request"})
+                    continue
+
+                if op == "solve":
+                    request = Request(request_id, message.get("shapes"))
+                    task = asyncio.create_task(self.serve_request(request, send))
+                    tasks[request_id] = task
+                    task.add_done_callback(partial(forget, request_id))
+                elif op == "cancel":
+                    if request_id in tasks:
+                        tasks.pop(request_id).cancel()
+                        send({"id": request_id, "event": "cancelled"})
+                else:
+                    send({"id": request_id, "event": "error", "message": f"Unknown op: {op}"})
+
+                await writer.drain()
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+
+            writer.close()
+            del self.connections[writer]
+
+    async def serve_request(self, request: Request, send: Callable[[dict], None]):
+        """Solve the puzzle for a request and send its events.
+
+        If the request is cancelled, the "cancelled" event is sent by the
+        connection handler.
+        """
+        if not is_valid(request.shapes):
+            send({"id": request.id, "event": "error", "message": "Invalid shapes"})
+            return
+
+        def listener(event: str, payload: dict):
+            send({"id": request.id, "event": event, **payload})
+
+        key, slots = canonical_form(request.shapes)
+        send({"id": request.id, "event": "queued", "coalesced": key in self.jobs})
+        try:
+            solution = await self.solve(key, listener)
+        except ValueError as e:
+            if str(e) == "No valid assembly found":
+                send({"id": request.id, "event": "unsolvable"})
+            else:
+                send({"id": request.id, "event": "error", "message": str(e)})
+
+            return
+
+        moves = translate(solution, slots)
+        send({"id": request.id,
+              "event": "solved",
+              "assembly": str(moves[0][0]),
+              "moves": [str(move) for _, move in moves[:-1]],
+              "num_iterations": solution.num_iterations,
+              "num_checked": solution.num_checked})
+
+
+async def serve(host="127.0.0.1", port=8765, num_workers: int = None):
+    """Run a solve service until interrupted."""
+    service = SolveService(num_workers)
+    port = await service.start(host, port)
+    print(f"Listening on {host}:{port}")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
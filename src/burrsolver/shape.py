@@ -4,7 +4,6 @@ from typing import List, Mapping, NamedTuple, Tuple
 
 from .piece import Piece
 from .position import PLACES
-from .geometry import Facet, Mesh, Vec3
 from .voxel import Voxel
 
 
@@ -40,6 +39,54 @@ REQUIRED = {
 Orientations = Mapping[str, List[int]]
 
 
+"""Number of voxels in a 2x2x6 shape."""
+NUM_VOXELS = 24
+
+
+def voxel_index(v: Voxel) -> int:
+    """Return the index of a shape voxel in the text representation.
+
+    The index is the position of the character for the voxel in the text
+    representation of the shape, ignoring the "/" separators.
+    """
+    x = (v.x + 1) // 2
+    y = (v.y + 1) // 2
+    z = (5 - v.z) // 2
+    return 6 * (x + 2 * y) + z
+
+
+def index_voxel(i: int) -> Voxel:
+    """Return the shape voxel for an index into the text representation."""
+    line, z = divmod(i, 6)
+    x = line % 2
+    y = line // 2
+    return Voxel(2 * x - 1, 2 * y - 1, 5 - 2 * z)
+
+
+def mask_from_text(text: str) -> int:
+    """Convert a shape string to a 24-bit occupancy mask.
+
+    The first character of the string is stored in the most significant bit,
+    so comparing masks as integers is the same as comparing the strings
+    lexicographically (as "." sorts before "x").
+    """
+    mask = 0
+    for c in text:
+        if c == "/":
+            continue
+
+        mask = (mask << 1) | (c == "x")
+
+    return mask
+
+
+def mask_to_text(mask: int) -> str:
+    """Convert a 24-bit occupancy mask to a shape string."""
+    chars = ["x" if mask & (1 << (NUM_VOXELS - 1 - i)) else "."
+             for i in range(NUM_VOXELS)]
+    return "/".join("".join(chars[i:i + 6]) for i in range(0, NUM_VOXELS, 6))
+
+
 class Shape(NamedTuple("Shape", [("voxels", Tuple[Voxel, ...]),
                                  ("orientations", Orientations)])):
     """A shape in the puzzle.
@@ -54,6 +101,18 @@ class Shape(NamedTuple("Shape", [("voxels", Tuple[Voxel, ...]),
                        for v in self.voxels)
         return Shape(voxels, self.orientations)
 
+    def to_mask(self) -> int:
+        """Return the 24-bit occupancy mask for this (unplaced) shape."""
+        mask = 0
+        for v in self.voxels:
+            mask |= 1 << (NUM_VOXELS - 1 - voxel_index(v))
+
+        return mask
+
+    def to_text(self) -> str:
+        """Return the string representation of this (unplaced) shape."""
+        return mask_to_text(self.to_mask())
+
     def inside_count(self) -> int:
         """Return the number of voxels inside the puzzle."""
         return sum(v.is_inside() for v in self.voxels)
@@ -96,18 +155,27 @@ class Shape(NamedTuple("Shape", [("voxels", Tuple[Voxel, ...]),
 
         return s
 
-    def save_as_stl(self, path: str, scale=10):
-        """Save this shape as an STL file."""
-        mesh = Mesh.from_voxels(self.voxels, True)
+    @staticmethod
+    def from_mask(mask: int) -> "Shape":
+        """Create a shape from a 24-bit occupancy mask."""
+        return Shape.from_text(mask_to_text(mask))
+
+    def save_as_stl(self, path: str, scale=10, binary=False):
+        """Save this shape as an STL file (ASCII unless `binary`)."""
+        # the geometry code needs NumPy, which the solver does not
+        if binary:
+            from .export import shape_triangles, write_binary_stl
+
+            write_binary_stl(path, shape_triangles(self, scale))
+            return
+
+        from .geometry import cached_mesh, Facet, Vec3
+
         facets: List[Facet] = []
-        for a, b, c, d in mesh.quads:
-            v0 = Vec3.from_array(mesh.vertices[a]).scale(scale)
-            v1 = Vec3.from_array(mesh.vertices[b]).scale(scale)
-            v2 = Vec3.from_array(mesh.vertices[c]).scale(scale)
-            v3 = Vec3.from_array(mesh.vertices[d]).scale(scale)
-            n = Vec3.from_array(mesh.normals[a])
-            facets.append(Facet(n, (v0, v1, v2)))
-            facets.append(Facet(n, (v2, v3, v0)))
+        # the corners are scaled first, as a triangle may meet at the center of a quad
+        for corners, normal in zip(*cached_mesh(self.voxels, True).triangles()):
+            facets.append(Facet(Vec3.from_array(normal),
+                                tuple(Vec3.from_array(corner * scale) for corner in corners)))
 
         with open(path, "w") as file:
             file.write("solid burr_piece\n")
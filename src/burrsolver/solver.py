@@ -1,15 +1,40 @@
 """Solver for the Burr puzzle."""
 
 import heapq
-from typing import FrozenSet, List, NamedTuple, Tuple
+import time
+from typing import Callable, FrozenSet, Iterator, List, NamedTuple, Tuple, Union
 
 
 from .astar import astar
+from .budget import Budget, BudgetExceeded, Monitor, Progress
+from .checkpoint import Checkpoint, Checkpointer, load as load_checkpoint, puzzle_shapes
+from .encoding import MOVE, pack_move, pack_state, PACKED_SIZE, unpack_move, unpack_state
+from .external import Codec, external_astar, MAX_STATES
+from .hda import hda_star
 from .piece import Piece
+from .position import PLACES
 from .puzzle import Move, Puzzle, PuzzleState
+from .screens import screen
+from .stats import Statistics
 
 
-def disassemble(puzzle: Puzzle) -> List[Tuple[PuzzleState, Move]]:
+"""The engines which `disassemble` can search with."""
+ENGINES = ["astar", "hda", "external", "bfs"]
+
+"""The ways in which `analyze` can find the assemblies."""
+ASSEMBLERS = ["search", "mitm"]
+
+"""How the external engine packs states and moves."""
+CODEC = Codec(pack_state, unpack_state, PACKED_SIZE, pack_move, unpack_move, MOVE.size)
+
+
+def disassemble(puzzle: Puzzle, monitor: Monitor = None,
+                stats: Statistics = None, engine="astar",
+                num_workers: int = None, max_states: int = None,
+                spill_dir: str = None) -> List[Tuple[PuzzleState, Move]]:
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown disassembly engine: {engine}")
+
     start = puzzle.state()
 
     def distance(a: PuzzleState, b: PuzzleState) -> int:
@@ -28,17 +53,77 @@ def disassemble(puzzle: Puzzle) -> List[Tuple[PuzzleState, Move]]:
         for move in puzzle_a.valid_moves():
             yield move, puzzle_a.do_move(move).state()
 
+    def timed_neighbors(a: PuzzleState):
+        # As above, but timing move generation and application
+        puzzle_a = puzzle.to_state(a)
+        start = time.perf_counter()
+        moves = list(puzzle_a.valid_moves())
+        stats.moves(moves, time.perf_counter() - start)
+        for move in moves:
+            start = time.perf_counter()
+            b = puzzle_a.do_move(move).state()
+            stats.timed("do_move", time.perf_counter() - start)
+            yield move, b
+
     def is_goal(a: PuzzleState) -> bool:
         # The goal is to have no pieces left in the puzzle
         return len(a.pieces) == 0
 
-    return astar(distance, heuristic, neighbors, is_goal, start)
+    callback = None if monitor is None else monitor.expand
+    if engine == "hda":
+        # NB the parallel engine is not in scope for the Tripos. Moves are
+        # timed in the worker processes, so only the expansions are recorded.
+        if stats is not None:
+            stats.begin_disassembly()
+
+        return hda_star(distance, heuristic, neighbors, is_goal, start, callback, stats,
+                        num_workers=num_workers, key=pack_state)
+
+    if engine == "external":
+        # NB the external-memory engine is not in scope for the Tripos either.
+        if stats is not None:
+            stats.begin_disassembly()
+
+        return external_astar(distance, heuristic, neighbors, is_goal, start, CODEC, callback, stats,
+                              max_states or MAX_STATES, spill_dir)
+
+    if engine == "bfs":
+        # NB nor is the batched BFS, which is imported here as it needs NumPy
+        from .bfs import bfs_disassemble
+
+        if stats is not None:
+            stats.begin_disassembly()
+
+        return bfs_disassemble(puzzle, callback, stats)
+
+    if stats is None:
+        return astar(distance, heuristic, neighbors, is_goal, start, callback)
+
+    stats.begin_disassembly()
+    return astar(distance, heuristic, timed_neighbors, is_goal, start, callback, stats)
 
 
 Solution = NamedTuple("Solution", [("assembly", PuzzleState),
                                    ("moves", List[Tuple[PuzzleState, Move]]),
                                    ("num_iterations", int),
-                                   ("num_checked", int)])
+                                   ("num_checked", int),
+                                   ("stats", Statistics)])
+Solution.__new__.__defaults__ = (None,)
+
+
+"""The result of a solve which ran out of budget or was cancelled.
+
+The reason is one of "time", "nodes", "memory" or "cancelled".
+"""
+PartialResult = NamedTuple("PartialResult", [("reason", str),
+                                             ("num_iterations", int),
+                                             ("num_checked", int),
+                                             ("num_expanded", int),
+                                             ("elapsed", float)])
+
+
+"""Place names by position."""
+PLACE_NAMES = {position: name for name, position in PLACES.items()}
 
 
 class AssemblyState(NamedTuple("AssemblyState",
@@ -74,41 +159,281 @@ def try_pieces(puzzle: Puzzle,
                                           new_state))
 
 
-def solve(puzzle: Puzzle) -> Solution:
+class AssemblySearch:
+    """Search over the space of potential assemblies of a puzzle.
+
+    Iterating over the search yields each complete assembly in turn, and
+    the search keeps count of the iterations and of the assemblies found.
+    While the caller is working on an assembly it is kept as `pending`, so
+    that a checkpoint taken at that point can hand it out again on resume.
+    """
+
+    def __init__(self, puzzle: Puzzle, monitor: Monitor = None, stats: Statistics = None,
+                 checkpointer: Checkpointer = None):
+        """Constructor.
+
+        Args:
+            puzzle: The puzzle to assemble.
+            monitor: Optional monitor which counts iterations and enforces budgets.
+            stats: Optional statistics which record the frontier size and the
+                   time spent in `try_pieces`.
+            checkpointer: Optional checkpointer, called between iterations.
+        """
+        self.puzzle = puzzle
+        self.monitor = monitor
+        self.stats = stats
+        self.checkpointer = checkpointer
+        self.num_iterations = 0
+        self.num_checked = 0
+        self.pending: PuzzleState = None
+        shapes = frozenset(range(6))
+        places = frozenset(["A", "B", "C", "D", "E", "F"])
+        start = AssemblyState(PuzzleState(()), shapes, places)
+        self.frontier: List[Tuple[int, AssemblyState]] = []
+
+        for s in shapes:
+            if len(puzzle.shapes[s].orientations["A"]) > 2:
+                continue
+
+            state = start.add("A", puzzle.pieces_at(s, "A")[0])
+            heapq.heappush(self.frontier, (state.num_remaining, state))
+
+    def to_checkpoint(self, results: list = None) -> Checkpoint:
+        """Return a checkpoint of the search, along with the caller's results so far."""
+        return Checkpoint(puzzle_shapes(self.puzzle), self.num_iterations, self.num_checked,
+                          self.pending, [state.puzzle for _, state in self.frontier],
+                          list(results or []))
+
+    def restore(self, checkpoint: Checkpoint):
+        """Restore the search to where it was when the checkpoint was taken."""
+        shapes = frozenset(range(6))
+        places = frozenset(PLACES)
+        self.frontier = []
+        for state in checkpoint.frontier:
+            used = AssemblyState(state,
+                                 shapes - {p.shape for p in state.pieces},
+                                 places - {PLACE_NAMES[p.position] for p in state.pieces})
+            self.frontier.append((used.num_remaining, used))
+
+        self.num_iterations = checkpoint.num_iterations
+        self.num_checked = checkpoint.num_checked
+        self.pending = checkpoint.pending
+
+    def __iter__(self) -> Iterator[PuzzleState]:
+        """Generate the complete assemblies in search order."""
+        frontier = self.frontier
+        stats = self.stats
+        if self.pending is not None:
+            # resuming from a checkpoint taken part-way through an assembly
+            yield self.pending
+            self.pending = None
+
+        while frontier:
+            if self.checkpointer is not None:
+                self.checkpointer(self)
+
+            self.num_iterations += 1
+            if self.monitor is not None:
+                self.monitor.iteration(self.num_iterations, self.num_checked, len(frontier))
+
+            if stats is not None:
+                stats.assembly_iteration(len(frontier))
+
+            _, state = heapq.heappop(frontier)
+            if state.num_remaining == 0:
+                self.num_checked += 1
+                self.pending = state.puzzle
+                yield state.puzzle
+                self.pending = None
+                continue
+
+            if stats is None:
+                try_pieces(self.puzzle, state, frontier)
+            else:
+                start = time.perf_counter()
+                try_pieces(self.puzzle, state, frontier)
+                stats.timed("try_pieces", time.perf_counter() - start)
+
+
+def start_search(puzzle: Puzzle, monitor: Monitor, stats: Statistics,
+                 checkpoint: str, checkpoint_interval: float) -> Tuple[AssemblySearch, Checkpointer]:
+    """Start an assembly search, resuming from the checkpoint file if there is one.
+
+    Returns:
+        The search and its checkpointer (None if there is no checkpoint file).
+    """
+    if checkpoint is None:
+        return AssemblySearch(puzzle, monitor, stats), None
+
+    checkpointer = Checkpointer(checkpoint, checkpoint_interval)
+    search = AssemblySearch(puzzle, monitor, stats, checkpointer)
+    saved = load_checkpoint(checkpoint, puzzle)
+    if saved is not None:
+        search.restore(saved)
+        checkpointer.results.extend(saved.results)
+
+    return search, checkpointer
+
+
+def solve(puzzle: Puzzle, budget: Budget = None, cancel=None,
+          progress: Callable[[Progress], None] = None,
+          progress_interval=1.0, stats: Statistics = None,
+          checkpoint: str = None, checkpoint_interval=60.0,
+          engine="astar", num_workers: int = None, max_states: int = None,
+          spill_dir: str = None, screens=True) -> Union[Solution, PartialResult]:
     """Solve the puzzle.
 
     The solver searches the space of potential assemblies. Once a
     valid assembly is found, the solver uses A* search to find the
     optimal disassembly. If there is no disassembly, the solver
-    continues searching for a solution.
+    continues searching for a solution. Unless `screens` is False, an
+    assembly is first put through the cheap checks of `screens.screen`,
+    and only searched if it might come apart.
+
+    Args:
+        puzzle: The puzzle to solve.
+        budget: Optional limits on time, search nodes and memory.
+        cancel: Optional cancellation token (any object with `is_set()`,
+                e.g. a `threading.Event` or `multiprocessing.Event`).
+        progress: Optional function called periodically with a `Progress`.
+        progress_interval: Seconds between calls to `progress`.
+        stats: Optional statistics to collect during the solve, which are
+               also returned with the solution.
+        checkpoint: Optional path of a checkpoint file. If the file exists the
+                    solve resumes from it, the search is saved to it every
+                    `checkpoint_interval` seconds and when the budget runs
+                    out, and it is removed once the solve finishes.
+        checkpoint_interval: Seconds between checkpoints.
+        engine: The disassembly engine, one of `ENGINES`.
+        num_workers: The number of worker processes for a parallel engine.
+        max_states: The number of states the external engine holds in memory.
+        spill_dir: The directory in which the external engine keeps its files.
+        screens: Whether to screen out locked assemblies before searching.
+
+    Returns:
+        The solution, or a `PartialResult` if the budget ran out or the
+        solve was cancelled.
     """
-    shapes = frozenset(range(6))
-    places = frozenset(["A", "B", "C", "D", "E", "F"])
-    start = AssemblyState(PuzzleState(()), shapes, places)
-    frontier: List[Tuple[int, AssemblyState]] = []
-
-    for s in shapes:
-        if len(puzzle.shapes[s].orientations["A"]) > 2:
-            continue
-
-        state = start.add("A", puzzle.pieces_at(s, "A")[0])
-        heapq.heappush(frontier, (state.num_remaining, state))
-
-    num_checked = 0
-    num_iterations = 0
-    while frontier:
-        num_iterations += 1
-        _, state = heapq.heappop(frontier)
-        if state.num_remaining == 0:
+    monitor = None
+    if budget is not None or cancel is not None or progress is not None:
+        monitor = Monitor(budget, cancel, progress, progress_interval)
+
+    search, checkpointer = start_search(puzzle, monitor, stats, checkpoint, checkpoint_interval)
+    try:
+        for assembly in search:
             # Found a valid assembly, now try to disassemble
-            num_checked += 1
-            puzzle = puzzle.to_state(state.puzzle)
-            moves = disassemble(puzzle)
+            assembled = puzzle.to_state(assembly)
+            if screens and not screen(assembled, stats):
+                continue
+
+            moves = disassemble(assembled, monitor, stats, engine, num_workers, max_states, spill_dir)
             if moves:
-                return Solution(moves[0][0], moves, num_iterations, num_checked)
+                if checkpointer is not None:
+                    checkpointer.remove()
 
-            continue
+                return Solution(moves[0][0], moves, search.num_iterations, search.num_checked, stats)
+    except BudgetExceeded as e:
+        if checkpointer is not None:
+            checkpointer.save(search)
 
-        try_pieces(puzzle, state, frontier)
+        return PartialResult(e.reason, search.num_iterations, search.num_checked,
+                             monitor.num_expanded, monitor.elapsed)
+
+    if checkpointer is not None:
+        checkpointer.remove()
 
     raise ValueError("No valid assembly found")
+
+
+"""The result of analysing every assembly of a puzzle.
+
+Each assembly is paired with its shortest disassembly, or with None if it
+cannot be taken apart.
+"""
+Analysis = NamedTuple("Analysis", [("assemblies", List[Tuple[PuzzleState, List[Tuple[PuzzleState, Move]]]]),
+                                   ("num_iterations", int)])
+
+
+def analyze(puzzle: Puzzle, budget: Budget = None, cancel=None,
+            progress: Callable[[Progress], None] = None,
+            progress_interval=1.0, stats: Statistics = None,
+            checkpoint: str = None, checkpoint_interval=60.0,
+            assembler="search") -> Union[Analysis, PartialResult]:
+    """Find every assembly of the puzzle and try to disassemble each one.
+
+    Description:
+        This is the exhaustive counterpart of `solve`, which can take many
+        hours for a high-level puzzle, and so it can be checkpointed and
+        resumed in the same way. A resumed analysis gives exactly the same
+        result as an uninterrupted one.
+
+    Args:
+        puzzle: The puzzle to analyse.
+        budget: Optional limits on time, search nodes and memory.
+        cancel: Optional cancellation token.
+        progress: Optional function called periodically with a `Progress`.
+        progress_interval: Seconds between calls to `progress`.
+        stats: Optional statistics to collect during the analysis.
+        checkpoint: Optional path of a checkpoint file (see `solve`).
+        checkpoint_interval: Seconds between checkpoints.
+        assembler: How to find the assemblies, one of `ASSEMBLERS`. The
+                   "search" finds each assembly many times over, once for
+                   every order in which its pieces can be placed, whereas
+                   "mitm" (see `mitm`) finds each one once, much faster,
+                   but cannot be checkpointed. Its number of iterations is
+                   the number of assemblies.
+
+    Returns:
+        The analysis, or a `PartialResult` if the budget ran out or the
+        analysis was cancelled.
+    """
+    if assembler not in ASSEMBLERS:
+        raise ValueError(f"Unknown assembler: {assembler}")
+
+    monitor = None
+    if budget is not None or cancel is not None or progress is not None:
+        monitor = Monitor(budget, cancel, progress, progress_interval)
+
+    if assembler == "mitm":
+        return analyze_halves(puzzle, monitor, stats, checkpoint)
+
+    search, checkpointer = start_search(puzzle, monitor, stats, checkpoint, checkpoint_interval)
+    results = [] if checkpointer is None else checkpointer.results
+    try:
+        for assembly in search:
+            moves = disassemble(puzzle.to_state(assembly), monitor, stats)
+            results.append((assembly, moves))
+    except BudgetExceeded as e:
+        if checkpointer is not None:
+            checkpointer.save(search)
+
+        return PartialResult(e.reason, search.num_iterations, search.num_checked,
+                             monitor.num_expanded, monitor.elapsed)
+
+    if checkpointer is not None:
+        checkpointer.remove()
+
+    return Analysis(results, search.num_iterations)
+
+
+def analyze_halves(puzzle: Puzzle, monitor: Monitor, stats: Statistics,
+                   checkpoint: str) -> Union[Analysis, PartialResult]:
+    """Analyse the assemblies found by joining half-assemblies."""
+    # NB the meet-in-the-middle enumeration is not in scope for the Tripos,
+    # and is imported here as it needs NumPy
+    from .mitm import enumerate_assemblies
+
+    if checkpoint is not None:
+        raise ValueError("The mitm assembler cannot be checkpointed")
+
+    assemblies = enumerate_assemblies(puzzle)
+    results = []
+    try:
+        for assembly in assemblies:
+            moves = disassemble(puzzle.to_state(assembly), monitor, stats)
+            results.append((assembly, moves))
+    except BudgetExceeded as e:
+        return PartialResult(e.reason, len(assemblies), len(results),
+                             monitor.num_expanded, monitor.elapsed)
+
+    return Analysis(results, len(assemblies))
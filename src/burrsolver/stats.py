@@ -0,0 +1,141 @@
+"""Instrumentation of the solver hot paths.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+A `Statistics` object can be passed to `solver.solve`, `solver.disassemble`
+and `astar.astar` to find out where a solve spends its effort. When no
+object is passed the solver takes its uninstrumented paths, and so the only
+cost is a handful of `is not None` checks per search node.
+"""
+
+from collections import Counter
+from typing import List, Mapping
+
+from .voxel import move_voxel
+
+
+"""The hot-path functions which are timed."""
+TIMED = ["valid_moves", "do_move", "try_pieces"]
+
+
+class Statistics:
+    """Statistics collected over one or more solves.
+
+    Attributes:
+        assembly_frontier_max: High-water mark of the assembly search frontier.
+        astar_frontier_max: High-water mark of the A* frontier.
+        num_expanded: Total number of A* node expansions.
+        expanded_per_assembly: Number of A* node expansions for each assembly
+                               which was disassembled, in order.
+        num_generated: Number of neighbours generated by A*.
+        num_revisits: Number of those neighbours which had already been
+                      reached at no greater cost, i.e. hits in A*'s table
+                      of visited states.
+        num_move_states: Number of states for which moves were generated.
+        moves_by_size: Number of moves generated, by the size of the moving group.
+        times: Seconds spent in each of the `TIMED` functions.
+        voxel_cache: Hits and misses of the `move_voxel` cache since the
+                     statistics were created.
+        num_searched: Number of distinct states reached by the batched BFS.
+        search_time: Seconds spent in the batched BFS.
+        screened: Number of assemblies checked by each of `screens.SCREENS`.
+        rejected: Number of those assemblies which each screen rejected.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.assembly_frontier_max = 0
+        self.astar_frontier_max = 0
+        self.num_expanded = 0
+        self.expanded_per_assembly: List[int] = []
+        self.num_generated = 0
+        self.num_revisits = 0
+        self.num_move_states = 0
+        self.moves_by_size = Counter()
+        self.times = {name: 0.0 for name in TIMED}
+        self.cache_start = move_voxel.cache_info()
+        self.num_searched = 0
+        self.search_time = 0.0
+        self.screened = Counter()
+        self.rejected = Counter()
+
+    def assembly_iteration(self, frontier_size: int):
+        """Record an iteration of the assembly search."""
+        if frontier_size > self.assembly_frontier_max:
+            self.assembly_frontier_max = frontier_size
+
+    def begin_disassembly(self):
+        """Record the start of an attempt to disassemble an assembly."""
+        self.expanded_per_assembly.append(0)
+
+    def expand(self, frontier_size: int):
+        """Record an A* node expansion."""
+        self.num_expanded += 1
+        if self.expanded_per_assembly:
+            self.expanded_per_assembly[-1] += 1
+
+        if frontier_size > self.astar_frontier_max:
+            self.astar_frontier_max = frontier_size
+
+    def neighbor(self, is_revisit: bool):
+        """Record a neighbour generated by A*."""
+        self.num_generated += 1
+        if is_revisit:
+            self.num_revisits += 1
+
+    def moves(self, moves: list, seconds: float):
+        """Record the moves generated for a state and the time taken."""
+        self.num_move_states += 1
+        self.times["valid_moves"] += seconds
+        for move in moves:
+            self.moves_by_size[len(move.pieces)] += 1
+
+    def searched(self, num_states: int, seconds: float):
+        """Record the states reached by a batched BFS and the time taken."""
+        self.num_searched += num_states
+        self.search_time += seconds
+
+    def screen(self, name: str, passed: bool):
+        """Record an assembly checked by one of the screens."""
+        self.screened[name] += 1
+        if not passed:
+            self.rejected[name] += 1
+
+    def timed(self, name: str, seconds: float):
+        """Add to the time spent in one of the `TIMED` functions."""
+        self.times[name] += seconds
+
+    @property
+    def voxel_cache(self) -> Mapping[str, int]:
+        """Hits and misses of the `move_voxel` cache since the statistics were created."""
+        info = move_voxel.cache_info()
+        return {"hits": info.hits - self.cache_start.hits,
+                "misses": info.misses - self.cache_start.misses}
+
+    @staticmethod
+    def hit_rate(hits: int, misses: int) -> float:
+        """Return the fraction of lookups which were hits (or 0 if there were none)."""
+        total = hits + misses
+        return hits / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        """Return the statistics as a JSON-serializable dictionary."""
+        voxel_cache = self.voxel_cache
+        num_moves = sum(self.moves_by_size.values())
+        return {
+            "assembly_frontier_max": self.assembly_frontier_max,
+            "astar_frontier_max": self.astar_frontier_max,
+            "num_expanded": self.num_expanded,
+            "expanded_per_assembly": list(self.expanded_per_assembly),
+            "num_generated": self.num_generated,
+            "revisit_rate": self.hit_rate(self.num_revisits, self.num_generated - self.num_revisits),
+            "num_move_states": self.num_move_states,
+            "moves_per_state": num_moves / self.num_move_states if self.num_move_states else 0.0,
+            "moves_by_size": {str(size): count for size, count in sorted(self.moves_by_size.items())},
+            "voxel_cache": dict(voxel_cache, hit_rate=self.hit_rate(**voxel_cache)),
+            "times": dict(self.times),
+            "bfs_states_per_second": self.num_searched / self.search_time if self.search_time else 0.0,
+            "screens": {name: {"screened": count, "rejected": self.rejected[name],
+                               "rejection_rate": self.rejected[name] / count}
+                        for name, count in self.screened.items()},
+        }
@@ -0,0 +1,238 @@
+"""Precomputed lookup tables shared between processes.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Each process which solves puzzles would otherwise work out the valid
+orientations of every shape for itself (see `Shape.from_text`). Instead,
+a parent process can build flat tables once and place them in a single
+`multiprocessing.shared_memory` block, which worker processes attach to
+without copying. The tables are:
+
+    orient      (place, orientation, shape voxel) -> grid cell
+    neighbors   (direction, grid cell) -> grid cell one step away, or -1
+    masks       (shape,) 24-bit shape masks, which index the tables below
+    placements  (shape, place, orientation, word) 216-bit cell masks, as
+                four little-endian 64-bit words
+    valid       (shape, place, orientation) whether the orientation is one
+                of those `Shape.from_text` would find
+
+The grid cells are the 6x6x6 voxels of the assembled puzzle, and cell
+(x + 5) // 2 * 36 + (y + 5) // 2 * 6 + (z + 5) // 2 holds voxel (x, y, z).
+"""
+
+import json
+from multiprocessing import shared_memory
+import struct
+from typing import Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .position import Direction, PLACES
+from .puzzle import Puzzle
+from .shape import index_voxel, mask_from_text, mask_to_text, NUM_VOXELS, REQUIRED, Shape
+from .voxel import Voxel
+
+
+NUM_CELLS = 216
+NUM_WORDS = 4
+PLACE_NAMES = list(PLACES)
+LENGTH = struct.Struct("<I")
+
+
+def cell_of(v: Voxel) -> int:
+    """Return the grid cell of a voxel, or -1 if it is outside the puzzle."""
+    if v.is_outside():
+        return -1
+
+    return (v.x + 5) // 2 * 36 + (v.y + 5) // 2 * 6 + (v.z + 5) // 2
+
+
+def build_static() -> Mapping[str, np.ndarray]:
+    """Build the tables which do not depend on the shapes."""
+    shape_voxels = [index_voxel(i) for i in range(NUM_VOXELS)]
+    orient = np.array([[[cell_of(v.move_to(position, o)) for v in shape_voxels]
+                        for o in range(8)]
+                       for position in PLACES.values()], np.int16)
+    cells = [Voxel(x, y, z) for x in range(-5, 6, 2) for y in range(-5, 6, 2) for z in range(-5, 6, 2)]
+    neighbors = np.array([[cell_of(v.move(d)) for v in cells] for d in Direction], np.int16)
+    return {"orient": orient, "neighbors": neighbors}
+
+
+def build_placements(orient: np.ndarray, masks: Sequence[int]) -> Mapping[str, np.ndarray]:
+    """Build the placement masks and valid orientations of a list of shapes.
+
+    Description:
+        All the shapes are placed in every orientation at every place at
+        once, as a boolean (shape, place, orientation, cell) array. An
+        orientation is valid if it fills the cells in `REQUIRED` and does
+        not give the same cells as an earlier orientation, which is the
+        rule used by `Shape.from_text`.
+    """
+    masks = np.array(masks, np.int64).reshape(-1)
+    bits = (masks[:, np.newaxis] >> (NUM_VOXELS - 1 - np.arange(NUM_VOXELS))) & 1
+    occupied = np.zeros((len(masks), len(PLACES), 8, NUM_CELLS), bool)
+    places = np.arange(len(PLACES))[:, np.newaxis, np.newaxis]
+    orientations = np.arange(8)[np.newaxis, :, np.newaxis]
+    occupied[:, places, orientations, orient] = bits[:, np.newaxis, np.newaxis, :].astype(bool)
+
+    required = np.array([[cell_of(v) for v in REQUIRED[name]] for name in PLACE_NAMES])
+    required = np.broadcast_to(required[np.newaxis, :, np.newaxis, :], occupied.shape[:3] + (8,))
+    has_required = np.take_along_axis(occupied, required, axis=-1).all(axis=-1)
+
+    packed = np.packbits(occupied, axis=-1, bitorder="little")
+    same = (packed[:, :, :, np.newaxis] == packed[:, :, np.newaxis]).all(axis=-1)
+    earlier = np.tril(np.ones((8, 8), bool), -1)
+    duplicate = (same & earlier).any(axis=-1)
+
+    padded = np.zeros(packed.shape[:3] + (8 * NUM_WORDS,), np.uint8)
+    padded[..., :packed.shape[-1]] = packed
+    return {"masks": masks,
+            "placements": padded.view("<u8"),
+            "valid": has_required & ~duplicate}
+
+
+def build_tables(shapes: Sequence[str] = ()) -> Mapping[str, np.ndarray]:
+    """Build every table, with placements for the given shape strings."""
+    tables = dict(build_static())
+    masks = sorted({mask for mask in map(mask_from_text, shapes) if mask < 1 << NUM_VOXELS})
+    tables.update(build_placements(tables["orient"], masks))
+    return tables
+
+
+def data_start(directory_size: int) -> int:
+    """Return the offset of the first table, which is aligned to 8 bytes."""
+    header = LENGTH.size + directory_size
+    return header + (-header % 8)
+
+
+class SharedTables:
+    """Tables held in a shared memory block.
+
+    Description:
+        The block starts with the length of a JSON directory giving the
+        name, dtype, shape and offset of each table, and the tables follow.
+        The process which creates the block should `unlink` it once the
+        workers are finished with it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        """Constructor, which maps the tables in an existing block."""
+        self.shm = shm
+        size, = LENGTH.unpack_from(shm.buf)
+        directory = json.loads(bytes(shm.buf[LENGTH.size:LENGTH.size + size]))
+        start = data_start(size)
+        self.arrays = {name: np.ndarray(tuple(shape), np.dtype(dtype), shm.buf, start + offset)
+                       for name, dtype, shape, offset in directory}
+        for array in self.arrays.values():
+            array.setflags(write=False)
+
+        self.index = {int(mask): i for i, mask in enumerate(self.arrays["masks"])}
+
+    @property
+    def name(self) -> str:
+        """The name of the shared memory block, which workers attach by."""
+        return self.shm.name
+
+    @staticmethod
+    def create(tables: Mapping[str, np.ndarray]) -> "SharedTables":
+        """Copy tables into a new shared memory block."""
+        directory = []
+        offset = 0
+        for name, array in tables.items():
+            directory.append([name, array.dtype.str, list(array.shape), offset])
+            offset += array.nbytes + (-array.nbytes % 8)
+
+        raw = json.dumps(directory).encode("utf-8")
+        start = data_start(len(raw))
+        shm = shared_memory.SharedMemory(create=True, size=start + offset)
+        LENGTH.pack_into(shm.buf, 0, len(raw))
+        shm.buf[LENGTH.size:LENGTH.size + len(raw)] = raw
+        for (_, _, _, offset), array in zip(directory, tables.values()):
+            shm.buf[start + offset:start + offset + array.nbytes] = np.ascontiguousarray(array).tobytes()
+
+        return SharedTables(shm)
+
+    @staticmethod
+    def attach(name: str) -> "SharedTables":
+        """Attach to a block created by another process."""
+        return SharedTables(shared_memory.SharedMemory(name=name))
+
+    def close(self):
+        """Detach from the block."""
+        self.arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        """Free the block, which should only be done by the process which created it."""
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedTables":
+        """Use the tables as a context manager, which frees the block on exit."""
+        return self
+
+    def __exit__(self, *args):
+        """Detach from and free the block."""
+        self.close()
+        self.unlink()
+
+    def row(self, text: str) -> int:
+        """Return the index of a shape string in the tables.
+
+        Raises:
+            KeyError: If the shape is not in the tables.
+        """
+        mask = mask_from_text(text)
+        if mask_to_text(mask) != text:
+            raise KeyError(text)
+
+        return self.index[mask]
+
+    def shape(self, text: str) -> Shape:
+        """Return the shape for a string, taking its orientations from the tables.
+
+        Raises:
+            KeyError: If the shape is not in the tables.
+        """
+        i = self.row(text)
+        valid = self.arrays["valid"][i]
+        voxels = tuple(index_voxel(j) for j, c in enumerate(text.replace("/", "")) if c == "x")
+        return Shape(voxels, {name: np.nonzero(valid[p])[0].tolist() for p, name in enumerate(PLACE_NAMES)})
+
+    def placement_masks(self, text: str) -> Mapping[str, Tuple[int, ...]]:
+        """Return the cell masks of a shape in each of its valid orientations at each place."""
+        i = self.row(text)
+        valid = self.arrays["valid"][i]
+        words = self.arrays["placements"][i]
+        return {name: tuple(int.from_bytes(words[p, o].tobytes(), "little") for o in np.nonzero(valid[p])[0])
+                for p, name in enumerate(PLACE_NAMES)}
+
+
+"""The tables attached by `attach_worker`, if any."""
+_attached: SharedTables = None
+
+
+def attach_worker(name: str):
+    """Attach a worker process to shared tables, for use as a pool initializer."""
+    global _attached
+    _attached = SharedTables.attach(name)
+
+
+def attached() -> SharedTables:
+    """Return the tables this process is attached to, or None."""
+    return _attached
+
+
+def puzzle_from_text(lines: Sequence[str]) -> Puzzle:
+    """Create a puzzle as `Puzzle.from_text` does, using the attached tables where possible."""
+    tables = attached()
+    if tables is None:
+        return Puzzle.from_text(list(lines))
+
+    shapes = []
+    for line in lines:
+        try:
+            shapes.append(tables.shape(line))
+        except KeyError:
+            shapes.append(Shape.from_text(line))
+
+    return Puzzle(tuple(shapes), [])
@@ -0,0 +1,219 @@
+"""Verification of stored disassemblies.
+
+NB: Nothing in this module is in scope for the Tripos.
+
+Rather than solving a puzzle again, a stored disassembly is checked by
+replaying it: the assembly must be a valid assembly of the shapes, every
+move must be one which `Puzzle.valid_moves` could have produced, and the
+puzzle must be empty at the end. Checking a move directly only needs the
+moving pieces to be slid in one direction, which is much cheaper than
+generating every valid move, and puzzles are checked in batches across a process pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+from typing import Iterable, Iterator, List, Mapping, NamedTuple, Sequence, TextIO, Tuple
+
+from .batch import chunks, submit_bounded
+from .encoding import shape_from_mask
+from .position import PLACES
+from .puzzle import Move, Puzzle, PuzzleState
+from .shape import mask_from_text
+
+
+"""The outcome of checking one stored disassembly.
+
+The error is None if the disassembly is valid, and otherwise says what is
+wrong with it. The step is the index of the offending move, or None if the
+problem is with the assembly itself or the final state.
+"""
+Verification = NamedTuple("Verification", [("index", int),
+                                           ("assembly", str),
+                                           ("step", int),
+                                           ("error", str)])
+
+
+def check_assembly(puzzle: Puzzle, state: PuzzleState) -> str:
+    """Return what is wrong with an assembly, or None if it is valid."""
+    if sorted(p.shape for p in state.pieces) != list(range(len(puzzle.shapes))):
+        return "Assembly does not use every shape exactly once"
+
+    places = set(PLACES.values())
+    for piece in state.pieces:
+        if piece.position not in places:
+            return f"Piece {piece} is not at one of the places"
+
+        if not 0 <= piece.orientation < 8:
+            return f"Piece {piece} has an invalid orientation"
+
+    occupied = set()
+    for piece in state.pieces:
+        voxels = puzzle.voxels_for(piece)
+        if occupied.intersection(voxels):
+            return f"Piece {piece} collides with another piece"
+
+        occupied.update(voxels)
+
+    return None
+
+
+def check_move(puzzle: Puzzle, move: Move) -> str:
+    """Return why a move is not one of `puzzle.valid_moves()`, or None if it is.
+
+    Description:
+        `valid_moves` slides a group of pieces until it would collide or is
+        completely out of the puzzle. In the latter case the move takes the
+        fewest steps needed to remove the group, and otherwise it is a
+        single step. The group sizes are also limited by the number of
+        pieces left.
+    """
+    num_pieces = len(puzzle.pieces)
+    max_size = 3 if num_pieces == 6 else 2 if num_pieces > 3 else 1
+    if not 1 <= len(move.pieces) <= max_size:
+        return f"Cannot move {len(move.pieces)} pieces when {num_pieces} remain"
+
+    if not move.pieces.issubset(puzzle.pieces) or move.steps < 1:
+        return "Move does not match the pieces in the puzzle"
+
+    moving = []
+    others = set()
+    for piece in puzzle.pieces:
+        if piece in move.pieces:
+            moving.extend(puzzle.voxels_for(piece))
+        else:
+            others.update(puzzle.voxels_for(piece))
+
+    for steps in range(1, move.steps + 1):
+        moved = [v.move(move.direction, steps) for v in moving]
+        if others.intersection(moved):
+            return f"Pieces collide after {steps} steps"
+
+        is_outside = not any(v.is_inside() for v in moved)
+        if is_outside and steps < move.steps:
+            return f"Pieces are out of the puzzle after {steps} steps"
+
+    if move.steps > 1 and not is_outside:
+        return "Pieces which stay in the puzzle can only move one step"
+
+    if not is_outside:
+        # a single step is only allowed if the pieces cannot slide all the way out
+        steps = move.steps
+        while True:
+            steps += 1
+            moved = [v.move(move.direction, steps) for v in moving]
+            if others.intersection(moved):
+                return None
+
+            if not any(v.is_inside() for v in moved):
+                return "Pieces can slide out of the puzzle, so must be moved all the way"
+
+
+def verify_disassembly(shapes: Sequence[str], assembly: str,
+                       moves: Sequence[str]) -> Tuple[int, str]:
+    """Replay a stored disassembly.
+
+    Args:
+        shapes: The shape strings of the puzzle.
+        assembly: The assembly, as from `str(PuzzleState)`.
+        moves: The moves, as from `repr(Move)`.
+
+    Returns:
+        The step and error as for `Verification`, or (None, None) if the
+        disassembly is valid.
+    """
+    try:
+        # the shapes are cached, as libraries reuse a small set of pieces
+        puzzle = Puzzle(tuple(shape_from_mask(mask_from_text(text)) for text in shapes), ())
+        state = PuzzleState.from_string(assembly)
+    except (ValueError, IndexError, KeyError) as e:
+        return None, f"Unable to parse assembly: {e!r}"
+
+    error = check_assembly(puzzle, state)
+    if error is not None:
+        return None, error
+
+    puzzle = puzzle.to_state(state)
+    for step, text in enumerate(moves):
+        try:
+            move = Move.from_string(text)
+        except (ValueError, IndexError, KeyError) as e:
+            return step, f"Unable to parse move: {e!r}"
+
+        error = check_move(puzzle, move)
+        if error is not None:
+            return step, error
+
+        puzzle = puzzle.do_move(move)
+
+    if puzzle.pieces:
+        return None, f"{len(puzzle.pieces)} pieces are left in the puzzle"
+
+    return None, None
+
+
+def verify_puzzle(index: int, info: Mapping) -> List[Verification]:
+    """Verify every stored disassembly of a puzzle entry (in the JSON schema)."""
+    results = []
+    for assembly, moves in info.get("assemblies", {}).items():
+        step, error = verify_disassembly(info["shapes"], assembly, moves)
+        results.append(Verification(index, assembly, step, error))
+
+    return results
+
+
+def verify_batch(batch: List[Tuple[int, Mapping]]) -> List[Verification]:
+    """Verify a batch of puzzle entries."""
+    return [result for index, info in batch for result in verify_puzzle(index, info)]
+
+
+def verify_puzzles(puzzles: Iterable[Mapping], num_workers: int = None,
+                   batch_size=256) -> Iterator[Verification]:
+    """Verify the stored disassemblies of many puzzles using a process pool.
+
+    Args:
+        puzzles: Puzzle entries in the JSON schema (for example a `Library`).
+        num_workers: The number of worker processes (defaults to the CPU
+                     count). If 1, the puzzles are verified in this process.
+        batch_size: The number of puzzles sent to a worker at a time.
+
+    Returns:
+        The results in puzzle order.
+    """
+    batches = chunks(enumerate(puzzles), batch_size)
+    if num_workers == 1:
+        for batch in batches:
+            yield from verify_batch(batch)
+
+        return
+
+    num_workers = num_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for _, future in submit_bounded(executor, verify_batch, batches, max_pending=2 * num_workers):
+            yield from future.result()
+
+
+def run_verify(path: str, output: TextIO = sys.stdout, num_workers: int = None,
+               verbose=False) -> int:
+    """Verify a puzzle file, printing the failures (or every result if verbose).
+
+    Returns:
+        The number of failures.
+    """
+    from .library import open_puzzles
+
+    num_checked = 0
+    num_failed = 0
+    for result in verify_puzzles(open_puzzles(path), num_workers):
+        num_checked += 1
+        if result.error is not None:
+            num_failed += 1
+
+        if verbose or result.error is not None:
+            status = "OK" if result.error is None else "FAIL"
+            step = "" if result.step is None else f" move {result.step}"
+            output.write(f"{status} puzzle {result.index} [{result.assembly}]{step}"
+                         + ("" if result.error is None else f": {result.error}") + "\n")
+
+    output.write(f"Verified {num_checked} disassemblies, {num_failed} failed\n")
+    return num_failed
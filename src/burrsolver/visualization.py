@@ -11,7 +11,7 @@ import numpy as np
 import scenepic as sp
 
 
-from .geometry import Mesh
+from .geometry import cached_mesh
 from .puzzle import Puzzle, PuzzleState, Move
 from .voxel import Voxel
 
@@ -37,7 +37,7 @@ def voxels_to_mesh(scene: sp.Scene, voxels: List[Voxel],
         The mesh created from the list of voxels.
     """
     mesh = scene.create_mesh(name, layer_id=name, shared_color=color)
-    mesh_info = Mesh.from_voxels(voxels, merge_mesh)
+    mesh_info = cached_mesh(voxels, merge_mesh)
     triangles = np.zeros((mesh_info.quads.shape[0] * 2, 3), dtype=np.int32)
     triangles[0::2] = mesh_info.quads[:, 0:3]
     triangles[1::2, :2] = mesh_info.quads[:, 2:]
@@ -63,8 +63,30 @@ def cross_mesh(scene: sp.Scene):
 
 
 def save_scenepic(path: str, puzzle: Puzzle,
-                  disassembly: List[Tuple[PuzzleState, Move]], width: int, height: int):
-    """Save the solution as a ScenePic HTML file."""
+                  disassembly: List[Tuple[PuzzleState, Move]], width: int, height: int,
+                  max_frames: int = None, frames_per_step=5, freeze_frames=60):
+    """Save the solution as a ScenePic HTML file.
+
+    Description:
+        The animation plays the disassembly backwards (i.e. assembles the
+        puzzle), pauses, and then plays it forwards. The piece transforms
+        are computed once for each move (see `animation.keyframes`) and
+        interpolated, and the assembly and the pause reuse the frames of
+        the forward pass.
+
+    Args:
+        path: The path of the HTML file.
+        puzzle: The puzzle.
+        disassembly: The disassembly, as returned by `solver.disassemble`.
+        width: The width of the solution canvas in pixels.
+        height: The height of the solution canvas in pixels.
+        max_frames: Optional cap on the number of animation frames. Frames
+                    are dropped evenly if there would be more than this.
+        frames_per_step: The number of frames for each step of a move.
+        freeze_frames: The number of frames to pause on the assembly.
+    """
+    from .animation import frame_indices, interpolate, keyframes
+
     piece_size = width // 6
     scene = sp.Scene()
     camera = sp.Camera([16, 4, 6], [0, 0, 0], [0, 1, 0], 60)
@@ -81,49 +103,26 @@ def save_scenepic(path: str, puzzle: Puzzle,
     camera.aspect_ratio = width / height
     canvas = scene.create_canvas_3d("solution", width=width, height=height,
                                     camera=camera, shading=shading)
-    frames_per_step = 5
-    num_frames = sum([move.steps
-                      for _, move in disassembly[:-1]]) * frames_per_step
-    freeze_frames = 60
-    cameras = sp.Camera.orbit(num_frames + freeze_frames + num_frames, 20, 1, 0, 1,
+
+    # each forward frame is (keyframe, transforms of its pieces)
+    forward = []
+    for keyframe in keyframes(disassembly):
+        num_frames = keyframe.steps * frames_per_step
+        for transforms in interpolate(keyframe, np.arange(num_frames) / num_frames):
+            forward.append((keyframe.shapes, transforms))
+
+    assembled = forward[:1] if forward else []
+    sequence = forward[::-1] + assembled * freeze_frames + forward
+    indices = frame_indices(len(sequence), max_frames)
+    cameras = sp.Camera.orbit(len(indices), 20, 1, 0, 1,
                               [0, 1, 0], [0, 0, 1],
                               60, width / height, .1, 100)
-    f = 0
-    for state, move in reversed(disassembly[:-1]):
-        puzzle = puzzle.to_state(state)
-        move_steps = move.steps * frames_per_step
-        for steps in range(move_steps, 0, -1):
-            temp = puzzle.do_move(Move(move.pieces, move.direction, steps / frames_per_step))
-            frame: sp.Frame3D = canvas.create_frame(camera=cameras[f])
-            f += 1
-            frame.add_mesh(cross)
-            for piece in temp.pieces:
-                mesh = meshes[piece.shape]
-                transform = piece.to_transform()
-                frame.add_mesh(mesh, transform)
-
-    assembled = puzzle.to_state(disassembly[0][0])
-    for _ in range(freeze_frames):
-        frame = canvas.create_frame(camera=cameras[f])
+    for f, i in enumerate(indices):
+        shapes, transforms = sequence[i]
+        frame: sp.Frame3D = canvas.create_frame(camera=cameras[f])
         frame.add_mesh(cross)
-        f += 1
-        for piece in assembled.pieces:
-            mesh = meshes[piece.shape]
-            transform = piece.to_transform()
-            frame.add_mesh(mesh, transform)
-
-    for state, move in disassembly[:-1]:
-        puzzle = puzzle.to_state(state)
-        move_steps = move.steps * frames_per_step
-        for steps in range(0, move_steps):
-            temp = puzzle.do_move(Move(move.pieces, move.direction, steps / frames_per_step))
-            frame: sp.Frame3D = canvas.create_frame(camera=cameras[f])
-            f += 1
-            frame.add_mesh(cross)
-            for piece in temp.pieces:
-                mesh = meshes[piece.shape]
-                transform = piece.to_transform()
-                frame.add_mesh(mesh, transform)
+        for shape, transform in zip(shapes, transforms):
+            frame.add_mesh(meshes[shape], transform)
 
     scene.grid(width=f"{width}px", grid_template_rows=f"{piece_size}px {height}px",
                grid_template_columns=f"repeat(6, {piece_size}px)")
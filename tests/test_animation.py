@@ -0,0 +1,51 @@
+import json
+import os
+
+import numpy as np
+
+from burrsolver import Puzzle
+from burrsolver.animation import frame_indices, interpolate, keyframes
+from burrsolver.puzzle import Move, PuzzleState
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def disassembly(index):
+    info = PUZZLES[index]
+    puzzle = Puzzle.from_text(info["shapes"])
+    assembly, moves = next(iter(info["assemblies"].items()))
+    state = puzzle.to_state(PuzzleState.from_string(assembly))
+    steps = []
+    for text in moves:
+        move = Move.from_string(text)
+        steps.append((state.state(), move))
+        state = state.do_move(move)
+
+    steps.append((state.state(), None))
+    return puzzle, steps
+
+
+def test_interpolate():
+    puzzle, steps = disassembly(0)
+    frames = keyframes(steps)
+    assert len(frames) == len(steps) - 1
+    for keyframe, (state, move) in zip(frames, steps):
+        fractions = np.arange(5) / 5
+        transforms = interpolate(keyframe, fractions)
+        assert transforms.shape == (5, len(state.pieces), 4, 4)
+        for fraction, expected in zip(fractions, transforms):
+            moved = [piece.move(move.direction, fraction * move.steps) if piece in move.pieces else piece
+                     for piece in state.pieces]
+            assert np.allclose([piece.to_transform() for piece in moved], expected)
+
+
+def test_frame_indices():
+    assert list(frame_indices(10)) == list(range(10))
+    assert list(frame_indices(10, 20)) == list(range(10))
+    indices = frame_indices(1000, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import json
+
+from burrsolver import batch
+from burrsolver.batch import batch_solve, chunks, solve_task, submit_bounded, Task
+from burrsolver.solver import solve
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_batch_solve(tmp_path):
+    path = str(tmp_path / "puzzles.json")
+    with open(path, "w") as f:
+        json.dump({"puzzles": [PUZZLES[8], PUZZLES[0]]}, f)
+
+    output = io.StringIO()
+    num_solved = batch_solve([path], output, num_workers=2)
+    assert num_solved == 2
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(r["index"] for r in results) == [0, 1]
+    for result in results:
+        expected = [PUZZLES[8], PUZZLES[0]][result["index"]]
+        assert result["status"] == "solved"
+        assert result["assembly"] in expected["assemblies"]
+        assert result["moves"] == expected["assemblies"][result["assembly"]]
+        assert result["level"] == 1
+        assert result["time"] > 0
+
+
+def test_timeout():
+    result = solve_task(Task("puzzles.json", 3, PUZZLES[3]["shapes"], 0.05))
+    assert result["status"] == "timeout"
+
+
+def crash_on_level_9(puzzle, *args):
+    if puzzle.level() == 9:
+        os._exit(1)
+
+    return solve(puzzle, *args)
+
+
+def test_errors(tmp_path, monkeypatch):
+    path = str(tmp_path / "puzzles.json")
+    with open(path, "w") as f:
+        json.dump({"puzzles": [PUZZLES[8], PUZZLES[1], PUZZLES[0], PUZZLES[8]]}, f)
+
+    bad_path = str(tmp_path / "bad.json")
+    with open(bad_path, "w") as f:
+        f.write("{")
+
+    # worker processes are forked, so they see the patched solver
+    monkeypatch.setattr(batch, "solve", crash_on_level_9)
+    output = io.StringIO()
+    num_solved = batch_solve([bad_path, str(tmp_path / "missing.json"), path], output, num_workers=2,
+                             segment_size=3)
+
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["status"] for r in results if "index" not in r] == ["error", "error"]
+    statuses = {r["index"]: r["status"] for r in results if "index" in r}
+    assert statuses == {0: "solved", 1: "error", 2: "solved", 3: "solved"}
+    assert num_solved == 3
+
+
+def test_submit_bounded():
+    taken = []
+
+    def items():
+        for i in range(20):
+            taken.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = []
+        for item, future in submit_bounded(executor, pow, items(), 2, max_pending=4):
+            # no more than max_pending items are read ahead of the results
+            assert len(taken) <= item + 5
+            results.append(future.result())
+
+    assert results == [i * i for i in range(20)]
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,38 @@
+import os
+
+from burrsolver.benchmark import compare, Measurement, solve_benchmark
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+
+def test_solve_benchmark():
+    results = solve_benchmark(PUZZLES_PATH, [8], repeats=1, visualize=False)
+    phases = results["8"]
+    assert list(phases) == ["precompute", "assembly", "screen", "disassemble"]
+    assert all(set(m) - {"calls"} == set(Measurement._fields) for m in phases.values())
+    assert phases["assembly"]["num_checked"] > 0
+    assert phases["disassemble"]["num_expanded"] > 0
+    assert phases["disassemble"]["num_valid_moves"] > 0
+    assert phases["disassemble"]["peak_memory"] > 0
+    assert compare(results, results) == []
+
+
+def test_disassemble_calls():
+    # puzzle 1 screens out most of the assemblies it finds before its solution
+    phases = solve_benchmark(PUZZLES_PATH, [1], repeats=2, visualize=False)["1"]
+    calls = phases["disassemble"]["calls"]
+    assert phases["screen"]["num_checked"] == phases["assembly"]["num_checked"]
+    assert len(calls) == phases["disassemble"]["num_checked"] < phases["screen"]["num_checked"]
+    assert [call["assembly"] for call in calls] == sorted(call["assembly"] for call in calls)
+    assert sum(call["num_expanded"] for call in calls) == phases["disassemble"]["num_expanded"]
+    assert all(call["time"] > 0 for call in calls)
+
+
+def test_compare():
+    baseline = {"0": {"assembly": Measurement(1.0, 1000, 5, 0, 0)._asdict()}}
+    noisy = {"0": {"assembly": Measurement(1.05, 1050, 5, 0, 0)._asdict()}}
+    slower = {"0": {"assembly": Measurement(1.5, 1000, 6, 0, 0)._asdict()}}
+    assert compare(noisy, baseline, 0.1) == []
+    assert compare(slower, baseline, 0.1) == ["puzzle 0 assembly time: 1.0 -> 1.5",
+                                              "puzzle 0 assembly num_checked: 5 -> 6"]
@@ -0,0 +1,61 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from burrsolver.bfs import bfs_disassemble, expand, Layer, MoveTables
+from burrsolver.puzzle import Puzzle, PuzzleState
+from burrsolver.solver import disassemble, solve
+from burrsolver.stats import Statistics
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def assembled(index: int) -> Puzzle:
+    puzzle = Puzzle.from_text(PUZZLES[index]["shapes"])
+    return puzzle.to_state(solve(puzzle).assembly)
+
+
+@pytest.mark.parametrize("index", [0, 1, 3, 8])
+def test_shortest_disassembly(index):
+    puzzle = assembled(index)
+    expected = disassemble(puzzle)
+    stats = Statistics()
+    moves = disassemble(puzzle, stats=stats, engine="bfs")
+    assert len(moves) == len(expected)
+    assert moves[0][0] == puzzle.state()
+    assert moves[-1] == (PuzzleState(()), None)
+    assert stats.num_searched > 0
+    assert stats.to_dict()["bfs_states_per_second"] > 0
+
+    state = puzzle
+    for step, move in moves[:-1]:
+        assert state.state() == step
+        state = state.do_move(move)
+
+
+def test_moves_match_valid_moves():
+    puzzle = assembled(3)
+    tables = MoveTables(puzzle)
+    num_pieces = len(puzzle.pieces)
+    offsets = np.zeros((1, num_pieces, 3), np.int64)
+    present = np.ones((1, num_pieces), bool)
+    empty = np.zeros(1, np.int64)
+    layer = Layer(tables.pack(offsets, present), offsets, present, empty, empty, empty, empty)
+    for _ in range(3):
+        expected = set()
+        for o, p in zip(layer.offsets, layer.present):
+            state = puzzle.to_state(tables.state(o, p))
+            expected.update(state.do_move(move).state() for move in state.valid_moves())
+
+        layer = expand(tables, layer, np.zeros(0, np.uint64), 64)
+        assert {tables.state(o, p) for o, p in zip(layer.offsets, layer.present)} == expected
+
+
+def test_empty_puzzle():
+    puzzle = assembled(0).to_state(PuzzleState(()))
+    assert bfs_disassemble(puzzle) == [(PuzzleState(()), None)]
@@ -0,0 +1,50 @@
+import os
+import json
+import threading
+
+from burrsolver.budget import Budget
+from burrsolver.puzzle import Puzzle
+from burrsolver.solver import PartialResult, Solution, solve
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_no_budget():
+    assert isinstance(solve(Puzzle.from_text(PUZZLES[8]["shapes"]), Budget()), Solution)
+
+
+def test_time_budget():
+    result = solve(Puzzle.from_text(PUZZLES[3]["shapes"]), Budget(seconds=0.05))
+    assert isinstance(result, PartialResult)
+    assert result.reason == "time"
+    assert result.elapsed < 1
+
+
+def test_node_budget():
+    result = solve(Puzzle.from_text(PUZZLES[3]["shapes"]), Budget(nodes=1000))
+    assert result.reason == "nodes"
+    assert result.num_iterations + result.num_expanded <= 1000 + 256
+
+
+def test_memory_budget():
+    result = solve(Puzzle.from_text(PUZZLES[3]["shapes"]), Budget(memory=1))
+    assert result.reason == "memory"
+
+
+def test_cancel_and_progress():
+    cancel = threading.Event()
+    reports = []
+
+    def progress(p):
+        reports.append(p)
+        if len(reports) == 3:
+            cancel.set()
+
+    result = solve(Puzzle.from_text(PUZZLES[3]["shapes"]), cancel=cancel,
+                   progress=progress, progress_interval=0)
+    assert result.reason == "cancelled"
+    assert len(reports) == 3
+    assert reports[-1].num_expanded > reports[0].num_expanded
+    assert reports[-1].astar_frontier > 0
@@ -0,0 +1,76 @@
+import os
+import json
+import random
+
+import numpy as np
+
+from burrsolver.canonical import (canonical_masks, canonical_puzzle, canonical_shape,
+                                  canonical_text, orient_mask, unique_puzzles)
+from burrsolver.position import Axis, Position
+from burrsolver.shape import mask_from_text, mask_to_text, Shape
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+SHAPES = [line for puzzle in PUZZLES for line in puzzle["shapes"]]
+
+
+def rotated_text(text: str, orientation: int) -> str:
+    shape = Shape.from_text(text)
+    origin = Position(0, 0, 0, Axis.Z)
+    voxels = tuple(v.move_to(origin, orientation) for v in shape.voxels)
+    return Shape(voxels, {}).to_text()
+
+
+def test_mask_round_trip():
+    for text in SHAPES:
+        assert mask_to_text(mask_from_text(text)) == text
+        assert Shape.from_text(text).to_mask() == mask_from_text(text)
+        assert Shape.from_mask(mask_from_text(text)).to_text() == text
+
+
+def test_orient_mask():
+    for text in SHAPES:
+        for o in range(8):
+            assert mask_to_text(orient_mask(mask_from_text(text), o)) == rotated_text(text, o)
+
+
+def test_canonical_shape():
+    for text in SHAPES:
+        expected = min(rotated_text(text, o) for o in range(8))
+        assert canonical_text(text) == expected
+        for o in range(8):
+            assert canonical_text(rotated_text(text, o)) == expected
+
+        mask, o = canonical_shape(mask_from_text(text))
+        assert mask_to_text(mask) == rotated_text(text, o)
+
+
+def test_canonical_puzzle():
+    for puzzle in PUZZLES:
+        expected = canonical_puzzle(puzzle["shapes"])
+        lines = [rotated_text(line, random.randrange(8)) for line in puzzle["shapes"]]
+        random.shuffle(lines)
+        assert canonical_puzzle(lines) == expected
+
+
+def test_vectorized():
+    masks = np.array([[mask_from_text(line) for line in puzzle["shapes"]]
+                      for puzzle in PUZZLES], dtype=np.uint32)
+    expected = [[canonical_shape(int(m))[0] for m in row] for row in masks]
+    assert canonical_masks(masks).tolist() == expected
+
+    rotated = np.array([[mask_from_text(rotated_text(line, random.randrange(8)))
+                         for line in reversed(puzzle["shapes"])]
+                        for puzzle in PUZZLES], dtype=np.uint32)
+    seen = set()
+    expected = []
+    for i, puzzle in enumerate(PUZZLES):
+        key = canonical_puzzle(puzzle["shapes"])
+        if key not in seen:
+            seen.add(key)
+            expected.append(i)
+
+    index = unique_puzzles(np.concatenate([masks, rotated]))
+    assert index.tolist() == expected
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+
+from burrsolver import Puzzle, solve
+from burrsolver.budget import Budget
+from burrsolver.checkpoint import Checkpoint, decode, encode, load, puzzle_shapes, save
+from burrsolver.solver import AssemblySearch, PartialResult
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_round_trip(tmp_path):
+    puzzle = Puzzle.from_text(PUZZLES[8]["shapes"])
+    solution = solve(puzzle)
+    search = AssemblySearch(puzzle)
+    for _ in zip(range(50), search):
+        pass
+
+    results = [(solution.assembly, solution.moves), (solution.assembly, None)]
+    checkpoint = search.to_checkpoint(results)
+    assert checkpoint.pending is not None
+    assert decode(encode(checkpoint), puzzle) == checkpoint
+
+    path = str(tmp_path / "puzzle.ckpt")
+    assert load(path, puzzle) is None
+    save(path, checkpoint)
+    assert load(path, puzzle) == checkpoint
+    assert os.listdir(tmp_path) == ["puzzle.ckpt"]
+
+    with pytest.raises(ValueError):
+        load(path, Puzzle.from_text(PUZZLES[0]["shapes"]))
+
+    with pytest.raises(ValueError):
+        decode(encode(checkpoint)[:-1], puzzle)
+
+
+def test_empty_checkpoint():
+    puzzle = Puzzle.from_text(PUZZLES[8]["shapes"])
+    checkpoint = Checkpoint(puzzle_shapes(puzzle), 0, 0, None, [], [])
+    assert decode(encode(checkpoint), puzzle) == checkpoint
+
+
+def test_resume(tmp_path):
+    puzzle = Puzzle.from_text(PUZZLES[3]["shapes"])
+    expected = solve(puzzle)
+    path = str(tmp_path / "puzzle.ckpt")
+
+    # the budget is checked every 256 nodes, so each of these stops early
+    for _ in range(2):
+        partial = solve(puzzle, Budget(nodes=100), checkpoint=path)
+        assert isinstance(partial, PartialResult)
+        assert os.path.exists(path)
+
+    assert load(path, puzzle).pending is not None
+
+    resumed = solve(puzzle, checkpoint=path)
+    assert resumed == expected
+    assert not os.path.exists(path)
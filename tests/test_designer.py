@@ -0,0 +1,53 @@
+import json
+import os
+
+from burrsolver.canonical import canonical_text
+from burrsolver.designer import design, Entry, evaluate, has_assembly, Leaderboard, notchable_catalog, score
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_catalog():
+    catalog = notchable_catalog()
+    # there are famously 59 notchable burr pieces
+    assert len(catalog) == 59
+    assert len(set(catalog)) == len(catalog)
+    assert all(canonical_text(text) == text for text in catalog)
+    assert "xxxxxx/xxxxxx/xxxxxx/xxxxxx" in catalog
+
+
+def test_has_assembly():
+    for info in PUZZLES:
+        assert has_assembly(info["shapes"], 100000)
+
+    full = "xxxxxx/xxxxxx/xxxxxx/xxxxxx"
+    assert not has_assembly([full] * 6, 100000)
+
+
+def test_leaderboard():
+    leaderboard = Leaderboard(2)
+    for num_moves, level, num_solutions in [(3, 2, 1), (5, 1, 1), (4, 3, 1), (5, 2, 1), (1, 9, 1), (5, 9, 2)]:
+        leaderboard.add(Entry(num_moves, level, [], "", [], num_solutions, num_solutions))
+
+    assert [(e.num_moves, e.level) for e in leaderboard.entries()] == [(5, 2), (5, 1)]
+
+
+def test_evaluate():
+    # puzzle 6 has 14 distinct assemblies, 7 of which come apart
+    entry = evaluate(PUZZLES[6]["shapes"], 60, 100000)
+    assert (entry.num_assemblies, entry.num_solutions) == (14, 7)
+    assert entry.num_moves == len(entry.moves) > 0
+
+
+def test_design():
+    report = design(30, num_workers=2, timeout=1, seed=0, leaderboard_size=5)
+    assert report.num_solved <= report.num_candidates <= report.num_sets <= 30
+    assert len(report.leaderboard) == min(5, report.num_solved)
+    scores = [score(e) for e in report.leaderboard]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0 < e.num_solutions <= e.num_assemblies for e in report.leaderboard)
+    assert all(len(e.moves) == e.num_moves and e.level >= 1 for e in report.leaderboard)
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+
+from burrsolver.distributed import coordinate, Coordinator, run_worker, units_for
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def write_puzzles(tmp_path, indices):
+    path = str(tmp_path / "puzzles.json")
+    with open(path, "w") as f:
+        json.dump({"puzzles": [PUZZLES[i] for i in indices]}, f)
+
+    return path
+
+
+def start_workers(port: int, num_workers: int):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=run_worker, args=("127.0.0.1", port, 0.1), daemon=True)
+               for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    return workers
+
+
+def test_solve_with_workers(tmp_path):
+    path = write_puzzles(tmp_path, [8, 0])
+    output = io.StringIO()
+    workers = []
+
+    def on_start(port):
+        workers.extend(start_workers(port, 2))
+
+    num_records = asyncio.run(coordinate(units_for([path]), output, on_start=on_start))
+    for worker in workers:
+        worker.join(timeout=10)
+        assert worker.exitcode == 0
+
+    assert num_records == 2
+    results = sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda r: r["index"])
+    for result, expected in zip(results, [PUZZLES[8], PUZZLES[0]]):
+        assert result["status"] == "solved"
+        assert result["moves"] == expected["assemblies"][result["assembly"]]
+
+
+def test_subtrees(tmp_path):
+    path = write_puzzles(tmp_path, [0])
+    output = io.StringIO()
+    workers = []
+
+    def on_start(port):
+        workers.extend(start_workers(port, 3))
+
+    asyncio.run(coordinate(units_for([path], subtrees=True, timeout=0.5), output, on_start=on_start))
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    summaries = [r for r in records if "status" in r]
+    assert sorted(r["subtree"] for r in summaries) == list(range(6))
+    assert all(r["status"] in ("analyzed", "timeout") for r in summaries)
+    for record in records:
+        if "assembly" in record and record["moves"] is not None:
+            assert len(record["moves"]) > 0
+
+
+async def lose_lease(tmp_path, lease_timeout: float, disconnect: bool):
+    path = write_puzzles(tmp_path, [8])
+    output = io.StringIO()
+    coordinator = Coordinator(units_for([path]), output, lease_timeout)
+    port = await coordinator.start()
+    run = asyncio.create_task(coordinator.run())
+
+    # a worker which takes the only unit and then disconnects or goes quiet
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b'{"op": "ready"}\n')
+    lease = json.loads(await reader.readline())
+    assert lease["op"] == "lease"
+    if disconnect:
+        # closed before forking the worker, which would otherwise inherit the socket
+        writer.close()
+        await writer.wait_closed()
+
+    workers = start_workers(port, 1)
+    assert await run == 1
+    assert coordinator.num_reassigned == 1
+    for worker in workers:
+        worker.join(timeout=10)
+
+    writer.close()
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(records) == 1
+    assert records[0]["status"] == "solved"
+
+
+def test_worker_disconnects(tmp_path):
+    asyncio.run(lose_lease(tmp_path, 60.0, True))
+
+
+def test_lease_expires(tmp_path):
+    asyncio.run(lose_lease(tmp_path, 0.5, False))
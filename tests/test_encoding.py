@@ -0,0 +1,57 @@
+import io
+import json
+import os
+
+import pytest
+
+from burrsolver import Puzzle, solve
+from burrsolver.encoding import (decode_disassembly, DisassemblyReader, DisassemblyWriter,
+                                 encode_disassembly, encode_move, write_disassemblies)
+from burrsolver.piece import Piece
+from burrsolver.position import Direction
+from burrsolver.puzzle import Move
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_round_trip():
+    puzzle = Puzzle.from_text(PUZZLES[3]["shapes"])
+    solution = solve(puzzle)
+    raw = encode_disassembly(solution.assembly, solution.moves)
+    assert len(raw) == 1 + 2 * 6 + 2 + 2 * (len(solution.moves) - 1)
+    assembly, moves = decode_disassembly(raw, puzzle)
+    assert assembly == solution.assembly
+    assert [(str(state), repr(move)) for state, move in moves] == \
+        [(str(state), repr(move)) for state, move in solution.moves]
+
+    assembly, moves = decode_disassembly(encode_disassembly(solution.assembly, None), puzzle)
+    assert assembly == solution.assembly and moves is None
+
+
+def test_stream(tmp_path):
+    path = str(tmp_path / "puzzles.dis")
+    count = write_disassemblies(path, PUZZLES)
+    assert count == sum(len(info["assemblies"]) for info in PUZZLES)
+
+    expected = [(info["shapes"], assembly, moves)
+                for info in PUZZLES for assembly, moves in info["assemblies"].items()]
+    with open(path, "rb") as f:
+        assert list(DisassemblyReader(f).strings()) == expected
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        DisassemblyReader(io.BytesIO(b"not a disassembly"))
+
+    with pytest.raises(ValueError):
+        encode_move(Move(frozenset([Piece.from_string("A1a")]), Direction.UP, 128))
+
+    out = io.BytesIO()
+    DisassemblyWriter(out).write_strings(*next((info["shapes"], a, m) for info in PUZZLES
+                                               for a, m in info["assemblies"].items()))
+    with pytest.raises(ValueError):
+        list(DisassemblyReader(io.BytesIO(out.getvalue()[:-1])))
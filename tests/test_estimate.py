@@ -0,0 +1,50 @@
+import json
+import os
+
+import pytest
+
+from burrsolver import Puzzle, solve
+from burrsolver.estimate import estimate
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_estimate():
+    # an exhaustive analysis of puzzle 0 takes 75361 iterations and finds
+    # 840 assemblies, every one of which can be disassembled
+    puzzle = Puzzle.from_text(PUZZLES[0]["shapes"])
+    result = estimate(puzzle, seed=0)
+    again = estimate(puzzle, seed=0)
+    assert result[:6] == again[:6]
+    assert 75361 / 4 < result.num_iterations < 75361 * 4
+    assert abs(result.num_iterations - 75361) < 3 * result.num_iterations_error
+    assert result.disassemblable > 0.9
+    assert result.disassemblable_interval[1] == 1
+    assert result.solve_seconds < result.analysis_seconds
+    assert result.elapsed < 5
+
+
+# the number of assemblies found by an exhaustive AssemblySearch, and the
+# fraction of the distinct ones which can be disassembled
+@pytest.mark.parametrize("index, num_assemblies, disassemblable, seed", [
+    (0, 840, 1, 1), (0, 840, 1, 2),
+    (3, 4320, 4 / 36, 1),
+    (8, 600, 1, 1), (8, 600, 1, 6),
+])
+def test_true_counts(index, num_assemblies, disassemblable, seed):
+    result = estimate(Puzzle.from_text(PUZZLES[index]["shapes"]), seed=seed)
+    assert result.num_probes >= 200
+    assert abs(result.num_assemblies - num_assemblies) < 3 * result.num_assemblies_error
+    assert 0 < result.disassemblable < 1
+    low, high = result.disassemblable_interval
+    assert low <= disassemblable <= high
+
+
+def test_solve_expanded():
+    solution = solve(Puzzle.from_text(PUZZLES[0]["shapes"]))
+    result = estimate(Puzzle.from_text(PUZZLES[0]["shapes"]), seed=0)
+    assert result.solve_expanded >= len(solution.moves) - 1
@@ -0,0 +1,81 @@
+import json
+import os
+
+import numpy as np
+
+from burrsolver import Puzzle
+from burrsolver.designer import notchable_catalog
+from burrsolver.export import (export_library, read_binary_stl, save_state_stl,
+                               shape_triangles, STL_TRIANGLE)
+from burrsolver.position import Direction
+from burrsolver.puzzle import Move, PuzzleState
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def read_ascii_stl(path):
+    with open(path) as f:
+        vertices = [[float(x) for x in line.split()[1:]] for line in f if line.strip().startswith("vertex")]
+
+    return np.array(vertices).reshape(-1, 3, 3)
+
+
+def test_shape(tmp_path):
+    assert STL_TRIANGLE.itemsize == 50
+    shape = Puzzle.from_text(PUZZLES[0]["shapes"]).shapes[2]
+    shape.save_as_stl(str(tmp_path / "ascii.stl"))
+    shape.save_as_stl(str(tmp_path / "binary.stl"), binary=True)
+    triangles = read_binary_stl(str(tmp_path / "binary.stl"))
+    assert np.array_equal(triangles["vertices"], read_ascii_stl(str(tmp_path / "ascii.stl")))
+    assert os.path.getsize(tmp_path / "binary.stl") == 84 + 50 * len(triangles)
+
+
+def test_watertight(tmp_path):
+    # every edge of every exported piece is shared by exactly two triangles,
+    # which run along it in opposite directions
+    path = str(tmp_path / "piece.stl")
+    for text in notchable_catalog():
+        shape = Puzzle.from_text([text]).shapes[0]
+        shape.save_as_stl(path, binary=True)
+        corners = read_binary_stl(path)["vertices"]
+        edges = np.concatenate([corners[:, [0, 1]], corners[:, [1, 2]], corners[:, [2, 0]]]).reshape(-1, 6)
+        forward, counts = np.unique(edges, axis=0, return_counts=True)
+        backward = np.unique(edges[:, [3, 4, 5, 0, 1, 2]], axis=0)
+        assert (counts == 1).all()
+        assert np.array_equal(forward, backward)
+
+        shape.save_as_stl(str(tmp_path / "ascii.stl"))
+        assert np.array_equal(corners, read_ascii_stl(str(tmp_path / "ascii.stl")))
+
+
+def test_assembly(tmp_path):
+    info = PUZZLES[0]
+    puzzle = Puzzle.from_text(info["shapes"])
+    assembly, moves = next(iter(info["assemblies"].items()))
+    state = PuzzleState.from_string(assembly)
+    path = str(tmp_path / "assembly.stl")
+    save_state_stl(path, puzzle, state)
+    triangles = read_binary_stl(path)
+    assert len(triangles) == sum(len(shape_triangles(shape)) for shape in puzzle.shapes)
+    # the assembled burr fits in a 6x6x6 cube of voxels, two units each
+    assert np.abs(triangles["vertices"]).max() == 60
+
+    # any state of the disassembly can be exported, including loose pieces
+    piece = state.pieces[0]
+    moved = puzzle.to_state(state).do_move(Move(frozenset([piece]), Direction.UP, 1)).state()
+    save_state_stl(path, puzzle, moved)
+    moved_triangles = read_binary_stl(path)
+    assert len(moved_triangles) == len(triangles)
+    changed = (moved_triangles["vertices"] != triangles["vertices"]).any(axis=(1, 2))
+    assert changed.sum() == len(shape_triangles(puzzle.shapes[piece.shape]))
+
+
+def test_export_library(tmp_path):
+    num_puzzles, num_files = export_library(PUZZLES[:4], str(tmp_path), shapes=True, num_workers=2,
+                                            batch_size=1)
+    assert (num_puzzles, num_files) == (4, 4 * 7)
+    assert sorted(os.listdir(tmp_path))[0] == "puzzle0_assembly.stl"
@@ -0,0 +1,72 @@
+import json
+import os
+import struct
+
+import pytest
+
+from burrsolver.astar import astar
+from burrsolver.external import Codec, external_astar
+from burrsolver.puzzle import Puzzle, PuzzleState
+from burrsolver.solver import disassemble, solve
+from burrsolver.stats import Statistics
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+POINT = struct.Struct("<bb")
+
+GRID_CODEC = Codec(lambda a: POINT.pack(*a), POINT.unpack, POINT.size,
+                   lambda e: POINT.pack(*e), lambda raw, a: POINT.unpack(raw), POINT.size)
+
+
+def grid_search(search, size: int, walls=frozenset(), **kwargs):
+    def neighbors(a):
+        x, y = a
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            b = (x + dx, y + dy)
+            if 0 <= b[0] < size and 0 <= b[1] < size and b not in walls:
+                yield (dx, dy), b
+
+    goal = (size - 1, size - 1)
+    return search(lambda a, b: 1, lambda a: abs(goal[0] - a[0]) + abs(goal[1] - a[1]),
+                  neighbors, lambda a: a == goal, (0, 0), **kwargs)
+
+
+def test_grid_path_is_optimal(tmp_path):
+    walls = frozenset((3, y) for y in range(9)) | frozenset((6, y) for y in range(1, 10))
+    expected = grid_search(astar, 10, walls)
+    path = grid_search(external_astar, 10, walls, codec=GRID_CODEC, max_states=4, directory=str(tmp_path))
+    assert len(path) == len(expected)
+    assert path[0][0] == (0, 0)
+    assert path[-1] == ((9, 9), None)
+    for (a, e), (b, _) in zip(path, path[1:]):
+        assert (a[0] + e[0], a[1] + e[1]) == b
+
+    # the temporary files are removed
+    assert os.listdir(tmp_path) == []
+
+
+def test_unreachable_goal_returns_none(tmp_path):
+    walls = frozenset((3, y) for y in range(8))
+    assert grid_search(external_astar, 8, walls, codec=GRID_CODEC, max_states=4, directory=str(tmp_path)) is None
+
+
+@pytest.mark.parametrize("index", [0, 3])
+def test_matches_astar_disassembly(tmp_path, index):
+    puzzle = Puzzle.from_text(PUZZLES[index]["shapes"])
+    assembly = solve(puzzle).assembly
+    expected = disassemble(puzzle.to_state(assembly))
+    stats = Statistics()
+    moves = disassemble(puzzle.to_state(assembly), stats=stats, engine="external", max_states=32,
+                        spill_dir=str(tmp_path))
+    assert len(moves) == len(expected)
+    assert moves[0][0] == assembly
+    assert moves[-1] == (PuzzleState(()), None)
+    assert stats.num_expanded > 0
+
+    state = puzzle.to_state(assembly)
+    for step, move in moves[:-1]:
+        assert state.state() == step
+        state = state.do_move(move)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from burrsolver import Puzzle
+from burrsolver.geometry import cached_mesh, Mesh
+from burrsolver.voxel import Voxel
+
+
+def area_by_normal(mesh):
+    v = mesh.vertices[mesh.quads]
+    areas = np.linalg.norm(np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0]), axis=1)
+    totals = {}
+    for normal, area in zip(map(tuple, mesh.normals[mesh.quads[:, 0]]), areas):
+        totals[normal] = totals.get(normal, 0) + float(area)
+
+    return totals
+
+
+def test_exposed_faces():
+    block = [Voxel(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1, 3)]
+    mesh = Mesh.from_voxels(block + block[:2])
+    assert len(mesh.quads) == 2 * 4 + 4 * 6
+    mesh.validate()
+
+    merged = Mesh.from_voxels(block, True)
+    assert len(merged.quads) == 6
+    assert area_by_normal(merged) == area_by_normal(mesh)
+
+
+def test_greedy_meshing():
+    rng = np.random.default_rng(7)
+    voxels = {Voxel(*(2 * int(c) + 1 for c in p)) for p in rng.integers(0, 6, (120, 3))}
+    mesh = Mesh.from_voxels(list(voxels), True)
+    mesh.validate()
+    assert len(mesh.quads) < len(Mesh.from_voxels(list(voxels)).quads)
+
+    # the surface is closed, and by the divergence theorem encloses every voxel
+    v = mesh.vertices[mesh.quads].astype(np.float64)
+    halves = [np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0]) / 2,
+              np.cross(v[:, 2] - v[:, 0], v[:, 3] - v[:, 0]) / 2]
+    assert np.allclose(sum(halves).sum(axis=0), 0)
+    volume = sum(np.einsum("ij,ij->", v[:, 0], half) for half in halves) / 3
+    assert volume == pytest.approx(8 * len(voxels))
+
+
+def test_validate():
+    mesh = Mesh.from_voxels([Voxel(1, 1, 1)])
+    with pytest.raises(ValueError):
+        Mesh(mesh.vertices, mesh.normals, mesh.quads[:, ::-1]).validate()
+
+
+def test_cached_mesh():
+    shape = Puzzle.from_text(["xxxxxx/xxxxxx/xxxxxx/xxxxxx"] * 6).shapes[0]
+    mesh = cached_mesh(shape.voxels, True)
+    assert cached_mesh(list(reversed(shape.voxels)), True) is mesh
+    assert not mesh.vertices.flags.writeable
+    assert len(mesh.quads) == 6
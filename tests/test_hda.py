@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+from burrsolver.astar import astar
+from burrsolver.hda import hda_star
+from burrsolver.puzzle import Puzzle, PuzzleState
+from burrsolver.solver import disassemble, solve
+from burrsolver.stats import Statistics
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def load_puzzle(index: int) -> Puzzle:
+    return Puzzle.from_text(PUZZLES[index]["shapes"])
+
+
+def grid_search(search, size: int, walls=frozenset(), **kwargs):
+    def neighbors(a):
+        x, y = a
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            b = (x + dx, y + dy)
+            if 0 <= b[0] < size and 0 <= b[1] < size and b not in walls:
+                yield (dx, dy), b
+
+    goal = (size - 1, size - 1)
+    return search(lambda a, b: 1, lambda a: abs(goal[0] - a[0]) + abs(goal[1] - a[1]),
+                  neighbors, lambda a: a == goal, (0, 0), **kwargs)
+
+
+@pytest.mark.parametrize("num_workers", [1, 3])
+def test_grid_path_is_optimal(num_workers):
+    walls = frozenset((3, y) for y in range(7))
+    expected = grid_search(astar, 8, walls)
+    path = grid_search(hda_star, 8, walls, num_workers=num_workers, batch_size=4)
+    assert len(path) == len(expected)
+    assert path[0][0] == (0, 0)
+    assert path[-1] == ((7, 7), None)
+    for (a, e), (b, _) in zip(path, path[1:]):
+        assert (a[0] + e[0], a[1] + e[1]) == b
+
+
+def test_unreachable_goal_returns_none():
+    walls = frozenset((3, y) for y in range(8))
+    assert grid_search(hda_star, 8, walls, num_workers=2) is None
+
+
+@pytest.mark.parametrize("index", [0, 3])
+def test_matches_astar_disassembly(index):
+    puzzle = load_puzzle(index)
+    assembly = solve(puzzle).assembly
+    expected = disassemble(puzzle.to_state(assembly))
+    stats = Statistics()
+    moves = disassemble(puzzle.to_state(assembly), stats=stats, engine="hda", num_workers=2)
+    assert len(moves) == len(expected)
+    assert moves[0][0] == assembly
+    assert moves[-1] == (PuzzleState(()), None)
+    assert stats.num_expanded > 0
+
+    state = puzzle.to_state(assembly)
+    for step, move in moves[:-1]:
+        assert state.state() == step
+        state = state.do_move(move)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        disassemble(load_puzzle(0), engine="bogus")
@@ -0,0 +1,54 @@
+import json
+import os
+
+import numpy as np
+
+from burrsolver import Puzzle
+from burrsolver.export import export_library, replay, save_keyframes
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def stored(index):
+    info = PUZZLES[index]
+    puzzle = Puzzle.from_text(info["shapes"])
+    assembly, moves = next(iter(info["assemblies"].items()))
+    return puzzle, moves, replay(puzzle, assembly, moves)
+
+
+def test_json(tmp_path):
+    puzzle, moves, disassembly = stored(3)
+    path = str(tmp_path / "solution.json")
+    save_keyframes(path, puzzle, disassembly)
+    with open(path) as f:
+        document = json.load(f)
+
+    assert len(document["meshes"]) == 6
+    assert len(document["keyframes"]) == len(moves)
+    for frame, (state, move) in zip(document["keyframes"], disassembly):
+        assert frame["steps"] == move.steps
+        assert len(frame["shapes"]) == len(state.pieces)
+        assert [state.pieces[i] for i in frame["moving"]] == [p for p in state.pieces if p in move.pieces]
+        assert np.allclose(np.array(frame["transforms"]).reshape(-1, 4, 4),
+                           [piece.to_transform() for piece in state.pieces])
+
+
+def test_npz(tmp_path):
+    puzzle, moves, disassembly = stored(3)
+    path = str(tmp_path / "solution.npz")
+    save_keyframes(path, puzzle, disassembly)
+    with np.load(path) as arrays:
+        assert arrays["num_pieces"].sum() == len(arrays["shapes"]) == len(arrays["transforms"])
+        assert list(arrays["steps"]) == [move.steps for _, move in disassembly[:-1]]
+        assert arrays["shape0_triangles"].max() < len(arrays["shape0_vertices"])
+
+
+def test_export_library(tmp_path):
+    num_puzzles, num_files = export_library(PUZZLES[:3], str(tmp_path), num_workers=1,
+                                            keyframe_format="json")
+    assert (num_puzzles, num_files) == (3, 6)
+    assert os.path.exists(tmp_path / "puzzle2_keyframes.json")
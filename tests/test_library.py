@@ -0,0 +1,59 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from burrsolver.batch import tasks_for
+from burrsolver.library import json_to_library, Library, library_to_json, open_puzzles, write_library
+from burrsolver.shape import mask_from_text
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    DATA = json.load(f)
+
+
+def test_round_trip(tmp_path):
+    library_path = str(tmp_path / "puzzles.lib")
+    json_path = str(tmp_path / "puzzles.json")
+    assert json_to_library(PUZZLES_PATH, library_path) == len(DATA["puzzles"])
+    # 18 bytes of shapes per puzzle, plus the stored results
+    assert os.path.getsize(library_path) < os.path.getsize(PUZZLES_PATH)
+
+    with Library(library_path) as library:
+        assert len(library) == len(DATA["puzzles"])
+        assert library[3] == DATA["puzzles"][3]
+        assert library[-1] == DATA["puzzles"][-1]
+        assert library[1:3] == DATA["puzzles"][1:3]
+        assert library.metadata["colors"] == DATA["colors"]
+        with pytest.raises(IndexError):
+            library[len(library)]
+
+        expected = [[mask_from_text(text) for text in info["shapes"]] for info in DATA["puzzles"]]
+        assert [list(masks) for masks in library.iter_masks()] == expected
+        assert np.array_equal(library.mask_array(), np.array(expected, dtype=np.uint32))
+
+    assert library_to_json(library_path, json_path) == len(DATA["puzzles"])
+    with open(json_path) as f:
+        assert json.load(f) == DATA
+
+
+def test_open_puzzles(tmp_path):
+    library_path = str(tmp_path / "puzzles.lib")
+    write_library(library_path, [{"shapes": info["shapes"]} for info in DATA["puzzles"]])
+    puzzles = open_puzzles(library_path)
+    assert isinstance(puzzles, Library)
+    assert puzzles[0] == {"shapes": DATA["puzzles"][0]["shapes"], "assemblies": {}}
+    assert open_puzzles(PUZZLES_PATH) == DATA["puzzles"]
+    assert [task.shapes for task in tasks_for(library_path)] == \
+        [info["shapes"] for info in DATA["puzzles"]]
+
+
+def test_not_a_library(tmp_path):
+    with pytest.raises(ValueError):
+        Library(PUZZLES_PATH)
+
+    with pytest.raises(ValueError):
+        write_library(str(tmp_path / "bad.lib"), [{"shapes": ["xxxxxx/xxxxxx/xxxxxx/xxxxxx"]}])
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+from burrsolver.mitm import count_assemblies, enumerate_assemblies, halves
+from burrsolver.position import PLACES
+from burrsolver.puzzle import Puzzle
+from burrsolver.solver import analyze
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+# the number of distinct assemblies found by the AssemblySearch
+NUM_ASSEMBLIES = [7, 1728, 7, 36, 5, 120, 14, 36, 5]
+
+
+@pytest.mark.parametrize("index", range(len(PUZZLES)))
+def test_count(index):
+    puzzle = Puzzle.from_text(PUZZLES[index]["shapes"])
+    assert count_assemblies(puzzle) == NUM_ASSEMBLIES[index]
+    assert count_assemblies(puzzle, (("A", "C", "E"), ("B", "D", "F"))) == NUM_ASSEMBLIES[index]
+
+
+@pytest.mark.parametrize("index", [0, 3])
+def test_assemblies(index):
+    puzzle = Puzzle.from_text(PUZZLES[index]["shapes"])
+    assemblies = enumerate_assemblies(puzzle)
+    assert len(set(assemblies)) == len(assemblies)
+    found = [set(str(assembly).split()) for assembly in assemblies]
+    for known in PUZZLES[index]["assemblies"]:
+        assert set(known.split()) in found
+
+    for assembly in assemblies:
+        assert [piece.position for piece in assembly.pieces] == list(PLACES.values())
+        assert sorted(piece.shape for piece in assembly.pieces) == list(range(6))
+        voxels = [v for piece in assembly.pieces for v in puzzle.voxels_for(piece)]
+        assert len(voxels) == len(set(voxels))
+
+
+def test_analyze():
+    puzzle = Puzzle.from_text(PUZZLES[8]["shapes"])
+    analysis = analyze(puzzle, assembler="mitm")
+    assert analysis.num_iterations == len(analysis.assemblies) == NUM_ASSEMBLIES[8]
+    for assembly, moves in analysis.assemblies:
+        assert moves is None or moves[0][0] == puzzle.to_state(assembly).state()
+
+
+def test_invalid():
+    puzzle = Puzzle.from_text(PUZZLES[0]["shapes"])
+    with pytest.raises(ValueError):
+        halves(puzzle, (("A", "B"), ("C", "D", "E", "F")))
+
+    with pytest.raises(ValueError):
+        analyze(puzzle, assembler="mitm", checkpoint="analysis.ckpt")
+
+    with pytest.raises(ValueError):
+        analyze(puzzle, assembler="unknown")
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from burrsolver.piece import Piece
+from burrsolver.position import Axis, Position
+
+sp = pytest.importorskip("scenepic")
+
+
+def expected_transform(piece: Piece) -> np.ndarray:
+    """The transform as built from ScenePic's transform constructors."""
+    n = piece.orientation % 4
+    transform = np.eye(4)
+    if piece.is_flipped():
+        transform = sp.Transforms.rotation_about_y(np.pi)
+
+    if n > 0:
+        transform = sp.Transforms.rotation_about_z(np.pi * n / 2) @ transform
+
+    x, y, z, axis = piece.position
+    if axis == Axis.Y:
+        transform = sp.Transforms.rotation_about_x(np.pi / 2) @ transform
+
+    if axis == Axis.X:
+        transform = sp.Transforms.rotation_about_y(np.pi / 2) @ transform
+
+    return sp.Transforms.translate([x, y, z]) @ transform
+
+
+@pytest.mark.parametrize("axis", list(Axis))
+@pytest.mark.parametrize("orientation", range(8))
+def test_to_transform(axis: Axis, orientation: int):
+    piece = Piece(0, Position(1, -2.5, 3, axis), orientation)
+    assert np.allclose(piece.to_transform(), expected_transform(piece), atol=1e-6)
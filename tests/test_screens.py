@@ -0,0 +1,48 @@
+import json
+import os
+
+from burrsolver.mitm import enumerate_assemblies
+from burrsolver.puzzle import Puzzle
+from burrsolver.screens import has_movable_group, is_locked, screen
+from burrsolver.solver import disassemble, solve
+from burrsolver.stats import Statistics
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_screens_are_necessary():
+    puzzle = Puzzle.from_text(PUZZLES[5]["shapes"])
+    stats = Statistics()
+    for assembly in enumerate_assemblies(puzzle):
+        assembled = puzzle.to_state(assembly)
+        assert has_movable_group(assembled) == any(True for _ in assembled.valid_moves())
+        if not screen(assembled, stats):
+            assert disassemble(assembled) is None
+
+    assert stats.rejected["blocking"] > 0
+    assert stats.rejected["search"] > 0
+    assert stats.screened["search"] == stats.screened["blocking"] - stats.rejected["blocking"]
+
+
+def test_search_cap():
+    puzzle = Puzzle.from_text(PUZZLES[5]["shapes"])
+    locked = [puzzle.to_state(assembly) for assembly in enumerate_assemblies(puzzle)]
+    locked = [assembled for assembled in locked if has_movable_group(assembled) and is_locked(assembled)]
+    assert locked
+    assert not any(is_locked(assembled, max_nodes=1) for assembled in locked)
+
+
+def test_solve_statistics():
+    puzzle = Puzzle.from_text(PUZZLES[1]["shapes"])
+    expected = solve(puzzle, screens=False)
+    stats = Statistics()
+    solution = solve(puzzle, stats=stats)
+    assert solution.moves == expected.moves
+    assert solution.num_checked == expected.num_checked
+
+    screens = stats.to_dict()["screens"]
+    assert screens["blocking"]["screened"] == solution.num_checked
+    assert 0 < screens["search"]["rejection_rate"] < 1
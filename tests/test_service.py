@@ -0,0 +1,133 @@
+import asyncio
+import os
+import json
+import time
+
+from burrsolver.canonical import orient_mask
+from burrsolver.puzzle import Puzzle, PuzzleState
+from burrsolver.service import SolveService
+from burrsolver.shape import mask_from_text, mask_to_text
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def replay(shapes, assembly, moves):
+    """Check that the moves disassemble the puzzle."""
+    puzzle = Puzzle.from_text(shapes).to_state(PuzzleState.from_string(assembly))
+    for text in moves:
+        valid_moves = {str(move): move for move in puzzle.valid_moves()}
+        assert text in valid_moves
+        puzzle = puzzle.do_move(valid_moves[text])
+
+    assert len(puzzle.pieces) == 0
+
+
+FINAL = ("solved", "unsolvable", "cancelled", "error")
+
+
+async def send(writer, message):
+    writer.write((json.dumps(message) + "\n").encode("utf-8"))
+    await writer.drain()
+
+
+async def read_until(reader, events, request_id, final):
+    """Read events until the given event arrives for a request."""
+    while True:
+        event = json.loads(await reader.readline())
+        events.setdefault(event["id"], []).append(event)
+        if event["id"] == request_id and event["event"] in final:
+            return event
+
+
+async def request(port, messages, count):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for message in messages:
+        await send(writer, message)
+
+    events = {}
+    results = {}
+    while len(results) < count:
+        event = json.loads(await reader.readline())
+        events.setdefault(event["id"], []).append(event)
+        if event["event"] in FINAL:
+            results[event["id"]] = event
+
+    writer.close()
+    return results, events
+
+
+def test_coalescing():
+    shapes = PUZZLES[8]["shapes"]
+    # the same puzzle with the pieces in a different order and orientation
+    other = [shapes[i] for i in [3, 1, 5, 0, 2, 4]]
+    other[0] = mask_to_text(orient_mask(mask_from_text(other[0]), 5))
+
+    async def run():
+        service = SolveService(2)
+        port = await service.start()
+        try:
+            return await asyncio.gather(
+                request(port, [{"op": "solve", "id": "a", "shapes": shapes}], 1),
+                request(port, [{"op": "solve", "id": "b", "shapes": other}], 1)), service.num_solves
+        finally:
+            await service.close()
+
+    ((a, a_events), (b, b_events)), num_solves = asyncio.run(run())
+    assert num_solves == 1
+    assert [e["event"] for e in a_events["a"]] == ["queued", "started", "solved"]
+    assert b_events["b"][0]["event"] == "queued"
+    assert a["a"]["event"] == "solved"
+    assert b["b"]["event"] == "solved"
+    replay(shapes, a["a"]["assembly"], a["a"]["moves"])
+    replay(other, b["b"]["assembly"], b["b"]["moves"])
+
+
+def test_cancel_and_errors():
+    async def run():
+        service = SolveService(1)
+        port = await service.start()
+        try:
+            return await request(port, [
+                {"op": "solve", "id": "slow", "shapes": PUZZLES[5]["shapes"]},
+                {"op": "cancel", "id": "slow"},
+                {"op": "solve", "id": "bad", "shapes": ["xxx"]}
+            ], 2)
+        finally:
+            await service.close()
+
+    results, _ = asyncio.run(run())
+    assert results["slow"]["event"] == "cancelled"
+    assert results["bad"]["event"] == "error"
+
+
+def test_cancel_running():
+    async def run():
+        service = SolveService(1, progress_interval=0.1)
+        port = await service.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            events = {}
+            # the canonical form of puzzle 1 takes several seconds to solve
+            await send(writer, {"op": "solve", "id": "slow", "shapes": PUZZLES[1]["shapes"]})
+            await read_until(reader, events, "slow", ("progress",))
+            await send(writer, {"op": "cancel", "id": "slow"})
+            await read_until(reader, events, "slow", FINAL)
+
+            start = time.perf_counter()
+            await send(writer, {"op": "solve", "id": "fast", "shapes": PUZZLES[8]["shapes"]})
+            result = await read_until(reader, events, "fast", FINAL)
+            elapsed = time.perf_counter() - start
+            writer.close()
+            return events["slow"], result, elapsed
+        finally:
+            await service.close()
+
+    slow, result, elapsed = asyncio.run(run())
+    assert [e["event"] for e in slow[:2]] == ["queued", "started"]
+    assert slow[2]["num_iterations"] > 0
+    assert slow[-1]["event"] == "cancelled"
+    assert result["event"] == "solved"
+    # the cancelled solve must not hold up the worker
+    assert elapsed < 2
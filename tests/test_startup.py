@@ -0,0 +1,14 @@
+from burrsolver.benchmark import CORE_MODULES, HEAVY_MODULES, import_time, loaded_modules
+
+
+def test_core_does_not_load_heavy_modules():
+    assert loaded_modules(CORE_MODULES + ["burrsolver"], HEAVY_MODULES) == []
+
+
+def test_visualization_loads_scenepic():
+    assert "scenepic" in loaded_modules(["burrsolver.visualization"], HEAVY_MODULES)
+
+
+def test_core_import_time():
+    # importing scenepic alone takes far longer than this
+    assert min(import_time(CORE_MODULES) for _ in range(3)) < 0.1
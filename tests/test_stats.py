@@ -0,0 +1,37 @@
+import json
+import os
+
+from burrsolver import Puzzle, solve
+from burrsolver.stats import Statistics
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def test_statistics():
+    puzzle = Puzzle.from_text(PUZZLES[8]["shapes"])
+    expected = solve(puzzle)
+    stats = Statistics()
+    solution = solve(puzzle, stats=stats)
+    assert solution.stats is stats
+    assert expected.stats is None
+    assert solution.moves == expected.moves
+    assert solution.num_iterations == expected.num_iterations
+
+    rejected = sum(stats.rejected.values())
+    assert len(stats.expanded_per_assembly) + rejected == solution.num_checked
+    assert sum(stats.expanded_per_assembly) == stats.num_expanded > 0
+    assert stats.num_move_states == stats.num_expanded
+    assert stats.num_generated == sum(stats.moves_by_size.values())
+    assert set(stats.moves_by_size) <= {1, 2, 3}
+    assert stats.assembly_frontier_max > 0
+    assert stats.astar_frontier_max > 0
+    assert all(t > 0 for t in stats.times.values())
+
+    data = json.loads(json.dumps(stats.to_dict()))
+    assert 0 <= data["revisit_rate"] <= 1
+    assert 0 <= data["voxel_cache"]["hit_rate"] <= 1
+    assert data["voxel_cache"]["hits"] + data["voxel_cache"]["misses"] > 0
@@ -0,0 +1,51 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+import numpy as np
+
+from burrsolver.designer import notchable_catalog, placements
+from burrsolver.position import Direction
+from burrsolver.shape import Shape
+from burrsolver.tables import attach_worker, build_tables, cell_of, puzzle_from_text, SharedTables
+from burrsolver.voxel import Voxel
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+SHAPES = sorted({text for info in PUZZLES for text in info["shapes"]})
+
+
+def orientations(lines):
+    return [shape.orientations for shape in puzzle_from_text(lines).shapes]
+
+
+def test_shapes():
+    texts = SHAPES + notchable_catalog()
+    with SharedTables.create(build_tables(texts)) as tables:
+        for text in texts:
+            assert tables.shape(text) == Shape.from_text(text)
+            # the fallback in the designer gives the same cell masks
+            assert tables.placement_masks(text) == placements.__wrapped__(text)
+
+
+def test_neighbors():
+    tables = build_tables()
+    for d in Direction:
+        for cell, neighbor in enumerate(tables["neighbors"][d]):
+            x, y, z = (2 * (cell // 36) - 5, 2 * (cell // 6 % 6) - 5, 2 * (cell % 6) - 5)
+            assert neighbor == cell_of(Voxel(x, y, z).move(d))
+
+
+def test_workers():
+    with SharedTables.create(build_tables(SHAPES)) as tables:
+        assert not tables.arrays["valid"].flags.writeable
+        with ProcessPoolExecutor(max_workers=2, initializer=attach_worker,
+                                 initargs=(tables.name,)) as executor:
+            results = list(executor.map(orientations, [info["shapes"] for info in PUZZLES]))
+
+    assert results == [[Shape.from_text(text).orientations for text in info["shapes"]] for info in PUZZLES]
+    assert np.array_equal(build_tables(["xxxxxx/xxxxxx/xxxxxx/xxxxxx"])["masks"], [0xFFFFFF])
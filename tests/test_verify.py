@@ -0,0 +1,82 @@
+import json
+import os
+
+from burrsolver.position import Direction
+from burrsolver.puzzle import Move, Puzzle, PuzzleState
+from burrsolver.verify import check_move, verify_disassembly, verify_puzzles
+
+
+PUZZLES_PATH = os.path.join(os.path.dirname(__file__), "..", "puzzles.json")
+
+with open(PUZZLES_PATH) as f:
+    PUZZLES = json.load(f)["puzzles"]
+
+
+def stored(index):
+    info = PUZZLES[index]
+    assembly, moves = next(iter(info["assemblies"].items()))
+    return info["shapes"], assembly, moves
+
+
+def test_move_from_string():
+    for info in PUZZLES:
+        for moves in info["assemblies"].values():
+            for text in moves:
+                assert repr(Move.from_string(text)) == text
+
+
+def test_stored_disassemblies():
+    results = list(verify_puzzles(PUZZLES, num_workers=2, batch_size=2))
+    assert [result.index for result in results] == list(range(len(PUZZLES)))
+    assert all(result.error is None for result in results)
+
+
+def test_check_move_matches_valid_moves():
+    shapes, assembly, moves = stored(0)
+    puzzle = Puzzle.from_text(shapes).to_state(PuzzleState.from_string(assembly))
+    for text in moves:
+        valid = set(puzzle.valid_moves())
+        for move in valid:
+            assert check_move(puzzle, move) is None
+            for d in Direction:
+                for steps in range(1, 8):
+                    candidate = Move(move.pieces, d, steps)
+                    assert (check_move(puzzle, candidate) is None) == (candidate in valid)
+
+        puzzle = puzzle.do_move(Move.from_string(text))
+
+
+def test_invalid_disassemblies():
+    shapes, assembly, moves = stored(0)
+    assert verify_disassembly(shapes, assembly, moves) == (None, None)
+
+    step, error = verify_disassembly(shapes, assembly, moves[:-1])
+    assert step is None and "left in the puzzle" in error
+
+    # the first move takes a piece straight out, so it cannot stop short
+    first = Move.from_string(moves[0])
+    short = repr(first._replace(steps=first.steps - 1))
+    assert verify_disassembly(shapes, assembly, [short] + moves[1:])[0] == 0
+
+    step, error = verify_disassembly(shapes, assembly, [moves[0], moves[0]] + moves[1:])
+    assert step == 1
+
+    pieces = assembly.split()
+    duplicate = " ".join(pieces[:-1] + [pieces[0]])
+    assert verify_disassembly(shapes, duplicate, moves)[1] is not None
+
+    assert verify_disassembly(shapes, assembly, ["SIDEWAYS 1 [A1a]"])[1].startswith("Unable to parse")
+
+
+def test_invalid_pieces():
+    shapes, assembly, moves = stored(0)
+    pieces = assembly.split()
+    step, error = verify_disassembly(shapes, " ".join([pieces[0][:2] + "z"] + pieces[1:]), moves)
+    assert step is None and "invalid orientation" in error
+
+    step, error = verify_disassembly(shapes, " ".join(["(0,0,4,X)" + pieces[0][1:]] + pieces[1:]), moves)
+    assert step is None and "not at one of the places" in error
+
+    info = dict(PUZZLES[0], assemblies={"A1z" + assembly[3:]: moves, assembly: moves})
+    results = list(verify_puzzles([info], num_workers=2))
+    assert [result.error is None for result in results] == [False, True]